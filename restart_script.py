@@ -19,9 +19,11 @@ import openmethane.fourdvar._main_driver as main
 import openmethane.fourdvar.datadef as d
 import openmethane.fourdvar.user_driver as user
 from openmethane.fourdvar._transform import transform
-from openmethane.fourdvar.params import archive_defn
+from openmethane.fourdvar.env import env
+from openmethane.fourdvar.params import archive_defn, input_defn
 
-from openmethane.fourdvar.util import archive_handle
+from openmethane.fourdvar.util import archive_handle, period_chain
+from openmethane.fourdvar.util.minim_history import MinimHistory
 
 # If true restart_script uses last iteration in archive
 restart_from_last = True
@@ -40,16 +42,24 @@ archive_path = os.path.join(archive_defn.archive_path, archive_defn.experiment)
 archive_handle.archive_path = archive_path
 archive_handle.finished_setup = True
 
-if not restart_from_last:
+# resume with the L-BFGS state saved by user_driver.minim, replaying its evaluations.
+# also used to extend a finished minimization with a larger MAX_ITERATIONS.
+history = MinimHistory.load(os.path.join(archive_path, archive_defn.minim_history))
+
+if history.x0 is not None:
+    start_no = history.replay_iterations
+    init_vec = history.x0
+elif not restart_from_last:
     start_no = restart_number
 else:
     start_no = 1
     while os.path.isfile(os.path.join(archive_path, iter_fname.format(start_no + 1))):
         start_no += 1
 
-assert start_no == int(start_no), "restart_number must be an integer."
-init_path = os.path.join(archive_path, iter_fname.format(start_no))
-assert os.path.isfile(init_path), f"Cannot find {init_path}"
+if history.x0 is None:
+    assert start_no == int(start_no), "restart_number must be an integer."
+    init_path = os.path.join(archive_path, iter_fname.format(start_no))
+    assert os.path.isfile(init_path), f"Cannot find {init_path}"
 
 log_path = os.path.join(archive_path, restart_log_fname)
 if os.path.isfile(log_path):
@@ -59,12 +69,30 @@ else:
 with open(log_path, ftype) as f:
     f.write(f"restarted from iteration {start_no}\n")
 
-user.iter_num = start_no
-init_phys = d.PhysicalData.from_file(init_path)
-init_unk = transform(init_phys, d.UnknownData)
-init_vec = init_unk.get_vector()
+if history.x0 is None:
+    # without a saved L-BFGS state the minimizer starts again from the last iteration
+    user.iter_num = start_no
+    init_phys = d.PhysicalData.from_file(init_path)
+    init_unk = transform(init_phys, d.UnknownData)
+    init_vec = init_unk.get_vector()
+    history = None
+
+# a chained period resumes with the preconditioner of the previous period, as in get_answer,
+# so the minimizer asks for the same vectors as the saved evaluations.
+preconditioner = None
+if input_defn.prev_window:
+    preconditioner = period_chain.load_posterior(input_defn.prev_window, len(init_vec))
 
-min_output = user.minim(main.cost_func, main.gradient_func, init_vec)
+# the bounds must match the original minimization for its evaluations to be replayed
+min_output = user.minim(
+    main.cost_func,
+    main.gradient_func,
+    init_vec,
+    allow_negative_emissions=env.bool("ALLOW_NEGATIVE_EMISSIONS", False),
+    physical_template=user.get_background(),
+    history=history,
+    preconditioner=preconditioner,
+)
 out_vector = min_output[0]
 out_unknown = d.UnknownData(out_vector)
 out_physical = transform(out_unknown, d.PhysicalData)
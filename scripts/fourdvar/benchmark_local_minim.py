@@ -0,0 +1,158 @@
+#
+# Copyright 2025 The Superpower Institute
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""Time the fourdvar minimisation loop using the local stand-in for CMAQ.
+
+usage: TARGET=docker-test python benchmark_local_minim.py <obs_file> [store_path]
+
+Runs a finite difference check of the gradient, then user_driver.minim with
+MAX_ITERATIONS iterations (default 5), without a compiled CMAQ.
+MINIM_SOLVER may list several solvers to compare on the same problem,
+eg: MINIM_SOLVER=lbfgs,cg,jacobian (jacobian is best used with CLUSTER_MAP).
+For each solver the iterations & model runs until the gradient norm is reduced
+by CG_TOLERANCE (default 1e-3) are printed, from the convergence monitor records.
+The emissions are bounded at zero unless ALLOW_NEGATIVE_EMISSIONS or LOG_EMISSIONS
+is set, the optimizer overhead is the minim time outside the cost & gradient functions.
+The model inputs (met, templates, icon & bcon) are read from the TARGET
+environment, all outputs are written to store_path (default a temporary directory).
+"""
+
+import json
+import os
+import pathlib
+import runpy
+import sys
+import tempfile
+import time
+
+
+def main(obs_file, store_path):
+    # params are read from the environment when first imported
+    os.environ["STORE_PATH"] = store_path
+    os.environ["OBS_FILE_GLOB"] = os.path.realpath(obs_file)
+    os.environ["CMAQ_SHELL"] = "/bin/sh"
+    os.environ["ADJOINT_FWD"] = f"{sys.executable} -m openmethane.fourdvar.util.local_cmaq fwd"
+    os.environ["ADJOINT_BWD"] = f"{sys.executable} -m openmethane.fourdvar.util.local_cmaq bwd"
+    os.environ.setdefault("MAX_ITERATIONS", "5")
+
+    import numpy as np
+
+    import openmethane.fourdvar._main_driver as main_driver
+    import openmethane.fourdvar.datadef as d
+    import openmethane.fourdvar.user_driver as user
+    from openmethane.fourdvar._transform import transform
+    from openmethane.fourdvar.params import archive_defn, cmaq_config
+    from openmethane.fourdvar.util import archive_handle, cmaq_handle, file_handle
+
+    file_handle.ensure_path(os.path.dirname(cmaq_config.emis_file))
+    file_handle.ensure_path(os.path.dirname(cmaq_config.force_file))
+    make_prior = pathlib.Path(__file__).parents[1] / "cmaq_preprocess" / "make_prior.py"
+    runpy.run_path(str(make_prior), run_name="__main__")
+
+    prior_vector = transform(user.get_background(), d.UnknownData).get_vector()
+
+    start_time = time.time()
+    init_grad = main_driver.gradient_func(prior_vector)
+    print(f"gradient evaluation: {time.time() - start_time:.2f}s")
+
+    # the stand-in model is linear, so central differences are exact up to rounding
+    dx = 0.1 * np.random.default_rng(0).normal(size=prior_vector.shape)
+    cost_change = 0.5 * (
+        main_driver.cost_func(prior_vector + dx) - main_driver.cost_func(prior_vector - dx)
+    )
+    grad_change = np.dot(dx, init_grad)
+    print(f"finite difference: {cost_change}")
+    print(f"gradient . dx:     {grad_change}")
+    print(f"rel difference:    {abs(cost_change - grad_change) / abs(grad_change):.2e}")
+
+    func_time = [0.0]
+
+    def timed(func):
+        def wrapper(vector, *args, **kwargs):
+            start_time = time.time()
+            result = func(vector, *args, **kwargs)
+            func_time[0] += time.time() - start_time
+            return result
+
+        return wrapper
+
+    model_runs = [0]
+
+    def counted(func):
+        def wrapper():
+            model_runs[0] += 1
+            return func()
+
+        return wrapper
+
+    cmaq_handle.run_fwd = counted(cmaq_handle.run_fwd)
+    cmaq_handle.run_bwd = counted(cmaq_handle.run_bwd)
+
+    # model runs made before each iteration is accepted
+    iteration_runs = []
+    callback_func = user.callback_func
+
+    def callback(vector):
+        iteration_runs.append(model_runs[0])
+        return callback_func(vector)
+
+    user.callback_func = callback
+    tolerance = float(os.environ.get("CG_TOLERANCE", "1e-3"))
+
+    allow_negative = os.environ.get("ALLOW_NEGATIVE_EMISSIONS", "false").lower() == "true"
+    user.setup()
+    for solver in os.environ.get("MINIM_SOLVER", "lbfgs").split(","):
+        os.environ["MINIM_SOLVER"] = solver
+        user.iter_num = 0
+        func_time[0] = 0.0
+        model_runs[0] = 0
+        iteration_runs.clear()
+        start_time = time.time()
+        answer = user.minim(
+            timed(main_driver.cost_func),
+            timed(main_driver.gradient_func),
+            prior_vector,
+            allow_negative_emissions=allow_negative,
+            physical_template=user.get_background(),
+        )
+        total_time = time.time() - start_time
+        print(
+            f"minim {solver}: {answer[2]['nit']} iterations, {answer[2]['funcalls']} evaluations "
+            f"in {total_time:.2f}s ({total_time - func_time[0]:.3f}s optimizer overhead), "
+            f"cost {answer[3]['start_cost']} -> {answer[1]}"
+        )
+        convergence_file = os.path.join(archive_handle.get_archive_path(), archive_defn.convergence)
+        with open(convergence_file) as f:
+            records = json.load(f)["iterations"]
+        reached = [
+            num
+            for num, record in enumerate(records)
+            if record["grad_reduction"] is not None and record["grad_reduction"] <= tolerance
+        ]
+        if len(reached) > 0:
+            print(
+                f"minim {solver}: gradient norm reduced by {tolerance} after {reached[0] + 1} "
+                f"iterations & {iteration_runs[reached[0]]} model runs"
+            )
+        else:
+            print(f"minim {solver}: gradient norm not reduced by {tolerance}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 2:
+        main(sys.argv[1], sys.argv[2])
+    else:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            main(sys.argv[1], tmp_dir)
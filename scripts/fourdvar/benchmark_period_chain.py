@@ -0,0 +1,266 @@
+#
+# Copyright 2025 The Superpower Institute
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""Compare independent & chained inversions of consecutive periods with the local stand-in for CMAQ.
+
+usage: TARGET=docker-test python benchmark_period_chain.py <obs_file> [store_path]
+
+A campaign of NUM_PERIODS consecutive daily periods (default 4), starting on the
+date of the observations, is inverted twice, each period starting from the prior,
+then from the previous period (see util/period_chain.py). Every period runs in its
+own process with its own START_DATE, so the posterior & its covariance are mapped
+onto the dates of the next period.
+The test data has a single day of met, so the met, emission template & observations
+of that day are reused for every date of the campaign. The observations of each
+period are simulated from a "true" emission scaling, that persists between periods
+with a change of PERIOD_CHANGE (default 0.05) in each cell, plus noise of the
+observation uncertainty scaled by OBS_UNCERTAINTY_SCALE (default 0.1, for a better
+constrained problem than the test observations).
+Each period starts from the final concentrations of the previous chained period in
+both campaigns, so they solve the same problems.
+For each period the lbfgs iterations until the cost is within TOLERANCE
+(default 1e-3) of the lowest cost of both campaigns are printed, with the
+iterations and model runs until lbfgs stops (MAX_ITERATIONS default 30, or an
+iteration reducing the cost by less than CONVERGENCE_COST_REDUCTION default 1e-6).
+The emissions are unbounded (ALLOW_NEGATIVE_EMISSIONS default true), as the chained
+periods are only preconditioned without bounds.
+"""
+
+import datetime
+import json
+import os
+import pathlib
+import runpy
+import subprocess
+import sys
+import tempfile
+
+NUM_PERIODS = int(os.environ.get("NUM_PERIODS", "4"))
+PERIOD_CHANGE = float(os.environ.get("PERIOD_CHANGE", "0.05"))
+OBS_UNCERTAINTY_SCALE = float(os.environ.get("OBS_UNCERTAINTY_SCALE", "0.1"))
+TOLERANCE = float(os.environ.get("TOLERANCE", "1e-3"))
+RESULT = "period result: "
+
+
+def shift_obs(obs_file, days, out_file):
+    """Write the observations of obs_file moved days later to out_file."""
+    from openmethane.fourdvar.util import file_handle
+
+    def shift_key(key):
+        date = datetime.datetime.strptime(str(key[0]), "%Y%m%d") + datetime.timedelta(days)
+        return (int(date.strftime("%Y%m%d")), *key[1:])
+
+    domain, *observations = file_handle.load_list(obs_file)
+    for odict in observations:
+        odict["time"] += datetime.timedelta(days)
+        odict["weight_grid"] = {shift_key(k): v for k, v in odict["weight_grid"].items()}
+        if "lite_coord" in odict:
+            odict["lite_coord"] = shift_key(odict["lite_coord"])
+    file_handle.save_list([domain, *observations], out_file)
+
+
+def link_inputs(source_date, dates, store_path):
+    """Use the met & emission template of source_date for every date, returns their dirs."""
+    met_dir = os.path.join(store_path, "mcip")
+    template_dir = os.path.join(store_path, "templates")
+    os.makedirs(os.path.join(template_dir, "record"))
+    os.makedirs(met_dir)
+    for name in os.listdir(os.environ["TEMPLATE_DIR"]):
+        if name != "record":
+            os.symlink(
+                os.path.join(os.environ["TEMPLATE_DIR"], name), os.path.join(template_dir, name)
+            )
+    record_dir = os.path.join(os.environ["TEMPLATE_DIR"], "record")
+    for name in os.listdir(record_dir):
+        if not name.startswith("emis_record_"):
+            os.symlink(os.path.join(record_dir, name), os.path.join(template_dir, "record", name))
+    for date in dates:
+        os.symlink(
+            os.path.join(os.environ["MET_DIR"], source_date.isoformat()),
+            os.path.join(met_dir, date.isoformat()),
+        )
+        os.symlink(
+            os.path.join(record_dir, f"emis_record_{source_date.isoformat()}.nc"),
+            os.path.join(template_dir, "record", f"emis_record_{date.isoformat()}.nc"),
+        )
+    return met_dir, template_dir
+
+
+def run_period(num):
+    """Invert one period, set up by main in the environment, & print its result."""
+    os.environ["CMAQ_SHELL"] = "/bin/sh"
+    os.environ["ADJOINT_FWD"] = f"{sys.executable} -m openmethane.fourdvar.util.local_cmaq fwd"
+    os.environ["ADJOINT_BWD"] = f"{sys.executable} -m openmethane.fourdvar.util.local_cmaq bwd"
+    os.environ.setdefault("MAX_ITERATIONS", "30")
+    # stop both campaigns alike before the line search stalls at the precision of the cost
+    os.environ.setdefault("CONVERGENCE_COST_REDUCTION", "1e-6")
+    os.environ.setdefault("CONVERGENCE_PATIENCE", "1")
+    # the preconditioner of chained periods is only used without bounds
+    os.environ.setdefault("ALLOW_NEGATIVE_EMISSIONS", "true")
+
+    import numpy as np
+
+    import openmethane.fourdvar._main_driver as main_driver
+    import openmethane.fourdvar.datadef as d
+    import openmethane.fourdvar.user_driver as user
+    from openmethane.fourdvar._transform import transform
+    from openmethane.fourdvar.params import archive_defn, cmaq_config
+    from openmethane.fourdvar.util import archive_handle, cmaq_handle, file_handle
+    from openmethane.fourdvar.util.minim_history import state_name
+
+    file_handle.ensure_path(os.path.dirname(cmaq_config.emis_file))
+    file_handle.ensure_path(os.path.dirname(cmaq_config.force_file))
+    make_prior = pathlib.Path(__file__).parents[1] / "cmaq_preprocess" / "make_prior.py"
+    runpy.run_path(str(make_prior), run_name="__main__")
+
+    model_runs = {"fwd": 0, "bwd": 0}
+
+    def counted(name, func):
+        def wrapper():
+            model_runs[name] += 1
+            return func()
+
+        return wrapper
+
+    cmaq_handle.run_fwd = counted("fwd", cmaq_handle.run_fwd)
+    cmaq_handle.run_bwd = counted("bwd", cmaq_handle.run_bwd)
+
+    prior = user.get_background()
+    user.get_observed()
+    d.ObservationData.uncertainty = list(
+        OBS_UNCERTAINTY_SCALE * np.array(d.ObservationData.uncertainty)
+    )
+    # the same truth in every process, changing between periods
+    rng = np.random.default_rng(0)
+    spc = prior.spcs[0]
+    nstep, nlay, nrow, ncol = prior.emis[spc].shape
+    rows, cols = np.meshgrid(
+        np.linspace(0, np.pi, nrow), np.linspace(0, np.pi, ncol), indexing="ij"
+    )
+    truth = 1.0 + 0.5 * np.sin(rows) * np.cos(cols)
+    for _ in range(num + 1):
+        truth = np.clip(truth * (1.0 + PERIOD_CHANGE * rng.normal(size=truth.shape)), 0.1, None)
+    noise_seed = rng.integers(1 << 31, size=NUM_PERIODS)[num]
+
+    truth_physical = d.PhysicalData(
+        None,
+        {spc: np.broadcast_to(truth, prior.emis[spc].shape).copy()},
+        {spc: np.array(prior.bcon[spc])},
+    )
+    simulated = transform(
+        transform(transform(truth_physical, d.ModelInputData), d.ModelOutputData),
+        d.ObservationData,
+    )
+    uncertainty = np.array(d.ObservationData.uncertainty)
+    noise = np.random.default_rng(noise_seed).normal(size=uncertainty.shape)
+    user.observed = d.ObservationData(np.array(simulated.get_vector()) + uncertainty * noise)
+    model_runs.update(fwd=0, bwd=0)
+
+    main_driver.get_answer()
+    archive_path = archive_handle.get_archive_path()
+    with np.load(os.path.join(archive_path, archive_defn.minim_history, state_name)) as state:
+        cost = state["cost"]
+    result = {"archive": archive_path, "cost": cost.tolist(), "runs": model_runs}
+    print(RESULT + json.dumps(result), flush=True)
+
+
+def main(obs_file, store_path):
+    # params are read from the environment when first imported
+    os.environ["STORE_PATH"] = store_path
+
+    import numpy as np
+
+    from openmethane.fourdvar.params import archive_defn
+    from openmethane.fourdvar.util import date_handle as dt
+    from openmethane.fourdvar.util import file_handle
+
+    obs_file = os.path.realpath(obs_file)
+    source_date = file_handle.load_list(obs_file)[1]["time"].date()
+    dates = [source_date + datetime.timedelta(num) for num in range(NUM_PERIODS)]
+    met_dir, template_dir = link_inputs(source_date, dates, store_path)
+
+    def invert(num, campaign, prev_window, icon_file):
+        date = dates[num].isoformat()
+        period_obs = os.path.join(store_path, "obs", f"obs_{date}.pic.gz")
+        if not os.path.exists(period_obs):
+            shift_obs(obs_file, num, period_obs)
+        env = dict(
+            os.environ,
+            STORE_PATH=store_path,
+            EXPERIMENT=f"{campaign}_{date}",
+            START_DATE=date,
+            END_DATE=date,
+            MET_DIR=met_dir,
+            TEMPLATE_DIR=template_dir,
+            OBS_FILE_GLOB=period_obs,
+            ICON_FILE=icon_file,
+            PREVIOUS_WINDOW=prev_window,
+            CHAIN_NEXT_PERIOD=str(campaign == "chained").lower(),
+        )
+        output = subprocess.run(
+            [sys.executable, __file__, "--period", str(num)],
+            env=env,
+            check=True,
+            stdout=subprocess.PIPE,
+            text=True,
+        ).stdout
+        line = next(line for line in output.splitlines() if line.startswith(RESULT))
+        result = json.loads(line[len(RESULT) :])
+        return result["archive"], np.array(result["cost"]), result["runs"]
+
+    results = {"independent": [], "chained": []}
+    prev_archive = ""
+    icon_file = os.environ["ICON_FILE"]
+    for num in range(NUM_PERIODS):
+        archive, *result = invert(num, "chained", prev_archive, icon_file)
+        results["chained"].append(tuple(result))
+        # the independent inversion starts from the same concentrations
+        results["independent"].append(invert(num, "independent", "", icon_file)[1:])
+        prev_archive = archive
+        icon_name = dt.replace_date(archive_defn.chain_icon_file, dt.add_days(dates[num], 1))
+        icon_file = os.path.join(archive, icon_name)
+
+    best = [
+        min(cost.min() for cost, _ in period)
+        for period in zip(results["independent"], results["chained"])
+    ]
+    for name, result in results.items():
+        total = np.zeros(3, dtype=int)
+        for num, (cost, runs) in enumerate(result):
+            within = cost <= best[num] * (1 + TOLERANCE)
+            # a period that never gets within the tolerance counts all its iterations
+            converged = int(np.argmax(within)) if within.any() else len(cost) - 1
+            period_total = np.array([converged, len(cost) - 1, runs["fwd"] + runs["bwd"]])
+            total += period_total
+            reached = "" if within.any() else " (not reached)"
+            print(
+                f"{name} period {num + 1} ({dates[num]}): start cost {cost[0]:.2f}, "
+                f"{converged} iterations{reached} to within {TOLERANCE} of {best[num]:.2f}, "
+                f"{period_total[1]} iterations & {period_total[2]} model runs in total"
+            )
+        print(
+            f"{name} campaign: {total[0]} iterations to within {TOLERANCE}, "
+            f"{total[1]} iterations & {total[2]} model runs in total"
+        )
+
+
+if __name__ == "__main__":
+    if sys.argv[1] == "--period":
+        run_period(int(sys.argv[2]))
+    elif len(sys.argv) > 2:
+        main(sys.argv[1], sys.argv[2])
+    else:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            main(sys.argv[1], tmp_dir)
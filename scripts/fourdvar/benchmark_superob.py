@@ -0,0 +1,95 @@
+#
+# Copyright 2025 The Superpower Institute
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""Compare the inversion with & without super-observations, using the local stand-in for CMAQ.
+
+usage: TARGET=docker-test python benchmark_superob.py <obs_file> [store_path]
+
+Reads the observations with and without OBS_SUPEROB, then reports the number of
+observations, the time of the observation operator & adjoint forcing on the same
+forward run, and the cost before and after user_driver.minim with MAX_ITERATIONS
+iterations (default 5). The model inputs (met, templates, icon & bcon) are read
+from the TARGET environment, all outputs are written to store_path
+(default a temporary directory).
+"""
+
+import os
+import pathlib
+import runpy
+import sys
+import tempfile
+import time
+
+NREPEAT = 20
+
+
+def main(obs_file, store_path):
+    # params are read from the environment when first imported
+    os.environ["STORE_PATH"] = store_path
+    os.environ["OBS_FILE_GLOB"] = os.path.realpath(obs_file)
+    os.environ["CMAQ_SHELL"] = "/bin/sh"
+    os.environ["ADJOINT_FWD"] = f"{sys.executable} -m openmethane.fourdvar.util.local_cmaq fwd"
+    os.environ["ADJOINT_BWD"] = f"{sys.executable} -m openmethane.fourdvar.util.local_cmaq bwd"
+    os.environ.setdefault("MAX_ITERATIONS", "5")
+
+    import openmethane.fourdvar._main_driver as main_driver
+    import openmethane.fourdvar.datadef as d
+    import openmethane.fourdvar.user_driver as user
+    from openmethane.fourdvar._transform import transform
+    from openmethane.fourdvar.params import cmaq_config, input_defn
+    from openmethane.fourdvar.util import file_handle
+
+    file_handle.ensure_path(os.path.dirname(cmaq_config.emis_file))
+    file_handle.ensure_path(os.path.dirname(cmaq_config.force_file))
+    make_prior = pathlib.Path(__file__).parents[1] / "cmaq_preprocess" / "make_prior.py"
+    runpy.run_path(str(make_prior), run_name="__main__")
+
+    prior_vector = transform(user.get_background(), d.UnknownData).get_vector()
+    user.setup()
+    for superob in (False, True):
+        input_defn.superob = superob
+        user.observed = None
+        user.iter_num = 0
+        observed = user.get_observed()
+
+        model_input = transform(user.get_background(), d.ModelInputData)
+        model_output = transform(model_input, d.ModelOutputData)
+        start_time = time.time()
+        for _ in range(NREPEAT):
+            simulated = transform(model_output, d.ObservationData)
+        obs_time = (time.time() - start_time) / NREPEAT
+        residual = d.ObservationData.get_residual(observed, simulated)
+        w_residual = d.ObservationData.error_weight(residual)
+        start_time = time.time()
+        for _ in range(NREPEAT):
+            transform(w_residual, d.AdjointForcingData)
+        forcing_time = (time.time() - start_time) / NREPEAT
+
+        start_time = time.time()
+        answer = user.minim(main_driver.cost_func, main_driver.gradient_func, prior_vector)
+        print(
+            f"superob {superob}: {observed.length} observations, "
+            f"obs_operator {obs_time * 1000:.2f}ms, calc_forcing {forcing_time * 1000:.2f}ms, "
+            f"minim {answer[2]['nit']} iterations in {time.time() - start_time:.2f}s, "
+            f"cost {answer[3]['start_cost']} -> {answer[1]}"
+        )
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 2:
+        main(sys.argv[1], sys.argv[2])
+    else:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            main(sys.argv[1], tmp_dir)
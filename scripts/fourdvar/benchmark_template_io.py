@@ -0,0 +1,87 @@
+#
+# Copyright 2025 The Superpower Institute
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""Compare the bytes written creating 30 days of emission files from a template.
+
+usage: python benchmark_template_io.py <emis_template.nc> [output_dir]
+
+The full copy method (copy the template, then overwrite the emissions) is
+compared with netcdf_handle.create_from_template, which only copies the
+template structure before writing the emissions. Bytes are counted with
+/proc/self/io (linux only).
+"""
+
+import datetime
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import netCDF4
+import numpy as np
+
+from openmethane.fourdvar.util import netcdf_handle
+
+NDAYS = 30
+
+
+def bytes_written():
+    with open("/proc/self/io") as f:
+        stats = dict(line.split(": ") for line in f.read().splitlines())
+    return int(stats["wchar"])
+
+
+def full_copy(source, dest, var_change, date):
+    shutil.copyfile(source, dest)
+    with netCDF4.Dataset(dest, "a") as ncf_file:
+        for var, data in var_change.items():
+            ncf_file.variables[var][:] = data
+        netcdf_handle.set_date(ncf_file, date)
+
+
+def benchmark(method, template, output_dir, spcs):
+    rng = np.random.default_rng(0)
+    start_date = datetime.date(2022, 7, 1)
+    shape = netcdf_handle.get_variable(template, spcs).shape
+    start_bytes = bytes_written()
+    start_time = time.time()
+    for i in range(NDAYS):
+        date = start_date + datetime.timedelta(days=i)
+        var_change = {spcs: rng.uniform(size=shape).astype("f4")}
+        dest = os.path.join(output_dir, f"emis.{date:%Y%m%d}.nc")
+        method(template, dest, var_change, date)
+    return bytes_written() - start_bytes, time.time() - start_time
+
+
+def main(template, output_dir):
+    spcs = netcdf_handle.get_attr(template, "VAR-LIST").split()[0]
+    methods = {
+        "full copy": full_copy,
+        "create_from_template": lambda s, d, v, date: netcdf_handle.create_from_template(
+            s, d, var_change=v, date=date
+        ),
+    }
+    for name, method in methods.items():
+        nbytes, seconds = benchmark(method, template, output_dir, spcs)
+        print(f"{name:>20}: {nbytes / 2**20:10.1f} MiB written in {seconds:.2f}s")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 2:
+        main(sys.argv[1], sys.argv[2])
+    else:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            main(sys.argv[1], tmp_dir)
@@ -12,6 +12,7 @@ from . import utils
 from .read_config_cmaq import CMAQConfig
 import openmethane.fourdvar.datadef as d
 from openmethane.fourdvar._transform import transform
+from openmethane.fourdvar.util import ensemble
 from openmethane.util.logger import get_logger
 
 logger = get_logger(__name__)
@@ -143,11 +144,15 @@ def calculate_emissions_bias( prior_file: pathlib.Path,
     obs_file, path to observation file,
     species: name of species to solve for,
     returns: mean difference between simulated concentrations as a float.
+    notes: both runs are independent, so they run at the same time in separate workspaces.
     """
     prior = d.PhysicalData.from_file(prior_file)
-    mean_obs_emis = calculate_mean_obs( prior, obs_file)
-    prior.emis[species] *= 0. # zeroing emissions while preserving shape
-    mean_obs_no_emis = calculate_mean_obs( prior, obs_file)
+    no_emis = d.PhysicalData.from_file(prior_file)
+    no_emis.emis[species] *= 0. # zeroing emissions while preserving shape
+    d.ObservationData.from_file(obs_file)
+    output_emis, output_no_emis = ensemble.run_forward([prior, no_emis])
+    mean_obs_emis = calculate_mean_simulated(output_emis)
+    mean_obs_no_emis = calculate_mean_simulated(output_no_emis)
     return mean_obs_emis -mean_obs_no_emis
 
 def calculate_mean_obs( physical: d.PhysicalData,
@@ -162,10 +167,14 @@ def calculate_mean_obs( physical: d.PhysicalData,
     """
     modelInput = transform(physical, d.ModelInputData)
     modelOutput = transform(modelInput, d.ModelOutputData)
-    observed = d.ObservationData.from_file(obs_file)
-    simul = transform( modelOutput, d.ObservationData)
-    return simul.get_vector().mean()/1000.
+    d.ObservationData.from_file(obs_file)
+    return calculate_mean_simulated(modelOutput)
 
-    
-                        
-    
+def calculate_mean_simulated( model_output: d.ModelOutputData) -> float:
+    """ calculates mean of the observations simulated from a model output.
+    Inputs:
+    model_output: ModelOutputData, ObservationData must already be loaded from a file
+    returns: float, mean of simulated observations in ppm
+    """
+    simul = transform( model_output, d.ObservationData)
+    return simul.get_vector().mean()/1000.
@@ -20,7 +20,7 @@ for date in dates:
       if MCIP failed:
           Abort
       endif
-      Compress to netCDF4 using ncks
+      Compress to netCDF4
   endfor
 endfor
 """
@@ -33,7 +33,7 @@ from shutil import copyfile
 
 from openmethane.cmaq_preprocess.read_config_cmaq import Domain
 from openmethane.cmaq_preprocess.utils import (
-  compress_nc_file,
+  compress_nc_files,
   nested_dir,
   replace_and_write,
   run_command,
@@ -70,7 +70,7 @@ def run_mcip(
         geo_dir: directory containing geo_em.* files
         mcip_source_dir: directory containing the MCIP executable
         scripts: dictionary of scripts, including an entry with the key 'mcipRun'
-        compress_output: Compress output using ncks?
+        compress_output: Compress output to netCDF4?
         fix_simulation_start_date:  Adjust the SIMULATION_START_DATE attribute in wrfout files?
         truelat2: If not None, modify the value of truelat2 in the WRF output
             TODO: JL: Check if this is needed anymore
@@ -200,8 +200,7 @@ def run_mcip(
                 os.path.join(mcip_dir, "GRID*_*")
             )
 
-            for fname in files_to_compress:
-                compress_nc_file(fname)
+            compress_nc_files(files_to_compress)
 
 
 def fix_true_lat(out_paths: list[str], truelat2: float):
@@ -10,6 +10,7 @@ import numpy
 
 from openmethane.cmaq_preprocess.read_config_cmaq import Domain
 from openmethane.fourdvar.util import date_handle
+from openmethane.util.netcdf_compress import compress_file, compress_files
 
 
 def deg2rad(deg):
@@ -55,8 +56,16 @@ def get_distance_from_lat_lon_in_km(lat1, lon1, lat2, lon2):
     return d
 
 
+def _check_ppc(ppc: int | None) -> None:
+    if ppc is not None:
+        if not isinstance(ppc, int):
+            raise RuntimeError("Argument ppc should be an integer...")
+        elif ppc < 1 or ppc > 6:
+            raise RuntimeError("Argument ppc should be between 1 and 6...")
+
+
 def compress_nc_file(filename: str | pathlib.Path, ppc: int | None = None) -> None:
-    """Compress a netCDF3 file to netCDF4 using ncks
+    """Compress a netCDF3 file to netCDF4 (zlib level 4 with shuffle)
 
     Args:
         filename: Path to the netCDF3 file to compress
@@ -68,25 +77,38 @@ def compress_nc_file(filename: str | pathlib.Path, ppc: int | None = None) -> No
 
     if not os.path.exists(filename):
         raise RuntimeError(f"File {filename} not found...")
+    _check_ppc(ppc)
 
-    print(f"Compress file {filename} with ncks")
-    command = f"ncks -4 -L4 -O {filename} {filename}"
-    print("\t" + command)
-    command_list = command.split(" ")
-    if ppc is not None:
-        if not isinstance(ppc, int):
-            raise RuntimeError("Argument ppc should be an integer...")
-        elif ppc < 1 or ppc > 6:
-            raise RuntimeError("Argument ppc should be between 1 and 6...")
-        else:
-            ppcText = f"--ppc default={ppc}"
-            command_list = [command_list[0]] + ppcText.split(" ") + command_list[1:]
-
-    stdout, stderr = run_command(command_list)
-    if len(stderr) > 0 or len(stdout) > 0:
-        print("stdout = " + stdout)
-        print("stderr = " + stderr)
-        raise RuntimeError("Error from ncks...")
+    print(f"Compress file {filename}")
+    compress_file(filename, filename, complevel=4, shuffle=True, significant_digits=ppc)
+
+
+def compress_nc_files(
+    filenames: list[str | pathlib.Path], ppc: int | None = None, max_workers: int | None = None
+) -> None:
+    """Compress several netCDF3 files to netCDF4 concurrently
+
+    Args:
+        filenames: Paths to the netCDF3 files to compress
+        ppc: number of significant digits to retain (default is to retain all)
+        max_workers: number of files to compress at once (default is the number of CPUs)
+
+    Returns:
+        Nothing
+    """
+    for filename in filenames:
+        if not os.path.exists(filename):
+            raise RuntimeError(f"File {filename} not found...")
+    _check_ppc(ppc)
+
+    print(f"Compress {len(filenames)} files")
+    compress_files(
+        [(filename, filename) for filename in filenames],
+        max_workers=max_workers,
+        complevel=4,
+        shuffle=True,
+        significant_digits=ppc,
+    )
 
 
 def load_scripts(scripts):
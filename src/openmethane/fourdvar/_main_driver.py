@@ -21,7 +21,9 @@ import numpy as np
 from openmethane.fourdvar import datadef as d
 from openmethane.fourdvar import user_driver
 from openmethane.fourdvar._transform import transform
-from openmethane.fourdvar.params import archive_defn, data_access
+from openmethane.fourdvar.params import archive_defn, data_access, input_defn
+from openmethane.fourdvar.transfunc.condition import log_emis_adjoint
+from openmethane.fourdvar.util import archive_handle, period_chain
 from openmethane.util.logger import get_logger
 from openmethane.fourdvar.env import env
 
@@ -51,23 +53,33 @@ def cost_func(vector,
             has_skipped = True
         except AssertionError:
             logger.debug("Tried and failed to skip fwd run.")
+    model_time = 0.0
     if has_skipped is False:
         model_in = transform(physical, d.ModelInputData)
+        model_start = time.time()
         model_out = transform(model_in, d.ModelOutputData)
+        model_time += time.time() - model_start
         data_access.prev_vector = vector.copy()
 
 
     simulated = transform(model_out, d.ObservationData)
+    un_vector = unknown.get_vector()
+    if data_access.bcon_response is not None:
+        # replace the boundary unknowns of the model run with the optimal values
+        un_vector, sim_vector = data_access.bcon_response.project(
+            un_vector, simulated.get_vector()
+        )
+        simulated = d.ObservationData(sim_vector)
+        physical = transform(d.UnknownData(un_vector), d.PhysicalData)
 
     if archive_obs_file is not None:
-        simulated.archive(archive_obs_file, force_lite=True)
+        archive_handle.submit(simulated.archive, archive_obs_file, force_lite=True)
         logger.info(f"archiving simulated concentrations in {archive_obs_file}")
 
     residual = d.ObservationData.get_residual(observed, simulated)
     w_residual = d.ObservationData.error_weight(residual)
 
     bg_vector = bg_unknown.get_vector()
-    un_vector = unknown.get_vector()
 
     bg_cost = 0.5 * np.sum((un_vector - bg_vector) ** 2)
 
@@ -76,6 +88,26 @@ def cost_func(vector,
     ob_cost = 0.5 * np.sum(res_vector * wres_vector)
     cost = bg_cost + ob_cost
 
+    # Calculate statistics about the current step
+    bias = (observed.get_vector() - simulated.get_vector()).mean()
+    chisq = (
+        ((observed.get_vector() - simulated.get_vector()) / np.array(observed.uncertainty)) ** 2
+    ).sum() / observed.length
+
+    # keep the products of this evaluation for the iteration callback
+    data_access.prev_evaluation = {
+        "vector": vector.copy(),
+        "physical": physical,
+        "simulated": simulated,
+        "cost": {
+            "cost": cost,
+            "bg_cost": bg_cost,
+            "ob_cost": ob_cost,
+            "bias": bias,
+            "chisq": chisq,
+        },
+    }
+
     unknown.cleanup()
     physical.cleanup()
     if data_access.allow_fwd_skip is False:
@@ -89,13 +121,10 @@ def cost_func(vector,
 
     end_time = time.time()
 
-    # Calculate statistics about the current step
-    bias = (observed.get_vector() - simulated.get_vector()).mean()
-    chisq = (
-        ((observed.get_vector() - simulated.get_vector()) / np.array(observed.uncertainty)) ** 2
-    ).sum() / observed.length
-
-    logger.info(f"cost={cost} bias={bias} chisq={chisq} in {int(end_time - start_time)}s")
+    logger.info(
+        f"cost={cost} bias={bias} chisq={chisq} in {int(end_time - start_time)}s "
+        f"({end_time - start_time - model_time:.2f}s outside CMAQ)"
+    )
     return cost
 
 
@@ -122,26 +151,44 @@ def gradient_func(vector):
             has_skipped = True
         except AssertionError:
             logger.debug("Tried and failed to skip fwd run.")
+    model_time = 0.0
     if has_skipped is False:
         model_in = transform(physical, d.ModelInputData)
+        model_start = time.time()
         model_out = transform(model_in, d.ModelOutputData)
+        model_time += time.time() - model_start
         data_access.prev_vector = vector.copy()
 
     simulated = transform(model_out, d.ObservationData)
+    un_vector = unknown.get_vector()
+    if data_access.bcon_response is not None:
+        # replace the boundary unknowns of the model run with the optimal values
+        un_vector, sim_vector = data_access.bcon_response.project(
+            un_vector, simulated.get_vector()
+        )
+        simulated = d.ObservationData(sim_vector)
 
 
     residual = d.ObservationData.get_residual(observed, simulated)
     w_residual = d.ObservationData.error_weight(residual)
 
     adj_forcing = transform(w_residual, d.AdjointForcingData)
+    model_start = time.time()
     sensitivity = transform(adj_forcing, d.SensitivityData)
+    model_time += time.time() - model_start
     phys_sense = transform(sensitivity, d.PhysicalAdjointData)
+    phys_sense = log_emis_adjoint(phys_sense, physical)
     un_gradient = transform(phys_sense, d.UnknownData)
 
     bg_vector = bg_unknown.get_vector()
-    un_vector = unknown.get_vector()
     bg_grad = un_vector - bg_vector
     gradient = bg_grad + un_gradient.get_vector()
+    if data_access.bcon_response is not None:
+        # zero at the optimal boundary unknowns, up to rounding
+        gradient[data_access.bcon_response.index] = 0.0
+    evaluation = data_access.prev_evaluation
+    if evaluation is not None and np.array_equal(evaluation["vector"], vector):
+        evaluation["gradient"] = np.array(gradient)
 
     unknown.cleanup()
     physical.cleanup()
@@ -159,7 +206,10 @@ def gradient_func(vector):
     un_gradient.cleanup()
 
     end_time = time.time()
-    logger.info(f"gradient norm = {np.linalg.norm(gradient)} in {int(end_time - start_time)}s")
+    logger.info(
+        f"gradient norm = {np.linalg.norm(gradient)} in {int(end_time - start_time)}s "
+        f"({end_time - start_time - model_time:.2f}s outside CMAQ)"
+    )
     return np.array(gradient)
 
 
@@ -175,9 +225,16 @@ def get_answer():
 
     user_driver.setup()
     start_vector = bg_unknown.get_vector()
+    preconditioner = None
+    if input_defn.prev_window:
+        # warm start from the posterior & its covariance of the previous period
+        start_physical = period_chain.map_posterior(input_defn.prev_window, bg_physical)
+        start_vector = transform(start_physical, d.UnknownData).get_vector()
+        preconditioner = period_chain.load_posterior(input_defn.prev_window, len(start_vector))
     min_output = user_driver.minim(cost_func, gradient_func, start_vector,
                                    allow_negative_emissions = allow_negative_emissions,
-                                   physical_template = bg_physical)
+                                   physical_template = bg_physical,
+                                   preconditioner = preconditioner)
     out_vector = min_output[0]
     out_unknown = d.UnknownData(out_vector)
     out_physical = transform(out_unknown, d.PhysicalData)
@@ -62,10 +62,12 @@ class AdjointForcingData(FourDVarData):
         if dirname is not None:
             save_path = os.path.join(save_path, dirname)
         ensure_path(save_path, inc_file=False)
+        paths = []
         for record in self.file_data.values():
             source = record["actual"]
             dest = os.path.join(save_path, record["archive"])
-            ncf.copy_compress(source, dest)
+            paths.append((source, dest))
+        ncf.copy_compress_many(paths)
 
     @classmethod
     def get_kwargs_dict(cls):
@@ -110,6 +112,36 @@ class AdjointForcingData(FourDVarData):
             )
         return cls()
 
+    @classmethod
+    def create_sparse(cls, **kwargs):
+        """application: create an instance of AdjointForcingData writing only non-zero timesteps
+        input: user-defined
+        output: AdjointForcingData.
+
+        eg: new_forcing = datadef.AdjointForcingData.create_sparse(
+                **{"force.20220701": ([3, 4], {"CH4": np.ndarray(2, nlay, nrow, ncol)})}
+            )
+
+        notes: the forcing template must be zero valued, any timestep not listed
+        for a record is left as zero.
+        """
+        # each input arg is a tuple (timesteps, {spcs: np.ndarray}), matching to
+        # a record in file_details[class_name]. arrays only hold the listed timesteps.
+        fdata = get_filedict(cls.__name__)
+        msg = "input args incompatible with file list"
+        assert set(fdata.keys()) == set(kwargs.keys()), msg
+
+        for label, record in fdata.items():
+            tsteps, data = kwargs[label]
+            ncf.create_from_template_records(
+                record["template"],
+                record["actual"],
+                tsteps,
+                var_change=data,
+                date=record["date"],
+            )
+        return cls()
+
     @classmethod
     def load_from_archive(cls, dirname):
         """Create an AdjointForcingData from previous archived files.
@@ -121,10 +153,12 @@ class AdjointForcingData(FourDVarData):
         pathname = os.path.realpath(dirname)
         assert os.path.isdir(pathname), "dirname must be an existing directory"
         filedict = get_filedict(cls.__name__)
+        paths = []
         for record in filedict.values():
             source = os.path.join(pathname, record["archive"])
             dest = record["actual"]
-            ncf.copy_compress(source, dest)
+            paths.append((source, dest))
+        ncf.copy_compress_many(paths)
         return cls()
 
     def get_vector(self):
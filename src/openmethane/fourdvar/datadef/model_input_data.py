@@ -66,10 +66,12 @@ class ModelInputData(FourDVarData):
         if dirname is not None:
             save_path = os.path.join(save_path, dirname)
         ensure_path(save_path, inc_file=False)
+        paths = []
         for record in self.file_data.values():
             source = record["actual"]
             dest = os.path.join(save_path, record["archive"])
-            ncf.copy_compress(source, dest)
+            paths.append((source, dest))
+        ncf.copy_compress_many(paths)
 
     @classmethod
     def create_new(cls, **kwargs):
@@ -108,10 +110,12 @@ class ModelInputData(FourDVarData):
         pathname = os.path.realpath(dirname)
         assert os.path.isdir(pathname), "dirname must be an existing directory"
         filedict = get_filedict(cls.__name__)
+        paths = []
         for record in filedict.values():
             source = os.path.join(pathname, record["archive"])
             dest = record["actual"]
-            ncf.copy_compress(source, dest)
+            paths.append((source, dest))
+        ncf.copy_compress_many(paths)
         return cls()
 
     @classmethod
@@ -121,10 +125,12 @@ class ModelInputData(FourDVarData):
         output: ModelInputData.
         """
         filedict = get_filedict(cls.__name__)
+        paths = []
         for record in filedict.values():
             source = record["template"]
             dest = record["actual"]
-            ncf.copy_compress(source, dest)
+            paths.append((source, dest))
+        ncf.copy_compress_many(paths)
         return cls()
 
     def get_vector(self):
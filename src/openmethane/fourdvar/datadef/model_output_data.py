@@ -18,6 +18,7 @@ import os
 
 import numpy as np
 
+import openmethane.fourdvar.util.date_handle as dt
 import openmethane.fourdvar.util.netcdf_handle as ncf
 from openmethane.fourdvar.datadef.abstract._fourdvar_data import FourDVarData
 from openmethane.fourdvar.util.archive_handle import get_archive_path
@@ -60,7 +61,13 @@ class ModelOutputData(FourDVarData):
         eg: new_output =  datadef.ModelOutputData( filelist )
         """
         # check all required files exist and match attributes with templates
-        self.file_data = get_filedict(self.__class__.__name__)
+        # dates CMAQ is not run for (see date_handle.get_model_datelist) have no output
+        model_dates = dt.get_model_datelist()
+        self.file_data = {
+            label: record
+            for label, record in get_filedict(self.__class__.__name__).items()
+            if record["date"] in model_dates
+        }
         for record in self.file_data.values():
             actual = record["actual"]
             template = record["template"]
@@ -91,10 +98,12 @@ class ModelOutputData(FourDVarData):
         if dirname is not None:
             save_path = os.path.join(save_path, dirname)
         ensure_path(save_path, inc_file=False)
+        paths = []
         for record in self.file_data.values():
             source = record["actual"]
             dest = os.path.join(save_path, record["archive"])
-            ncf.copy_compress(source, dest)
+            paths.append((source, dest))
+        ncf.copy_compress_many(paths)
 
     @classmethod
     def load_from_archive(cls, dirname):
@@ -107,10 +116,12 @@ class ModelOutputData(FourDVarData):
         pathname = os.path.realpath(dirname)
         assert os.path.isdir(pathname), "dirname must be an existing directory"
         filedict = get_filedict(cls.__name__)
+        paths = []
         for record in filedict.values():
             source = os.path.join(pathname, record["archive"])
             dest = record["actual"]
-            ncf.copy_compress(source, dest)
+            paths.append((source, dest))
+        ncf.copy_compress_many(paths)
         return cls()
 
     def get_vector(self):
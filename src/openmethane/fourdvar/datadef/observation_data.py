@@ -27,8 +27,10 @@ import openmethane.fourdvar.util.date_handle as dt
 import openmethane.fourdvar.util.file_handle as fh
 import openmethane.fourdvar.util.netcdf_handle as ncf
 from openmethane.fourdvar.datadef.abstract._fourdvar_data import FourDVarData
-from openmethane.fourdvar.params import date_defn, template_defn
+from openmethane.fourdvar.params import date_defn, input_defn, template_defn
 from openmethane.fourdvar.util.archive_handle import get_archive_path
+from openmethane.fourdvar.util.obs_error import build_error_blocks
+from openmethane.fourdvar.util.superob import superob
 from openmethane.util.logger import get_logger
 
 logger = get_logger(__name__)
@@ -95,6 +97,43 @@ def load_observations_from_file(
     return ObservationCollection(domain=domain, observations=obs_list)
 
 
+def load_archive_values(
+    filename: str | pathlib.Path,
+    meta_filename: str | pathlib.Path,
+) -> list[dict[str, Any]]:
+    """
+    Reconstruct an obs-lite archive from a compact values archive
+
+    Parameters
+    ----------
+    filename
+        Path to the ``.npz`` file written by ``ObservationData.archive_values``
+    meta_filename
+        Path to the metadata file written by ``ObservationData.archive_meta``
+
+    Returns
+    -------
+        The same list as reading an archive written with
+        ``ObservationData.archive(force_lite=True)``,
+        the domain followed by a dictionary for each observation.
+    """
+    domain, *meta_list = fh.load_list(meta_filename)
+    with np.load(filename) as arrays:
+        values = arrays["value"]
+
+    if len(values) != len(meta_list):
+        raise ValueError(f"{filename} does not match the observations in {meta_filename}")
+
+    obs_list = []
+    for meta, value in zip(meta_list, values):
+        odict = {k: v for k, v in meta.items() if k not in ("uncertainty", "lite_coord")}
+        odict["value"] = float(value)
+        odict["uncertainty"] = meta["uncertainty"]
+        odict["lite_coord"] = meta["lite_coord"]
+        obs_list.append(odict)
+    return [domain, *obs_list]
+
+
 class ObservationData(FourDVarData):
     """application: vector of observations, observed or simulated
     Can be either 'full' or 'lite' file.
@@ -113,8 +152,13 @@ class ObservationData(FourDVarData):
     ind_by_date = None
     spcs = None
     lite_coord = None
+    # factorised block-diagonal error covariance, None for independent errors
+    error_blocks = None
 
     archive_name = "obsset.pickle.zip"
+    # static metadata shared by every compact (values only) archive
+    meta_archive_name = "obs_meta.pic.gz"
+    meta_archive_path = None
 
     def __init__(self, val_list, is_lite=False):
         """application: create an instance of ObservationData
@@ -177,6 +221,53 @@ class ObservationData(FourDVarData):
         archive_list = [domain, *obs_list]
         fh.save_list(archive_list, save_path)
 
+    @classmethod
+    def archive_meta(cls):
+        """Save the static observation metadata to the archive/experiment directory.
+        input: None
+        output: string (path to the metadata file).
+
+        notes: the file is only written once for each set of observations,
+        it holds an obs-lite archive without any observation values.
+        """
+        save_path = os.path.join(get_archive_path(), cls.meta_archive_name)
+        if cls.meta_archive_path == save_path:
+            return save_path
+
+        domain = deepcopy(cls.grid_attr)
+        domain["SDATE"] = np.int32(dt.replace_date("<YYYYMMDD>", date_defn.start_date))
+        domain["EDATE"] = np.int32(dt.replace_date("<YYYYMMDD>", date_defn.end_date))
+        domain["is_lite"] = True
+
+        obs_list = []
+        for i in range(cls.length):
+            odict = dict(cls.misc_meta[i])
+            odict["uncertainty"] = cls.uncertainty[i]
+            odict["lite_coord"] = cls.lite_coord[i]
+            obs_list.append(odict)
+        fh.save_list([domain, *obs_list], save_path)
+
+        cls.meta_archive_path = save_path
+        return save_path
+
+    def archive_values(self, name, observed=None):
+        """Save a compact copy of the values to the archive/experiment directory.
+        input: string, ObservationData or None
+        output: None.
+
+        notes: writes a numpy .npz file holding the 'value' array and,
+        if observed is provided, the 'residual' (self - observed).
+        the static metadata is written once by archive_meta,
+        load_archive_values reconstructs the equivalent obs-lite archive.
+        """
+        self.archive_meta()
+        save_path = os.path.join(get_archive_path(), name)
+        arrays = {"value": self.get_vector()}
+        if observed is not None:
+            arrays["residual"] = self.get_vector() - observed.get_vector()
+        with open(save_path, "wb") as f:
+            np.savez_compressed(f, **arrays)
+
     @classmethod
     def check_grid(cls, other_grid: pathlib.Path | str):
         """Check that griddata matches other.
@@ -186,6 +277,18 @@ class ObservationData(FourDVarData):
         attr_list = cls.grid_attr.keys()
         return ncf.match_attr(cls.grid_attr, other_grid, attr_list)
 
+    @classmethod
+    def get_last_date(cls) -> datetime.date | None:
+        """Get the last date with observations.
+        input: None
+        output: datetime.date (None if there are no observations).
+        """
+        assert cls.ind_by_date is not None, "ind_by_date is not set"
+        obs_dates = [ymd for ymd, ilist in cls.ind_by_date.items() if len(ilist) > 0]
+        if len(obs_dates) == 0:
+            return None
+        return datetime.datetime.strptime(max(obs_dates), "%Y%m%d").date()
+
     @classmethod
     def error_weight(cls, res):
         """application: return residual of observations weighted by the inverse error covariance
@@ -193,10 +296,29 @@ class ObservationData(FourDVarData):
         output: ObservationData.
 
         eg: weighted_residual = datadef.ObservationData.weight( residual )
+
+        notes: with correlated errors (see util/obs_error.py) each block of
+        observations is weighted with its cached cholesky factor.
         """
+        if cls.error_blocks is not None:
+            return cls(cls.error_blocks.weight(res.get_vector()))
         weighted = [v / (u**2) for v, u in zip(res.value, res.uncertainty)]
         return cls(weighted)
 
+    @classmethod
+    def whiten(cls, arr):
+        """application: scale values by the inverse square root of the error covariance
+        input: np.ndarray (nobs, ...)
+        output: np.ndarray (nobs, ...).
+
+        notes: the whitened residual has independent unit variance errors,
+        so the observation cost is half its sum of squares.
+        """
+        if cls.error_blocks is not None:
+            return cls.error_blocks.whiten(arr)
+        arr = np.asarray(arr, dtype=float)
+        return arr / np.array(cls.uncertainty).reshape((-1,) + (1,) * (arr.ndim - 1))
+
     @classmethod
     def get_residual(cls, observed, simulated):
         """application: return the residual of 2 sets of observations
@@ -225,6 +347,10 @@ class ObservationData(FourDVarData):
             is_lite = obs.domain.pop("is_lite")
         else:
             is_lite = False
+        if input_defn.superob is True and is_lite is False:
+            nobs = len(obs.observations)
+            obs.observations = superob(obs.observations)
+            logger.info(f"super-obbing reduced {nobs} observations to {len(obs.observations)}")
         if cls.grid_attr is not None:
             logger.warning("Overwriting ObservationData.grid_attr")
         cls.grid_attr = obs.domain
@@ -262,6 +388,9 @@ class ObservationData(FourDVarData):
         if cls.uncertainty is not None:
             logger.warning("Overwriting ObservationData.uncertainty")
         cls.uncertainty = unc
+        cls.error_blocks = build_error_blocks(
+            obs.observations, unc, input_defn.obs_error_blocks, input_defn.obs_error_corr_km
+        )
         if cls.alpha_scale is not None:
             logger.warning("Overwriting ObservationData.alpha_scale")
         # cls.alpha_scale = alp
@@ -274,6 +403,7 @@ class ObservationData(FourDVarData):
         if cls.misc_meta is not None:
             logger.warning("Overwriting ObservationData.misc_meta")
         cls.misc_meta = obs.observations
+        cls.meta_archive_path = None
         if is_lite is False:
             if cls.weight_grid is not None:
                 logger.warning("Overwriting ObservationData.weight_grid")
@@ -30,6 +30,52 @@ iter_model_output = True
 # archive observation-lite of each successful iteration
 iter_obs_lite = True
 
+# directory in the experiment directory holding the minimizer evaluations & L-BFGS state,
+# used to resume an interrupted minimization (see restart_script.py)
+minim_history = "lbfgs_history"
+
+# files in the experiment directory holding the jacobian built by MINIM_SOLVER=jacobian
+# (reused to resume an interrupted build) and the posterior covariance & averaging kernel
+jacobian = "jacobian.npz"
+jacobian_posterior = "jacobian_posterior.npz"
+# file in the experiment directory holding the observation responses to the
+# boundary condition unknowns, built with BCON_RESPONSE=true
+bcon_response = "bcon_response.npz"
+
+# uncertainty reduction (1 - posterior / prior standard deviation) of every unknown and of
+# the emissions of each input_defn.uncertainty_regions, written by user_driver.post_process
+cell_uncertainty_reduction = "posterior-uncertainty-reduction.nc"
+region_uncertainty_reduction = "posterior-region-uncertainty-reduction.nc"
+
+# scaling of the posterior emissions & boundary conditions, written by user_driver.post_process
+posterior_multipliers = "posterior-multipliers.nc"
+# concentrations at the end of the period for the solution, the initial conditions of a
+# following period chained to this one (see util/period_chain.py)
+chain_icon_file = "chain_icon.<YYYYMMDD>.nc"
+# low-rank estimate of the posterior covariance of the unknowns from the lbfgs iterations,
+# the preconditioner of a following period chained to this one (see util/period_chain.py)
+chain_posterior = "chain_posterior.npz"
+
+# convergence monitor metrics of every iteration & its stopping decision, see util/convergence.py
+convergence = "convergence.json"
+
+# write archives from the minimizer in a background process
+background_archive = env.bool("ARCHIVE_BACKGROUND", True)
+# maximum number of archives waiting to be written before the minimizer blocks
+background_queue_size = env.int("ARCHIVE_QUEUE_SIZE", 4)
+
+# zlib compression level of archived netCDF files
+compress_level = 4
+# chunk length for named dimensions of archived netCDF files (eg: {"TSTEP": 1}),
+# None uses the netCDF library default chunking.
+compress_chunking = None
+# number of processes used to compress archived netCDF files at once
+compress_workers = env.int("ARCHIVE_COMPRESS_WORKERS", 4)
+
+# how to create files that are an unchanged copy of their template (see netcdf_handle).
+# one of "copy", "hardlink" or "reflink", links fall back to copying if unsupported.
+unchanged_copy_mode = env.str("UNCHANGED_COPY_MODE", "copy")
+
 # experiment name & name of directory to save results in
 # experiment = 'pert_pert_test'##'example_experiment'
 # experiment = 'real_test'
@@ -16,6 +16,7 @@
 import os
 
 from openmethane.fourdvar.env import env
+from openmethane.fourdvar.params import archive_defn, input_defn
 from openmethane.fourdvar.params.root_path_defn import store_path
 from openmethane.util.logger import get_logger
 
@@ -157,7 +158,13 @@ fwd_xfirst_file = os.path.join(output_path, "XFIRST.<YYYYMMDD>")
 bwd_xfirst_file = os.path.join(output_path, "XFIRST.bwd.<YYYYMMDD>")
 
 # input files
-icon_file = env.str("ICON_FILE")
+if input_defn.prev_window:
+    # concentrations of the previous period at the start of this one, only read. with
+    # inc_icon the icon_file is written (see util/cmaq_io_files.py), not a chained file
+    assert input_defn.inc_icon is False, "PREVIOUS_WINDOW needs input_defn.inc_icon off"
+    icon_file = os.path.join(input_defn.prev_window, archive_defn.chain_icon_file)
+else:
+    icon_file = env.str("ICON_FILE")
 bcon_file = env.str("BCON_FILE")
 emis_file = env.str("EMIS_FILE", os.path.join(emis_path, "emis.<YYYY-MM-DD>.nc"))
 force_file = env.str("FORCE_FILE", os.path.join(cmaq_base, "force", "ADJ_FORCE.<YYYYMMDD>.nc"))
@@ -244,12 +251,42 @@ wipeout_bwd_list = [
     bwd_stdout_log,
 ]
 
+# record of the files created by each fwd & bwd run, wipeout only deletes these files.
+# if missing, wipeout falls back to searching for all files matching the lists above.
+manifest_file = os.path.join(cmaq_base, "wipeout_manifest.json")
+
 # drivers
 fwd_prog = env.str("ADJOINT_FWD")
 bwd_prog = env.str("ADJOINT_BWD")
 
+# record the completed days of each fwd & bwd run with a hash of their inputs,
+# repeating a run with identical inputs skips the completed days with valid outputs.
+# every input file is read to hash it for each run, so only enable it to restart
+# interrupted runs (the inputs of the minimizer change every iteration).
+resume_runs = env.bool("CMAQ_RESUME", False)
+progress_file = os.path.join(cmaq_base, "run_progress.json")
+# outputs checked before skipping a completed day
+fwd_resume_check = [conc_file, last_grid_file]
+bwd_resume_check = [conc_sense_file, emis_sense_file]
+
+# number of times a failed single day run is retried.
+# waits retry_delay seconds before the first retry, doubling for each following retry.
+run_retries = env.int("CMAQ_RETRIES", 0)
+retry_delay = env.float("CMAQ_RETRY_DELAY", 30.0)
+
+# independent runs (openmethane.fourdvar.util.ensemble) each use a workspace in ensemble_path
+ensemble_path = os.path.join(cmaq_base, "ensemble")
+# CPU/MPI slots shared by concurrent ensemble runs, each run uses npcol * nprow slots.
+# 0 uses the number of CPUs.
+ensemble_slots = env.int("CMAQ_ENSEMBLE_SLOTS", 0)
+
+# transport of the local stand-in model (openmethane.fourdvar.util.local_cmaq),
+# ignored by CMAQ. courant numbers "x y" of the upwind advection & decay rate (1/s)
+local_courant = env.str("LOCAL_CMAQ_COURANT", "0 0")
+local_decay = env.float("LOCAL_CMAQ_DECAY", 0.0)
+
 # shell used to call drivers
-cmd_shell = "/bin/csh"
+cmd_shell = env.str("CMAQ_SHELL", "/bin/csh")
 
 # shell input added before running drivers
 cmd_preamble = ""
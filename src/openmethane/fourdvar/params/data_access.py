@@ -19,3 +19,16 @@ allow_fwd_skip = False
 
 # previous unknown vector run through CMAQ_fwd
 prev_vector = None
+
+# last date simulated by CMAQ, set from the observations when input_defn.trim_to_obs is True.
+# None simulates every date.
+model_end_date = None
+
+# util.bcon_response.BconResponse solving the boundary condition unknowns of every
+# cost & gradient evaluation in observation space, None includes them in the minimization
+bcon_response = None
+
+# products of the last cost function evaluation, reused by the iteration callback
+# dict with keys: vector, physical, simulated, cost
+# and gradient once the gradient function has been evaluated at the same vector
+prev_evaluation = None
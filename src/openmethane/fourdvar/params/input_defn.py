@@ -27,3 +27,45 @@ obs_file = os.path.join(store_path, env.str("OBS_FILE_GLOB", "input/test_obs.pic
 
 # include model initial conditions in solution
 inc_icon = False
+
+# solve for one emission unknown per cluster of grid cells instead of per cell,
+# "block:<rows>x<cols>", "landuse" or path to a NetCDF file with a CLUSTER variable.
+# see util/cluster_map.py, leave empty to solve for every grid cell
+cluster_map = env.str("CLUSTER_MAP", "")
+
+# regions of the posterior emission uncertainty reduction written by user_driver.post_process,
+# in the same format as cluster_map. leave empty for the whole domain
+uncertainty_regions = env.str("UNCERTAINTY_REGIONS", "")
+
+# correlation length scales of the prior emission errors, in days between emission timesteps
+# and km between grid cells (spatial correlation needs an empty cluster_map).
+# see util/prior_correlation.py, 0 for uncorrelated errors
+emis_corr_days = env.float("EMIS_CORRELATION_DAYS", 0.0)
+emis_corr_km = env.float("EMIS_CORRELATION_KM", 0.0)
+
+# blocks of observations with correlated errors, "orbit" or "scanline:<seconds>".
+# see util/obs_error.py, leave empty for independent observation errors
+obs_error_blocks = env.str("OBS_ERROR_BLOCKS", "")
+# correlation length of the observation errors within a block, in km
+obs_error_corr_km = env.float("OBS_ERROR_CORRELATION_KM", 10.0)
+
+# average the observations sharing a model cell & time step into super-observations.
+# see util/superob.py
+superob = env.bool("OBS_SUPEROB", False)
+
+# skip CMAQ runs for the days after the last observation
+trim_to_obs = env.bool("TRIM_TO_OBS", True)
+
+# solve for the log of the emission scaling, keeping the emissions positive without bounds.
+# emis_unc is then the uncertainty of the log scaling, see transfunc/condition.py
+log_emis = env.bool("LOG_EMISSIONS", False)
+
+# archive directory of the inversion of the previous (or overlapping) period. the minimizer
+# starts from its posterior, preconditioned by its covariance, and the model from its
+# concentrations at the start of this period. see util/period_chain.py,
+# leave empty for an independent inversion
+prev_window = env.str("PREVIOUS_WINDOW", "")
+# archive the final concentrations & the posterior covariance estimated from the lbfgs
+# iterations, for a following period chained to this one. archiving the concentrations
+# runs the model for the solution again unless the last run was of it for every day
+chain_next = env.bool("CHAIN_NEXT_PERIOD", False)
@@ -14,28 +14,97 @@
 # limitations under the License.
 #
 
+import numpy as np
+
 import openmethane.fourdvar.util.cmaq_handle as cmaq
+import openmethane.fourdvar.util.netcdf_handle as ncf
 from openmethane.fourdvar.datadef import AdjointForcingData, ObservationData
+from openmethane.fourdvar.params import template_defn
+from openmethane.fourdvar.util.cmaq_io_files import get_filedict
 
 ppm2ppb = 1e3
 convFac = ppm2ppb
 
+# observation -> forcing cell mapping, built once per set of observations
+forcing_index = None
+forcing_index_source = None
+# forcing arrays reused between calls, only holding timesteps with observations
+forcing_buffer = {}
 
-def calc_forcing(w_residual):
-    """application: calculate the adjoint forcing values from the weighted residual of observations
-    input: ObservationData  (weighted residuals)
-    output: AdjointForcingData.
+
+def get_forcing_index():
+    """Map every observation weight onto the forcing records it touches.
+    input: None
+    output: dict ('force.<YYYYMMDD>': {
+                'tsteps': np.ndarray (sorted timesteps containing observations),
+                spcs: (obs_index, weight, (buffer_step, lay, row, col)) }).
     """
-    kwargs = AdjointForcingData.get_kwargs_dict()
+    index = {}
     for ymd, ilist in ObservationData.ind_by_date.items():
-        spc_dict = kwargs["force." + ymd]
+        by_spc = {}
         for i in ilist:
             for coord, weight in ObservationData.weight_grid[i].items():
                 if str(coord[0]) == ymd:
                     step, lay, row, col, spc = coord[1:]
-                    w_val = convFac * w_residual.value[i] * weight
-                    spc_dict[spc][step, lay, row, col] += w_val
+                    by_spc.setdefault(str(spc), []).append((i, weight, step, lay, row, col))
+
+        all_steps = [c[2] for clist in by_spc.values() for c in clist]
+        tsteps = np.unique(np.array(all_steps, dtype=int))
+        record = {"tsteps": tsteps}
+        for spc, clist in by_spc.items():
+            arr = np.array(clist, dtype=float).T
+            obs_ind = arr[0].astype(int)
+            step = np.searchsorted(tsteps, arr[2].astype(int))
+            cell = (step, *(a.astype(int) for a in arr[3:]))
+            record[spc] = (obs_ind, arr[1], cell)
+        index["force." + ymd] = record
+    return index
+
+
+def get_buffer(label, spc, nstep):
+    """Get a zeroed forcing array for nstep timesteps, reusing previous allocations.
+    input: string, string, int
+    output: np.ndarray (nstep, nlay, nrow, ncol).
+    """
+    global forcing_buffer
+    buf = forcing_buffer.get((label, spc))
+    if buf is None or buf.shape[0] != nstep:
+        shape = ncf.get_variable(template_defn.force, spc).shape
+        buf = np.zeros((nstep, *shape[1:]))
+        forcing_buffer[(label, spc)] = buf
+    else:
+        buf.fill(0.0)
+    return buf
+
+
+def calc_forcing(w_residual):
+    """application: calculate the adjoint forcing values from the weighted residual of observations
+    input: ObservationData  (weighted residuals)
+    output: AdjointForcingData.
+
+    notes: only timesteps containing observations are held in memory and written,
+    all other timesteps keep the (zero) value of the forcing template.
+    """
+    global forcing_index
+    global forcing_index_source
+    if forcing_index is None or forcing_index_source is not ObservationData.weight_grid:
+        forcing_index = get_forcing_index()
+        forcing_index_source = ObservationData.weight_grid
+
+    spcs = ncf.get_attr(template_defn.force, "VAR-LIST").split()
+    w_value = np.array(w_residual.value)
+    kwargs = {}
+    for label in get_filedict(AdjointForcingData.__name__).keys():
+        record = forcing_index.get(label, {"tsteps": np.zeros(0, dtype=int)})
+        tsteps = record["tsteps"]
+        spc_dict = {}
+        for spc in spcs:
+            spc_dict[spc] = get_buffer(label, spc, len(tsteps))
+            if spc in record:
+                obs_ind, weight, cell = record[spc]
+                np.add.at(spc_dict[spc], cell, convFac * w_value[obs_ind] * weight)
+        kwargs[label] = (tsteps, spc_dict)
 
-    cmaq.wipeout_bwd()
+    cmaq.wipeout_bwd(keep_progress=True)
 
-    return AdjointForcingData.create_new(**kwargs)
+    return AdjointForcingData.create_sparse(**kwargs)
@@ -16,9 +16,12 @@
 
 import numpy as np
 
-from openmethane.fourdvar.datadef import UnknownData
+from openmethane.fourdvar.datadef import PhysicalAdjointData, UnknownData
 from openmethane.fourdvar.datadef.abstract._physical_abstract_data import PhysicalAbstractData
+from openmethane.fourdvar.params import input_defn
 from openmethane.fourdvar.params.input_defn import inc_icon
+from openmethane.fourdvar.util.cluster_map import get_emis_clusters
+from openmethane.fourdvar.util.prior_correlation import get_emis_correlation
 
 
 def condition_adjoint(physical_adjoint):
@@ -26,11 +29,30 @@ def condition_adjoint(physical_adjoint):
     input: PhysicalAdjointData
     output: UnknownData.
 
-    notes: this function must apply the prior error covariance
+    notes: this function must apply the prior error covariance.
+    with log emissions the emission sensitivities must be to the log scaling,
+    see log_emis_adjoint.
     """
     return phys_to_unk(physical_adjoint, True)
 
 
+def log_emis_adjoint(physical_adjoint, physical):
+    """application: apply the chain rule of the log emission control
+    input: PhysicalAdjointData, PhysicalData (values the sensitivities are evaluated at)
+    output: PhysicalAdjointData.
+
+    notes: with input_defn.log_emis the emission scaling is the exponential of the
+    unconditioned unknowns, so the sensitivity to the log scaling is the
+    sensitivity to the scaling times the scaling.
+    without log emissions physical_adjoint is returned unchanged.
+    """
+    if input_defn.log_emis is False:
+        return physical_adjoint
+    icon = physical_adjoint.icon if inc_icon is True else None
+    emis = {spc: val * physical.emis[spc] for spc, val in physical_adjoint.emis.items()}
+    return PhysicalAdjointData(icon, emis, physical_adjoint.bcon)
+
+
 def condition(physical):
     """application: apply pre-conditioning to PhysicalData, get vector to optimize
     input: PhysicalData
@@ -41,20 +63,57 @@ def condition(physical):
     return phys_to_unk(physical, False)
 
 
+def get_unknown_lengths():
+    """application: number of icon, emis & bcon unknowns of each species
+    input: None
+    output: tuple of int (icon, emis, bcon).
+
+    notes: the unknowns of each species are ordered icon, emis, bcon.
+    """
+    p = PhysicalAbstractData
+    clusters = get_emis_clusters(p.nrows, p.ncols)
+    icon_len = 1 if inc_icon is True else 0
+    if clusters is None:
+        emis_len = p.nstep_emis * p.nlays_emis * p.nrows * p.ncols
+    else:
+        emis_len = p.nstep_emis * p.nlays_emis * clusters.nclusters
+    bcon_len = p.nstep_bcon * p.bcon_region
+    return icon_len, emis_len, bcon_len
+
+
+def get_bcon_index():
+    """application: index of the boundary condition unknowns in UnknownData
+    input: None
+    output: np.ndarray (int).
+    """
+    icon_len, emis_len, bcon_len = get_unknown_lengths()
+    spc_len = icon_len + emis_len + bcon_len
+    return np.concatenate(
+        [
+            np.arange(bcon_len) + i * spc_len + icon_len + emis_len
+            for i in range(len(PhysicalAbstractData.spcs))
+        ]
+    )
+
+
 def phys_to_unk(physical, is_adjoint):
     """application: apply pre-conditioning to PhysicalData, get vector to optimize
     input: PhysicalData
     output: UnknownData.
 
-    notes: this function must apply the inverse prior error covariance
+    notes: this function must apply the inverse prior error covariance.
+    with a cluster map the emission unknowns are the cluster sums (adjoint)
+    or means of the grid cells.
+    with correlated prior emission errors the emission unknowns are decorrelated,
+    by the transpose (adjoint) or inverse of the correlation factor.
+    with log emissions (input_defn.log_emis) the unknowns condition the log of the
+    emission scaling.
     """
     p = PhysicalAbstractData
-    emis_len = p.nstep_emis * p.nlays_emis * p.nrows * p.ncols
-    bcon_len = p.nstep_bcon * p.bcon_region
-    if inc_icon is True:
-        total_len = len(p.spcs) * (1 + emis_len + bcon_len)
-    else:
-        total_len = len(p.spcs) * (emis_len + bcon_len)
+    clusters = get_emis_clusters(p.nrows, p.ncols)
+    correlation = get_emis_correlation(p.tday_emis, clusters is not None)
+    icon_len, emis_len, bcon_len = get_unknown_lengths()
+    total_len = len(p.spcs) * (icon_len + emis_len + bcon_len)
     del p
 
     # weighting function changes if is_adjoint
@@ -62,11 +121,23 @@ def phys_to_unk(physical, is_adjoint):
 
         def weight(val, sd):
             return val * sd
+
+        def reduce(emis):
+            return clusters.aggregate(emis)
+
+        def decorrelate(emis):
+            return correlation.sqrt_adjoint(emis)
     else:
 
         def weight(val, sd):
             return val / sd
 
+        def reduce(emis):
+            return clusters.mean(emis)
+
+        def decorrelate(emis):
+            return correlation.inverse_sqrt(emis)
+
     arg = np.zeros(total_len)
     i = 0
     for spc in PhysicalAbstractData.spcs:
@@ -75,7 +146,15 @@ def phys_to_unk(physical, is_adjoint):
             arg[i] = icon
             i += 1
 
-        emis = weight(physical.emis[spc], physical.emis_unc[spc])
+        emis = physical.emis[spc]
+        if input_defn.log_emis is True and is_adjoint is False:
+            assert (emis > 0).all(), "log emissions need a positive emission scaling"
+            emis = np.log(emis)
+        emis = weight(emis, physical.emis_unc[spc])
+        if clusters is not None:
+            emis = reduce(emis)
+        if correlation is not None:
+            emis = decorrelate(emis)
         arg[i : i + emis_len] = emis.flatten()
         i += emis_len
 
@@ -25,6 +25,7 @@ from openmethane.fourdvar.params import (
     input_defn,
     template_defn,
 )
+from openmethane.fourdvar.util import bcon_region
 
 unit_key = "units.<YYYYMMDD>"
 unit_convert_emis = None
@@ -181,17 +182,8 @@ def map_sense(sensitivity):
             bcon_arr = model_arr_bcon.reshape((b_end - b_start, -1, tot_lay, nrow, ncol)).sum(
                 axis=1
             )
-            bcon_SL = bcon_arr[:, :blay, 0, 1:].sum(axis=(1, 2))
-            bcon_SH = bcon_arr[:, blay:, 0, 1:].sum(axis=(1, 2))
-            bcon_EL = bcon_arr[:, :blay, 1:, ncol - 1].sum(axis=(1, 2))
-            bcon_EH = bcon_arr[:, blay:, 1:, ncol - 1].sum(axis=(1, 2))
-            bcon_NL = bcon_arr[:, :blay, nrow - 1, :-1].sum(axis=(1, 2))
-            bcon_NH = bcon_arr[:, blay:, nrow - 1, :-1].sum(axis=(1, 2))
-            bcon_WL = bcon_arr[:, :blay, :-1, 0].sum(axis=(1, 2))
-            bcon_WH = bcon_arr[:, blay:, :-1, 0].sum(axis=(1, 2))
-            bcon_merge = np.stack(
-                [bcon_SL, bcon_SH, bcon_EL, bcon_EH, bcon_NL, bcon_NH, bcon_WL, bcon_WH], axis=1
-            )
+            region_index = bcon_region.get_region_index(tot_lay, nrow, ncol, blay)
+            bcon_merge = region_index.aggregate(bcon_arr)
             bcon_dict[spc][b_start:b_end, :] += bcon_merge[:, :]
 
     if input_defn.inc_icon is False:
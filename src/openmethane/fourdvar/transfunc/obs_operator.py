@@ -31,6 +31,9 @@ def obs_operator(model_output):
 
     val_list = [0] * ObservationData.length
     for ymd, ilist in ObservationData.ind_by_date.items():
+        if len(ilist) == 0:
+            # days without observations may not have been simulated
+            continue
         conc_file = model_output.file_data["conc." + ymd]["actual"]
         var_dict = ncf.get_variable(conc_file, ObservationData.spcs)
         for i in ilist:
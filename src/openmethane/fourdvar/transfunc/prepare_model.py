@@ -27,6 +27,7 @@ from openmethane.fourdvar.params import (
     input_defn,
     template_defn,
 )
+from openmethane.fourdvar.util import bcon_region
 
 unit_key = "units.<YYYYMMDD>"
 unit_convert_bcon = None
@@ -110,10 +111,10 @@ def prepare_model(physical_data):
         # add bcon values to emissons
         msg = "Only setup for 8-region boundary conditions."
         assert physical_data.bcon_region == 8, msg
-        bcon_lay = physical_data.bcon_up_lay
-        nrow, ncol = physical_data.nrows, physical_data.ncols
-        bshape = (m_daysize + 1, 1, 1)
         bcon_convert = unit_convert_bcon[dt.replace_date(unit_key, date)]
+        region_index = bcon_region.get_region_index(
+            bcon_convert.shape[1], nrow, ncol, physical_data.bcon_up_lay
+        )
         start = int(i * b_daysize)
         end = int((i + 1) * b_daysize)
         if start == end:
@@ -127,15 +128,7 @@ def prepare_model(physical_data):
             bcon_val = np.repeat(bcon_val, m_daysize // (end - start), axis=0)
             bcon_val = np.append(bcon_val, last_slice, axis=0)
             # bcon_val = [SL,SH,EL,EH,NL,NH,WL,WH]
-            bcon_arr = np.zeros(bcon_convert.shape)
-            bcon_arr[:, :bcon_lay, 0, 1:] = bcon_val[:, 0].reshape(bshape)
-            bcon_arr[:, bcon_lay:, 0, 1:] = bcon_val[:, 1].reshape(bshape)
-            bcon_arr[:, :bcon_lay, 1:, ncol - 1] = bcon_val[:, 2].reshape(bshape)
-            bcon_arr[:, bcon_lay:, 1:, ncol - 1] = bcon_val[:, 3].reshape(bshape)
-            bcon_arr[:, :bcon_lay, nrow - 1, :-1] = bcon_val[:, 4].reshape(bshape)
-            bcon_arr[:, bcon_lay:, nrow - 1, :-1] = bcon_val[:, 5].reshape(bshape)
-            bcon_arr[:, :bcon_lay, :-1, 0] = bcon_val[:, 6].reshape(bshape)
-            bcon_arr[:, bcon_lay:, :-1, 0] = bcon_val[:, 7].reshape(bshape)
+            bcon_arr = region_index.inject(bcon_val)
 
             base_arr = spcs_dict.get(spc, 0.0)
             spcs_dict[spc] = base_arr + (bcon_arr * bcon_convert)
@@ -144,6 +137,6 @@ def prepare_model(physical_data):
         model_input_args[emis_argname] = spcs_dict
 
     # may want to remove this line in future.
-    cmaq.wipeout_fwd()
+    cmaq.wipeout_fwd(keep_progress=True)
 
     return ModelInputData.create_new(**model_input_args)
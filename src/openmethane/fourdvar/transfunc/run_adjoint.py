@@ -26,6 +26,6 @@ def run_adjoint(adjoint_forcing):
     """
     assert isinstance(adjoint_forcing, AdjointForcingData)
     # should ensure that checkpoints exist first.
-    cmaq.wipeout_bwd()
+    cmaq.wipeout_bwd(keep_progress=True)
     cmaq.run_bwd()
     return SensitivityData()
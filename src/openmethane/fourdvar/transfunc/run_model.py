@@ -27,7 +27,7 @@ def run_model(model_input):
     """
     # run the forward model
     assert isinstance(model_input, ModelInputData)
-    cmaq.wipeout_fwd()
+    cmaq.wipeout_fwd(keep_progress=True)
     cmaq.run_fwd()
     try:
         ModelOutputData()
@@ -17,7 +17,10 @@
 import numpy as np
 
 from openmethane.fourdvar.datadef import PhysicalData
+from openmethane.fourdvar.params import input_defn
 from openmethane.fourdvar.params.input_defn import inc_icon
+from openmethane.fourdvar.util.cluster_map import get_emis_clusters
+from openmethane.fourdvar.util.prior_correlation import get_emis_correlation
 
 
 def uncondition(unknown):
@@ -25,17 +28,30 @@ def uncondition(unknown):
     input: UnknownData
     output: PhysicalData.
 
-    notes: this function must apply the prior error covariance
+    notes: this function must apply the prior error covariance.
+    with a cluster map each emission unknown is spread over the cells of its cluster.
+    with correlated prior emission errors the emission unknowns are correlated first.
+    with log emissions (input_defn.log_emis) the emission scaling is the exponential
+    of the unconditioned value, so it is always positive.
     """
     PhysicalData.assert_params()
     p = PhysicalData
-    emis_shape = (
-        p.nstep_emis,
-        p.nlays_emis,
-        p.nrows,
-        p.ncols,
-    )
-    emis_len = p.nstep_emis * p.nlays_emis * p.nrows * p.ncols
+    clusters = get_emis_clusters(p.nrows, p.ncols)
+    correlation = get_emis_correlation(p.tday_emis, clusters is not None)
+    if clusters is None:
+        emis_shape = (
+            p.nstep_emis,
+            p.nlays_emis,
+            p.nrows,
+            p.ncols,
+        )
+    else:
+        emis_shape = (
+            p.nstep_emis,
+            p.nlays_emis,
+            clusters.nclusters,
+        )
+    emis_len = np.prod(emis_shape)
     bcon_shape = (
         p.nstep_bcon,
         p.bcon_region,
@@ -57,7 +73,13 @@ def uncondition(unknown):
 
         emis = vals[i : i + emis_len]
         emis = emis.reshape(emis_shape)
+        if correlation is not None:
+            emis = correlation.sqrt(emis)
+        if clusters is not None:
+            emis = clusters.expand(emis)
         emis_dict[spc] = emis * PhysicalData.emis_unc[spc]
+        if input_defn.log_emis is True:
+            emis_dict[spc] = np.exp(emis_dict[spc])
         i += emis_len
 
         bcon = vals[i : i + bcon_len]
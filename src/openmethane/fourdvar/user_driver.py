@@ -14,7 +14,9 @@
 # limitations under the License.
 #
 
+import os
 import pathlib
+import time
 
 import xarray as xr
 import numpy as np
@@ -23,8 +25,15 @@ from scipy.optimize import fmin_l_bfgs_b as minimize
 import openmethane.fourdvar.datadef as d
 import openmethane.fourdvar.util.archive_handle as archive
 import openmethane.fourdvar.util.cmaq_handle as cmaq
+import openmethane.fourdvar.util.date_handle as dt
 from openmethane.fourdvar._transform import transform
 from openmethane.fourdvar.env import env
+from openmethane.fourdvar.transfunc.condition import get_bcon_index
+from openmethane.fourdvar.util import bcon_response, jacobian, period_chain, posterior_uncertainty
+from openmethane.fourdvar.util.cluster_map import get_cluster_map
+from openmethane.fourdvar.util.convergence import ConvergenceMonitor
+from openmethane.fourdvar.util.minim_history import MinimHistory
+from openmethane.fourdvar.util.posterior_uncertainty import LowRankPosterior
 from openmethane.fourdvar.params import (
     input_defn,
     data_access,
@@ -39,6 +48,8 @@ logger = get_logger(__name__)
 observed = None
 background = None
 iter_num = 0
+# util.convergence.ConvergenceMonitor of the running minimization, updated by callback_func
+convergence_monitor = None
 
 
 
@@ -52,8 +63,11 @@ def setup():
         logger.warning("input_defn.inc_icon is turned off.")
     bg = get_background()
     obs = get_observed()
-    bg.archive("prior.ncf")
-    obs.archive("observed.pickle")
+    # static metadata for the per-iteration observation archives, written before
+    # the background writer is started so it is never rewritten by the writer.
+    obs.archive_meta()
+    archive.submit(bg.archive, "prior.ncf")
+    archive.submit(obs.archive, "observed.pickle")
 
 
 def cleanup():
@@ -86,73 +100,490 @@ def get_observed():
     if observed is None:
         observed = d.ObservationData.from_file(input_defn.obs_file)
         observed.assert_params()
+        if input_defn.trim_to_obs is True:
+            data_access.model_end_date = observed.get_last_date()
+            model_days = len(dt.get_model_datelist())
+            skip_days = len(dt.get_datelist()) - model_days
+            if skip_days > 0:
+                logger.info(
+                    f"last observation on {data_access.model_end_date}, "
+                    f"skipping CMAQ for the last {skip_days} of {model_days + skip_days} days."
+                )
     return observed
 
 
 def callback_func(current_vector):
     """Called once for every iteration of minimizer.
     input: np.array
-    output: None.
+    output: Boolean (True if the convergence monitor requests a stop).
+
+    notes: the products of the cost function evaluated at current_vector are
+    archived directly, only if they are unavailable is the model output re-read.
+    the cost & gradient of the evaluation update the convergence monitor,
+    its metrics are written to archive_defn.convergence every iteration.
     """
     global iter_num
     iter_num += 1
-    current_unknown = d.UnknownData(current_vector)
-    current_physical = transform(current_unknown, d.PhysicalData)
-    current_physical.archive(f"iter{iter_num:04}.ncf")
-    if archive_defn.iter_model_output is True:
-        current_model_output = d.ModelOutputData()
+    start_time = time.time()
+
+    evaluation = data_access.prev_evaluation
+    if evaluation is not None and np.array_equal(evaluation["vector"], current_vector):
+        current_physical = evaluation["physical"]
+        current_obs = evaluation["simulated"]
+        logger.info(
+            "iteration cost={cost} bg_cost={bg_cost} ob_cost={ob_cost}".format(
+                **evaluation["cost"]
+            )
+        )
+    else:
+        logger.debug("No cost evaluation matching current vector, re-reading model output.")
+        current_unknown = d.UnknownData(current_vector)
+        current_physical = transform(current_unknown, d.PhysicalData)
+        current_obs = None
+        if archive_defn.iter_model_output is True or archive_defn.iter_obs_lite is True:
+            current_model_output = d.ModelOutputData()
+        if archive_defn.iter_obs_lite is True:
+            current_obs = transform(current_model_output, d.ObservationData)
+
+    archive.submit(current_physical.archive, f"iter{iter_num:04}.ncf")
     if archive_defn.iter_obs_lite is True:
-        current_model_output = d.ModelOutputData()
-        current_obs = transform(current_model_output, d.ObservationData)
-        current_obs.archive(f"obs_lite_iter{iter_num:04}.pic.gz", force_lite=True)
+        # static metadata is archived once, each iteration only stores the values.
+        # use observation_data.load_archive_values to read as an obs-lite archive.
+        archive.submit(
+            current_obs.archive_values,
+            f"obs_lite_iter{iter_num:04}.npz",
+            observed=get_observed(),
+        )
 
-    logger.info(f"iter_num = {iter_num}")
+    logger.info(f"iter_num = {iter_num} queued for archive in {time.time() - start_time:.2f}s")
+
+    stop = False
+    if convergence_monitor is not None:
+        if evaluation is not None and np.array_equal(evaluation["vector"], current_vector):
+            stop = convergence_monitor.update(
+                current_vector, evaluation["cost"]["cost"], evaluation.get("gradient")
+            )
+        else:
+            logger.debug("No cost evaluation matching current vector, convergence not checked.")
+        convergence_monitor.write(
+            os.path.join(archive.get_archive_path(), archive_defn.convergence)
+        )
+    return stop
 
 
 def minim(cost_func, grad_func,
           init_guess: np.ndarray,
           allow_negative_emissions: bool = True,
-          physical_template = None,):
+          physical_template = None,
+          history: MinimHistory | None = None,
+          preconditioner: LowRankPosterior | None = None,):
     """application: the minimizer function
-    input: cost function, gradient function, prior estimate / background
+    input: cost function, gradient function, prior estimate / background,
+           MinimHistory (loaded from a previous minimization to resume it),
+           LowRankPosterior (of the previous period, see util/period_chain.py)
     output: list (1st element is numpy.ndarray of solution, the rest are user-defined).
+
+    notes: MINIM_SOLVER selects the minimizer, 'lbfgs' (default, see minim_lbfgs),
+    'cg' (see minim_cg) or 'jacobian' (see minim_jacobian).
+    with BCON_RESPONSE=true (lbfgs only) the boundary condition unknowns are solved
+    in observation space for every evaluation (see setup_bcon_response).
+    with LOG_EMISSIONS=true (lbfgs only) the unknowns hold the log of the emission
+    scaling, which is always positive, so the emissions are never bounded.
+    with lbfgs every evaluation and the L-BFGS state are saved to archive_defn.minim_history
+    at each iteration. when resuming, init_guess must be the start vector of the history,
+    the saved evaluations are replayed to restore the L-BFGS state without running CMAQ.
     """
     # turn on skipping of unneeded fwd calls
     data_access.allow_fwd_skip = True
 
+    solver = env.str("MINIM_SOLVER", "lbfgs")
+    assert solver in ("lbfgs", "cg", "jacobian"), f"invalid MINIM_SOLVER {solver}"
+    model_cost_func = cost_func
+    if input_defn.log_emis is True:
+        assert solver == "lbfgs", "LOG_EMISSIONS makes the cost non-quadratic, use lbfgs"
+    if env.bool("BCON_RESPONSE", False):
+        assert solver == "lbfgs", "BCON_RESPONSE is only used with the lbfgs solver"
+        setup_bcon_response(cost_func, init_guess)
+    else:
+        # never use the boundary responses of a previous minimization
+        data_access.bcon_response = None
+    if solver == "lbfgs":
+        if history is None:
+            history_path = os.path.join(archive.get_archive_path(), archive_defn.minim_history)
+            history = MinimHistory(history_path)
+        elif history.x0 is not None:
+            msg = "init_guess must match the start vector of the resumed minimization"
+            assert np.array_equal(history.x0, init_guess), msg
+        cost_func, grad_func = history.wrap(cost_func, grad_func)
+    else:
+        assert history is None, "only lbfgs minimizations can be resumed"
+        assert preconditioner is None, "only lbfgs minimizations can be preconditioned"
+
     start_cost = cost_func(init_guess, archive_obs_file="simulobs_first_guess.pic.gz")
     start_grad = grad_func(init_guess)
     start_dict = {"start_cost": start_cost, "start_grad": start_grad}
 
-    if allow_negative_emissions is True:
-        bounds = None
-    else:
-        species =physical_template.spcs
-        if len(species) != 1:
-            raise ValueError("bounds only works for one species")
-        len_bcon = physical_template.bcon[ species[0]].size
-        len_emis = init_guess.size - len_bcon
-        # now assign zero as lower bound for emissions
-        bounds = len_emis * [(0, None)]
-        # now add no bounds for bcon
-        bounds += len_bcon * [(None, None)] 
+    bounds = get_bounds(init_guess, allow_negative_emissions, physical_template)
+    if solver != "lbfgs":
+        msg = f"{solver} cannot bound the emissions, set ALLOW_NEGATIVE_EMISSIONS=true"
+        assert bounds is None, msg
     maxiter = env.int("MAX_ITERATIONS", 20)
-    logger.info(f"Running minimiser with a maximum of {maxiter} iteration")
-    answer = minimize(
-        cost_func,
-        init_guess,
-        bounds=bounds,
-        fprime=grad_func,
-        callback=callback_func,
-        maxiter=maxiter,
-        # Very verbose output on every successful iteration
-        iprint=200,
-    )
+    start_convergence_monitor(init_guess, start_cost, start_grad, bounds, maxiter)
+    logger.info(f"Running {solver} minimiser with a maximum of {maxiter} iteration")
+    if solver == "cg":
+        answer = minim_cg(cost_func, grad_func, init_guess, start_cost, start_grad, maxiter)
+    elif solver == "jacobian":
+        answer = minim_jacobian(init_guess, start_grad)
+    else:
+        answer = minim_lbfgs(
+            cost_func, grad_func, init_guess, bounds, maxiter, history, preconditioner
+        )
+    answer = finish_minim(answer, model_cost_func)
     # check answer warnflag, etc for success
     answer = [*list(answer), start_dict]
     return answer
 
 
+def get_bounds(init_guess, allow_negative_emissions, physical_template):
+    """application: bounds of the unknowns for the minimizer
+    input: numpy.ndarray (start vector), bool, PhysicalData (template of the unknowns)
+    output: list of (lower, upper) bounds for each unknown, or None if unbounded.
+
+    notes: the emissions are bounded below by zero, the boundary conditions are not.
+    """
+    if allow_negative_emissions is True or input_defn.log_emis is True:
+        return None
+    species =physical_template.spcs
+    if len(species) != 1:
+        raise ValueError("bounds only works for one species")
+    len_bcon = physical_template.bcon[ species[0]].size
+    len_emis = init_guess.size - len_bcon
+    # now assign zero as lower bound for emissions
+    bounds = len_emis * [(0, None)]
+    # now add no bounds for bcon
+    bounds += len_bcon * [(None, None)]
+    return bounds
+
+
+def start_convergence_monitor(init_guess, start_cost, start_grad, bounds, maxiter):
+    """application: create the convergence monitor of a minimization
+    input: numpy.ndarray (start vector), cost & gradient at the start vector,
+           list of bounds (or None), int (maximum iterations)
+    output: None.
+
+    notes: sets convergence_monitor, updated by callback_func at each iteration.
+    """
+    global convergence_monitor
+    lower = None
+    if bounds is not None:
+        lower = np.array([-np.inf if low is None else low for low, _ in bounds])
+    convergence_monitor = ConvergenceMonitor(
+        maxiter=maxiter,
+        cost_reduction=env.float("CONVERGENCE_COST_REDUCTION", 0.0),
+        grad_reduction=env.float("CONVERGENCE_GRAD_REDUCTION", 0.0),
+        step_ratio=env.float("CONVERGENCE_STEP_RATIO", 0.0),
+        patience=env.int("CONVERGENCE_PATIENCE", 2),
+        bg_vector=transform(get_background(), d.UnknownData).get_vector(),
+        lower=lower,
+    )
+    convergence_monitor.start(init_guess, start_cost, start_grad)
+
+
+def finish_minim(answer, model_cost_func):
+    """application: shared teardown of every minimizer
+    input: tuple (solution, cost, info dict), cost function (not wrapped by the history)
+    output: tuple (solution, cost, info dict).
+
+    notes: records the decision of the convergence monitor in the info dict.
+    with BCON_RESPONSE=true the boundary unknowns of the solution are replaced
+    with their optimal values. waits for every iteration to be archived.
+    """
+    global convergence_monitor
+    if convergence_monitor.decision is not None:
+        answer[2]["task"] = f"CONVERGENCE: MONITOR {convergence_monitor.decision}"
+        answer[2]["warnflag"] = 0
+        logger.info(
+            f"convergence monitor saved an estimated {convergence_monitor.hours_saved:.2f} hours"
+        )
+    convergence_monitor.write(os.path.join(archive.get_archive_path(), archive_defn.convergence))
+    convergence_monitor = None
+    if data_access.bcon_response is not None:
+        # the minimizer vector holds the boundary unknowns of the model runs
+        evaluation = data_access.prev_evaluation
+        if evaluation is None or not np.array_equal(evaluation["vector"], answer[0]):
+            model_cost_func(answer[0])
+        solution = transform(data_access.prev_evaluation["physical"], d.UnknownData)
+        answer = (solution.get_vector(), *answer[1:])
+    # make sure every iteration is archived before the results are used
+    archive.flush()
+    return answer
+
+
+def minim_lbfgs(cost_func, grad_func, init_guess, bounds, maxiter, history, preconditioner=None):
+    """application: minimize the cost with scipy's L-BFGS-B
+    input: cost & gradient functions (wrapped by the MinimHistory), numpy.ndarray (start vector),
+           list of bounds (or None), int (maximum iterations), MinimHistory,
+           LowRankPosterior (of the previous period, or None)
+    output: tuple (solution, cost, info dict) from fmin_l_bfgs_b.
+
+    notes: every iteration is recorded in the history, the iterations replayed from
+    a resumed minimization are not archived again.
+    with a preconditioner (without bounds only) the minimizer runs in the unknowns
+    scaled by its square root from init_guess, the history holds the unscaled unknowns.
+    the low-rank posterior covariance is estimated from the iterations (not with
+    LOG_EMISSIONS=true), with CHAIN_NEXT_PERIOD=true it is archived for a chained period.
+    """
+
+    def callback(current_vector):
+        global iter_num
+        if history.record_iteration(current_vector) is True:
+            # already archived before the restart
+            iter_num += 1
+        elif callback_func(current_vector) is True:
+            # fmin_l_bfgs_b stops with "CALLBACK REQUESTED HALT"
+            raise StopIteration
+
+    if preconditioner is not None and bounds is not None:
+        logger.warning("the emissions are bounded, not preconditioning the minimization")
+        preconditioner = None
+    if preconditioner is not None:
+        logger.info(
+            f"preconditioning with {preconditioner.vectors.shape[1]} directions "
+            "of the previous period"
+        )
+
+        def to_vector(scaled):
+            return init_guess + preconditioner.sqrt(scaled)
+
+        answer = minimize(
+            lambda scaled: cost_func(to_vector(scaled)),
+            np.zeros_like(init_guess),
+            fprime=lambda scaled: preconditioner.sqrt(grad_func(to_vector(scaled))),
+            callback=lambda scaled: callback(to_vector(scaled)),
+            maxiter=maxiter,
+            m=history.maxcor,
+            iprint=200,
+        )
+        answer[2]["grad"] = preconditioner.inverse_sqrt(answer[2]["grad"])
+        answer = (to_vector(answer[0]), *answer[1:])
+    else:
+        answer = minimize(
+            cost_func,
+            init_guess,
+            bounds=bounds,
+            fprime=grad_func,
+            callback=callback,
+            maxiter=maxiter,
+            m=history.maxcor,
+            # Very verbose output on every successful iteration
+            iprint=200,
+        )
+    if input_defn.chain_next is True:
+        # preconditioner of a following period chained to this one
+        period_chain.archive_posterior(period_chain.estimate_posterior(history, preconditioner))
+    if input_defn.log_emis is False:
+        # low-rank posterior covariance from every iteration, without more model runs
+        s, y = history.get_pairs(len(history.iterations))
+        answer[2]["posterior"] = posterior_uncertainty.from_pairs(s, y)
+    return answer
+
+
+def setup_bcon_response(cost_func, init_guess):
+    """application: solve the boundary condition unknowns in observation space
+    input: cost function, numpy.ndarray (start vector)
+    output: None.
+
+    notes: builds the response of the observations to every boundary unknown around
+    init_guess, one forward run each, saved to archive_defn.bcon_response for reuse.
+    sets data_access.bcon_response, so every CMAQ run uses the boundary unknowns of
+    init_guess and the cost & gradient functions use the optimal boundary unknowns.
+    """
+    data_access.bcon_response = None
+    observed = get_observed()
+    cost_func(init_guess)
+    base_simulated = np.array(data_access.prev_evaluation["simulated"].get_vector())
+    bcon_index = get_bcon_index()
+    data_access.bcon_response = bcon_response.build_bcon_response(
+        os.path.join(archive.get_archive_path(), archive_defn.bcon_response),
+        init_guess,
+        base_simulated,
+        bcon_index,
+        transform(get_background(), d.UnknownData).get_vector(),
+        np.array(observed.get_vector()),
+        d.ObservationData.whiten,
+    )
+    logger.info(f"solving {len(bcon_index)} boundary condition unknowns in observation space")
+
+
+def minim_cg(cost_func, grad_func, init_guess, start_cost, start_grad, maxiter):
+    """application: minimize the cost with conjugate gradients, for linear transport
+    input: cost function, gradient function, numpy.ndarray (start vector),
+           cost & gradient at the start vector, int (maximum iterations)
+    output: tuple (solution, cost, info dict), matching fmin_l_bfgs_b.
+
+    notes: with linear transport the cost is exactly quadratic in the unknowns, with
+    a hessian of (identity + observation term) in the preconditioned control space.
+    each iteration runs CMAQ forward & backward once at x + p, giving the hessian
+    product along the search direction p. the step along p is exact, so the cost,
+    gradient and simulated observations of the next iterate follow without model runs.
+    stops when the gradient norm is reduced by a factor of CG_TOLERANCE.
+    the ritz values (hessian eigenvalue estimates) of the equivalent lanczos
+    iterations are returned in the info dict.
+    """
+    tolerance = env.float("CG_TOLERANCE", 1e-3)
+    bg_vector = transform(get_background(), d.UnknownData).get_vector()
+
+    vector = np.array(init_guess, dtype=float)
+    cost = start_cost
+    grad = np.array(start_grad, dtype=float)
+    # simulated observations of the start vector, from the cost evaluation
+    simulated = np.array(data_access.prev_evaluation["simulated"].get_vector())
+    direction = -grad
+    grad_sq = grad @ grad
+    init_norm = np.sqrt(grad_sq)
+    alphas = []
+    betas = []
+    task = "STOP: TOTAL NO. of ITERATIONS REACHED LIMIT"
+    warnflag = 1
+    nit = 0
+    while True:
+        if np.sqrt(grad_sq) <= tolerance * init_norm:
+            task = "CONVERGENCE: REL_REDUCTION_OF_GRADIENT_NORM <= CG_TOLERANCE"
+            warnflag = 0
+            break
+        if nit >= maxiter:
+            break
+        trial = vector + direction
+        cost_func(trial)
+        trial_simulated = data_access.prev_evaluation["simulated"].get_vector()
+        hess_dir = grad_func(trial) - grad
+        curvature = direction @ hess_dir
+        msg = "cost is not convex along the search direction, transport must be linear"
+        assert curvature > 0, msg
+
+        alpha = grad_sq / curvature
+        vector = vector + alpha * direction
+        grad = grad + alpha * hess_dir
+        simulated = simulated + alpha * (np.array(trial_simulated) - simulated)
+        cost = cost - 0.5 * alpha * grad_sq
+        beta = (grad @ grad) / grad_sq
+        grad_sq = grad @ grad
+        direction = -grad + beta * direction
+        alphas.append(alpha)
+        betas.append(beta)
+        nit += 1
+
+        # callback_func archives the products of the new iterate
+        set_evaluation(vector, simulated, bg_vector)
+        data_access.prev_evaluation["gradient"] = grad
+        stop = callback_func(vector)
+        logger.info(f"cg iteration {nit} relative gradient norm {np.sqrt(grad_sq) / init_norm:.3e}")
+        if stop is True:
+            task = "STOP: CONVERGENCE MONITOR"
+            warnflag = 0
+            break
+
+    # lanczos tridiagonal matrix of the hessian, from the cg coefficients
+    diag = [
+        1.0 / a + (betas[i - 1] / alphas[i - 1] if i > 0 else 0.0) for i, a in enumerate(alphas)
+    ]
+    off_diag = [np.sqrt(b) / a for a, b in zip(alphas[:-1], betas[:-1])]
+    tridiag = np.diag(diag) + np.diag(off_diag, 1) + np.diag(off_diag, -1)
+    info = {
+        "grad": grad,
+        "task": task,
+        "funcalls": nit,
+        "nit": nit,
+        "warnflag": warnflag,
+        "ritz_values": np.linalg.eigvalsh(tridiag) if nit > 0 else np.zeros(0),
+    }
+    return vector, cost, info
+
+
+def minim_jacobian(init_guess, start_grad):
+    """application: solve the inversion in closed form with an explicit jacobian
+    input: numpy.ndarray (start vector), gradient at the start vector
+    output: tuple (solution, cost, info dict), matching fmin_l_bfgs_b.
+
+    notes: for small (eg: clustered) control spaces and linear transport.
+    the jacobian takes one forward run per unknown, run as an ensemble around
+    init_guess, and is saved to archive_defn.jacobian so an interrupted build resumes.
+    the posterior covariance & averaging kernel of the unknowns are saved
+    to archive_defn.jacobian_posterior, and returned in the info dict with the dofs.
+    """
+    observed = get_observed()
+    bg_vector = transform(get_background(), d.UnknownData).get_vector()
+    # simulated observations of the start vector, from the cost evaluation
+    base_simulated = np.array(data_access.prev_evaluation["simulated"].get_vector())
+    archive_path = archive.get_archive_path()
+
+    jacobian_file = os.path.join(archive_path, archive_defn.jacobian)
+    jac = jacobian.build_jacobian(jacobian_file, init_guess, base_simulated)
+    posterior = jacobian.solve(
+        jac,
+        init_guess,
+        base_simulated,
+        bg_vector,
+        np.array(observed.get_vector()),
+        d.ObservationData.whiten,
+    )
+    np.savez(
+        os.path.join(archive_path, archive_defn.jacobian_posterior),
+        vector=posterior["vector"],
+        covariance=posterior["covariance"],
+        averaging_kernel=posterior["averaging_kernel"],
+        dofs=posterior["dofs"],
+    )
+    logger.info(f"jacobian solution with {posterior['dofs']:.2f} degrees of freedom for signal")
+
+    vector = posterior["vector"]
+    cost = set_evaluation(vector, posterior["simulated"], bg_vector)
+    callback_func(vector)
+    # the gradient is linear in the unknowns, exactly zero at the solution up to rounding
+    whitened = d.ObservationData.whiten(jac)
+    grad = start_grad + (vector - init_guess) + whitened.T @ (whitened @ (vector - init_guess))
+    info = {
+        "grad": grad,
+        "task": "CONVERGENCE: CLOSED FORM SOLUTION",
+        "funcalls": len(init_guess),
+        "nit": 1,
+        "warnflag": 0,
+        "dofs": posterior["dofs"],
+        "covariance": posterior["covariance"],
+        "averaging_kernel": posterior["averaging_kernel"],
+        "posterior": posterior_uncertainty.from_covariance(posterior["covariance"]),
+    }
+    return vector, cost, info
+
+
+def set_evaluation(vector, simulated, bg_vector):
+    """application: record the cost of a vector whose simulated observations are known
+    input: numpy.ndarray (unknowns), numpy.ndarray (simulated observations),
+           numpy.ndarray (background unknowns)
+    output: scalar (cost).
+
+    notes: sets data_access.prev_evaluation as cost_func does, for callback_func.
+    """
+    observed = get_observed()
+    residual = np.array(observed.get_vector()) - simulated
+    uncertainty = np.array(observed.uncertainty)
+    bg_cost = 0.5 * np.sum((vector - bg_vector) ** 2)
+    ob_cost = 0.5 * np.sum(d.ObservationData.whiten(residual) ** 2)
+    data_access.prev_evaluation = {
+        "vector": vector.copy(),
+        "physical": transform(d.UnknownData(vector), d.PhysicalData),
+        "simulated": d.ObservationData(simulated),
+        "cost": {
+            "cost": bg_cost + ob_cost,
+            "bg_cost": bg_cost,
+            "ob_cost": ob_cost,
+            "bias": residual.mean(),
+            "chisq": ((residual / uncertainty) ** 2).sum() / observed.length,
+        },
+    }
+    return bg_cost + ob_cost
+
+
 def post_process(out_physical: d.PhysicalData, metadata):
     """application: how to handle/save results of minimizer
     input: PhysicalData (solution), list (user-defined output of minim)
@@ -160,7 +591,10 @@ def post_process(out_physical: d.PhysicalData, metadata):
     """
     # fourdvar solves for multipliers against the template emissions (prior)
     # for every grid cell. save the raw result, which will be useful internally.
-    out_physical.archive("posterior-multipliers.nc")
+    out_physical.archive(archive_defn.posterior_multipliers)
+    if input_defn.chain_next is True:
+        # initial conditions for a following period chained to this one
+        period_chain.archive_chain_icon(out_physical)
 
     # open the prior emissions to use as a template format for the results file
     prior_emissions = xr.open_dataset(template_defn.prior_file)
@@ -178,3 +612,17 @@ def post_process(out_physical: d.PhysicalData, metadata):
     posterior_emissions.to_netcdf(
         pathlib.Path(archive.get_archive_path(), "posterior-emissions.nc")
     )
+
+    # posterior uncertainty estimated by the minimizer (lbfgs & jacobian)
+    posterior = metadata[1].get("posterior")
+    if posterior is not None:
+        logger.info(f"posterior degrees of freedom for signal = {posterior.dofs:.2f}")
+        posterior_uncertainty.cell_reduction(posterior).archive(
+            archive_defn.cell_uncertainty_reduction
+        )
+        regions = (
+            input_defn.uncertainty_regions or f"block:{out_physical.nrows}x{out_physical.ncols}"
+        )
+        posterior_uncertainty.region_reduction(
+            posterior, get_cluster_map(regions, int(out_physical.nrows), int(out_physical.ncols))
+        ).archive(archive_defn.region_uncertainty_reduction)
@@ -13,7 +13,12 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 #
+import collections
+import multiprocessing
 import os
+import pickle
+import time
+from concurrent.futures import ProcessPoolExecutor
 
 from openmethane.fourdvar.params import archive_defn
 from openmethane.fourdvar.util import file_handle
@@ -24,6 +29,10 @@ logger = get_logger(__name__)
 finished_setup = False
 archive_path = ""
 
+# background writer, created by the first call to submit
+writer = None
+pending = collections.deque()
+
 
 def setup():
     """Setup the archive/experiment directory.
@@ -37,6 +46,8 @@ def setup():
     if finished_setup is True:
         logger.warning("archive setup called again. Ignoring")
         return None
+    # the background writer was forked with the state of the previous archive
+    flush()
     path = os.path.join(archive_defn.archive_path, archive_defn.experiment)
     if os.path.isdir(path) is True:
         logger.warning(f"{path} already exists.")
@@ -72,3 +83,70 @@ def get_archive_path():
     if finished_setup is False:
         setup()
     return archive_path
+
+
+def _run_task(payload):
+    func, args, kwargs = pickle.loads(payload)
+    func(*args, **kwargs)
+
+
+def _wait_oldest():
+    future = pending.popleft()
+    # re-raises any exception from the background writer
+    future.result()
+
+
+def submit(func, *args, **kwargs):
+    """Run an archive task in the background writer.
+    input: callable, args and kwargs for callable
+    output: None.
+
+    notes: arguments are pickled immediately, so later changes to them are not archived.
+    tasks run in a worker process forked on the first submit after setup or flush,
+    they must not rely on state changed after that (other than through their arguments).
+    at most archive_defn.background_queue_size tasks are pending, further calls
+    block until the oldest task is finished.
+    errors raised by a task are raised by the next call to submit or flush.
+    if archive_defn.background_archive is False the task is run immediately.
+    """
+    global writer
+    if archive_defn.background_archive is False:
+        func(*args, **kwargs)
+        return
+
+    while pending and pending[0].done():
+        _wait_oldest()
+    if len(pending) >= archive_defn.background_queue_size:
+        start_time = time.time()
+        _wait_oldest()
+        logger.debug(f"waited {time.time() - start_time:.2f}s for background archive.")
+
+    payload = pickle.dumps((func, args, kwargs))
+    if writer is None:
+        writer = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("fork"))
+    pending.append(writer.submit(_run_task, payload))
+
+
+def flush():
+    """Wait for all background archive tasks to finish & stop the background writer.
+    input: None
+    output: None.
+
+    notes: raises the first error from any pending task.
+    the next submit forks a new writer, with the state at that time.
+    """
+    global writer
+    start_time = time.time()
+    error = None
+    while pending:
+        try:
+            _wait_oldest()
+        except Exception as e:
+            logger.exception("background archive failed")
+            error = error or e
+    if writer is not None:
+        writer.shutdown()
+        writer = None
+    if error is not None:
+        raise error
+    logger.debug(f"flushed background archive in {time.time() - start_time:.2f}s.")
@@ -0,0 +1,115 @@
+#
+# Copyright 2025 The Superpower Institute
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""
+Index maps for the 8-region boundary condition scaling.
+
+The boundary of the domain is split into four sides (south, east, north, west),
+each split vertically into a lower and upper region at ``up_lay``.
+``prepare_model`` injects the boundary scaling into these cells and
+``map_sense`` aggregates sensitivities over the same cells, so both use the
+same precomputed ``BconRegionIndex``.
+"""
+
+import functools
+
+import attrs
+import numpy as np
+
+# order of regions in PhysicalData.bcon
+region_names = ("SL", "SH", "EL", "EH", "NL", "NH", "WL", "WH")
+
+
+@attrs.frozen
+class BconRegionIndex:
+    """Flat (layer, row, col) indices of every boundary cell and its region."""
+
+    nlays: int
+    nrows: int
+    ncols: int
+    up_lay: int
+    index: np.ndarray = attrs.field(eq=False, repr=False)
+    region: np.ndarray = attrs.field(eq=False, repr=False)
+
+    @property
+    def cell_shape(self) -> tuple[int, int, int]:
+        return self.nlays, self.nrows, self.ncols
+
+    def inject(self, bcon_val: np.ndarray) -> np.ndarray:
+        """Spread region values onto the boundary cells of the grid.
+
+        input: np.ndarray (nstep, 8)
+        output: np.ndarray (nstep, nlays, nrows, ncols), zero away from the boundary.
+        """
+        nstep = bcon_val.shape[0]
+        result = np.zeros((nstep, self.nlays * self.nrows * self.ncols))
+        result[:, self.index] = bcon_val[:, self.region]
+        return result.reshape((nstep, *self.cell_shape))
+
+    def aggregate(self, arr: np.ndarray) -> np.ndarray:
+        """Sum grid values over each boundary region, the adjoint of inject.
+
+        input: np.ndarray (nstep, nlays, nrows, ncols)
+        output: np.ndarray (nstep, 8).
+        """
+        nstep = arr.shape[0]
+        flat = arr.reshape((nstep, -1))[:, self.index]
+        result = np.zeros((nstep, len(region_names)))
+        np.add.at(result, (slice(None), self.region), flat)
+        return result
+
+
+def build_region_index(nlays: int, nrows: int, ncols: int, up_lay: int) -> BconRegionIndex:
+    """Construct the boundary region index for a grid.
+
+    The sides do not overlap, each corner cell belongs to exactly one side:
+    south owns the south-east corner, east the north-east, north the north-west
+    and west the south-west.
+    """
+    lay = np.arange(nlays).reshape((nlays, 1))
+    rows = np.arange(nrows)
+    cols = np.arange(ncols)
+    sides = [
+        (np.zeros(ncols - 1, dtype=int), cols[1:]),  # south
+        (rows[1:], np.full(nrows - 1, ncols - 1)),  # east
+        (np.full(ncols - 1, nrows - 1), cols[:-1]),  # north
+        (rows[:-1], np.zeros(nrows - 1, dtype=int)),  # west
+    ]
+
+    index_list = []
+    region_list = []
+    for i, (side_row, side_col) in enumerate(sides):
+        flat = np.ravel_multi_index(
+            (np.broadcast_to(lay, (nlays, side_row.size)), side_row, side_col),
+            (nlays, nrows, ncols),
+        )
+        is_upper = np.broadcast_to(lay >= up_lay, flat.shape)
+        index_list.append(flat.ravel())
+        region_list.append((2 * i + is_upper).ravel())
+
+    return BconRegionIndex(
+        nlays=nlays,
+        nrows=nrows,
+        ncols=ncols,
+        up_lay=up_lay,
+        index=np.concatenate(index_list),
+        region=np.concatenate(region_list),
+    )
+
+
+@functools.lru_cache
+def get_region_index(nlays: int, nrows: int, ncols: int, up_lay: int) -> BconRegionIndex:
+    """Get the (cached) boundary region index for a grid."""
+    return build_region_index(int(nlays), int(nrows), int(ncols), int(up_lay))
@@ -0,0 +1,111 @@
+#
+# Copyright 2025 The Superpower Institute
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""Solve for the boundary condition unknowns in observation space.
+
+With linear transport the simulated observations change by a fixed response
+for a unit change of each boundary condition unknown. The responses are built
+once, with one forward run per boundary unknown (see jacobian.build_jacobian).
+
+Every CMAQ run of the minimization then uses the boundary conditions of the
+start vector. For the emissions of each run, the boundary unknowns that
+minimize the cost are found in closed form from the simulated observations. The
+simulated observations are then corrected to match, without another model run.
+The minimizer only has to search the emission unknowns.
+"""
+
+from collections.abc import Callable
+
+import attrs
+import numpy as np
+import scipy.linalg
+
+from openmethane.fourdvar.util import jacobian
+
+
+@attrs.frozen
+class BconResponse:
+    """Responses of the simulated observations to the boundary condition unknowns."""
+
+    index: np.ndarray = attrs.field(eq=False)
+    response: np.ndarray = attrs.field(eq=False, repr=False)
+    bg_bcon: np.ndarray = attrs.field(eq=False, repr=False)
+    observed: np.ndarray = attrs.field(eq=False, repr=False)
+    whitened: np.ndarray = attrs.field(eq=False, repr=False)
+    whiten: Callable[[np.ndarray], np.ndarray] = attrs.field(eq=False, repr=False)
+    factor: tuple = attrs.field(eq=False, repr=False)
+
+    def project(self, vector: np.ndarray, simulated: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """Replace the boundary unknowns of vector with those minimizing the cost.
+
+        input: np.ndarray (unknowns), np.ndarray (simulated observations of vector)
+        output: tuple of np.ndarray (unknowns, simulated observations).
+        """
+        run_bcon = vector[self.index]
+        bg_simulated = simulated + self.response @ (self.bg_bcon - run_bcon)
+        innovation = self.whiten(self.observed - bg_simulated)
+        bcon = self.bg_bcon + scipy.linalg.cho_solve(self.factor, self.whitened.T @ innovation)
+
+        new_vector = np.array(vector)
+        new_vector[self.index] = bcon
+        return new_vector, simulated + self.response @ (bcon - run_bcon)
+
+
+def build_bcon_response(
+    filepath: str,
+    base_vector: np.ndarray,
+    base_simulated: np.ndarray,
+    bcon_index: np.ndarray,
+    bg_vector: np.ndarray,
+    observed: np.ndarray,
+    whiten: Callable[[np.ndarray], np.ndarray],
+) -> BconResponse:
+    """
+    Build (or load) the boundary condition responses
+
+    Parameters
+    ----------
+    filepath
+        Where the responses are saved, responses already saved there are reused
+    base_vector
+        Unknowns the responses are built around
+    base_simulated
+        Simulated observations of base_vector
+    bcon_index
+        Index of the boundary condition unknowns
+    bg_vector
+        Prior unknowns, the prior covariance is the identity
+    observed
+        Observed values
+    whiten
+        Multiplies (nobs, ...) arrays by the inverse square root of the observation
+        error covariance (eg: ObservationData.whiten)
+
+    Returns
+    -------
+    BconResponse
+    """
+    response = jacobian.build_jacobian(filepath, base_vector, base_simulated, bcon_index)
+    whitened = whiten(response)
+    hessian = np.eye(len(bcon_index)) + whitened.T @ whitened
+    return BconResponse(
+        index=bcon_index,
+        response=response,
+        bg_bcon=bg_vector[bcon_index],
+        observed=np.asarray(observed),
+        whitened=whitened,
+        whiten=whiten,
+        factor=scipy.linalg.cho_factor(hessian),
+    )
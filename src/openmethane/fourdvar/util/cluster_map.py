@@ -0,0 +1,132 @@
+#
+# Copyright 2025 The Superpower Institute
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""
+Aggregation of the emission unknowns into clusters of grid cells.
+
+With ``input_defn.cluster_map`` set, ``condition`` and ``uncondition`` solve for
+one emission unknown per cluster (for each emission timestep, layer and species)
+instead of one per grid cell. ``uncondition`` spreads each cluster value onto its
+cells, ``condition_adjoint`` sums the gradient over the cells of each cluster
+and ``condition`` takes the cluster mean, so conditioning then unconditioning
+returns the same unknowns.
+
+The cluster map is one of:
+
+- ``block:<rows>x<cols>``, regular blocks of grid cells
+- ``landuse``, the dominant land use category (DLUSE) of the MCIP grid
+- the path to a NetCDF file with an integer ``CLUSTER`` variable on the grid
+"""
+
+import functools
+
+import attrs
+import numpy as np
+
+from openmethane.fourdvar.params import cmaq_config, date_defn, input_defn
+from openmethane.fourdvar.util import date_handle as dt
+from openmethane.fourdvar.util import netcdf_handle as ncf
+
+
+@attrs.frozen
+class ClusterMap:
+    """Cluster number of every (row, col) cell, numbered from 0."""
+
+    nclusters: int
+    label: np.ndarray = attrs.field(eq=False, repr=False)
+    size: np.ndarray = attrs.field(eq=False, repr=False)
+
+    @property
+    def cell_shape(self) -> tuple[int, int]:
+        return self.label.shape
+
+    def expand(self, arr: np.ndarray) -> np.ndarray:
+        """Spread cluster values onto their grid cells.
+
+        input: np.ndarray (..., nclusters)
+        output: np.ndarray (..., nrows, ncols).
+        """
+        return arr[..., self.label]
+
+    def aggregate(self, arr: np.ndarray) -> np.ndarray:
+        """Sum grid values over each cluster, the adjoint of expand.
+
+        input: np.ndarray (..., nrows, ncols)
+        output: np.ndarray (..., nclusters).
+        """
+        lead = arr.shape[: -len(self.cell_shape)]
+        flat = arr.reshape((-1, self.label.size))
+        result = np.array(
+            [np.bincount(self.label.ravel(), row, minlength=self.nclusters) for row in flat]
+        )
+        return result.reshape((*lead, self.nclusters))
+
+    def mean(self, arr: np.ndarray) -> np.ndarray:
+        """Average grid values over each cluster, the inverse of expand.
+
+        input: np.ndarray (..., nrows, ncols)
+        output: np.ndarray (..., nclusters).
+        """
+        return self.aggregate(arr) / self.size
+
+
+def build_cluster_map(label: np.ndarray) -> ClusterMap:
+    """Construct a ClusterMap from any integer labels, renumbering the clusters from 0."""
+    assert label.ndim == 2, "cluster map must be 2D (row, col)"
+    assert np.issubdtype(label.dtype, np.integer), "cluster map must hold integers"
+    _, inverse, size = np.unique(label, return_inverse=True, return_counts=True)
+    return ClusterMap(nclusters=len(size), label=inverse.reshape(label.shape), size=size)
+
+
+def block_label(nrows: int, ncols: int, block_rows: int, block_cols: int) -> np.ndarray:
+    """Cluster labels of regular blocks, the blocks at the north & east edges may be smaller."""
+    row_block = np.arange(nrows) // block_rows
+    col_block = np.arange(ncols) // block_cols
+    return row_block[:, None] * (col_block[-1] + 1) + col_block[None, :]
+
+
+def read_label(filepath: str, varname: str) -> np.ndarray:
+    """Read integer cluster labels on the (row, col) grid from a NetCDF file."""
+    values = np.ma.getdata(ncf.get_variable(filepath, varname))
+    # drop the (TSTEP, LAY) dimensions of IOAPI files
+    while values.ndim > 2 and values.shape[0] == 1:
+        values = values[0]
+    return np.rint(values).astype(int)
+
+
+@functools.lru_cache
+def get_cluster_map(spec: str, nrows: int, ncols: int) -> ClusterMap | None:
+    """Get the (cached) cluster map described by spec, None if spec is empty.
+
+    input: string (input_defn.cluster_map), int, int (grid shape)
+    output: ClusterMap or None.
+    """
+    if spec == "":
+        return None
+    if spec.startswith("block:"):
+        block_rows, block_cols = (int(n) for n in spec[len("block:") :].split("x"))
+        label = block_label(nrows, ncols, block_rows, block_cols)
+    elif spec == "landuse":
+        grid_file = dt.replace_date(cmaq_config.grid_cro_2d, date_defn.start_date)
+        label = read_label(grid_file, "DLUSE")
+    else:
+        label = read_label(spec, "CLUSTER")
+    assert label.shape == (nrows, ncols), f"cluster map {spec} does not match the grid"
+    return build_cluster_map(label)
+
+
+def get_emis_clusters(nrows: int, ncols: int) -> ClusterMap | None:
+    """Get the cluster map of the emission unknowns, None if every cell is an unknown."""
+    return get_cluster_map(input_defn.cluster_map, int(nrows), int(ncols))
@@ -14,11 +14,17 @@
 # limitations under the License.
 #
 import datetime
+import functools
 import glob
+import hashlib
+import json
 import os
 import subprocess
+import threading
 import time
 
+import numpy as np
+
 import openmethane.fourdvar.util.date_handle as dt
 import openmethane.fourdvar.util.file_handle as fh
 import openmethane.fourdvar.util.netcdf_handle as ncf
@@ -44,7 +50,8 @@ def parse_env_dict(env_dict, date):
 
     for name, value in env_dict.items():
         try:
-            parsed_value = dt.replace_date(value, date)
+            # values without any date tag are already final
+            parsed_value = dt.replace_date(value, date) if "<" in value else value
 
             # Remove empty strings from environment which are killing CMAQ multiprocessing
             if value != "":
@@ -55,8 +62,73 @@ def parse_env_dict(env_dict, date):
     return parsed
 
 
+# date-invariant run environments, {function name: (config key, env_dict)}
+run_env_cache = {}
+run_env_lock = threading.Lock()
+
+# simple param types that define the run environment
+_config_types = (str, int, float, bool, list, tuple, dict, type(None), os.PathLike, datetime.date)
+
+
+def get_config_key():
+    """Get a value that changes whenever the run environment inputs change.
+    input: None
+    output: tuple.
+
+    notes: covers all params in cmaq_config & template_defn and the
+    modification time of the template files read when building the environment.
+    """
+    params = []
+    for module in (cmaq_config, template_defn):
+        for name, value in sorted(vars(module).items()):
+            if not name.startswith("_") and isinstance(value, _config_types):
+                params.append((module.__name__, name, repr(value)))
+    template_files = [
+        dt.replace_date(template_defn.emis, date_defn.start_date),
+        template_defn.conc,
+        template_defn.force,
+        template_defn.sense_emis,
+    ]
+    mtimes = tuple(os.stat(f).st_mtime_ns if os.path.isfile(f) else None for f in template_files)
+    return (*params, repr(date_defn.start_date), mtimes)
+
+
+def memoize_run_env(build_func):
+    """Decorator caching an env_dict builder until the config changes.
+
+    notes: each call returns a new copy of the cached dict, so callers can add to it.
+    safe to call from multiple threads.
+    """
+
+    @functools.wraps(build_func)
+    def cached_build():
+        key = get_config_key()
+        with run_env_lock:
+            cached = run_env_cache.get(build_func.__name__)
+            if cached is None or cached[0] != key:
+                start_time = time.time()
+                cached = (key, build_func())
+                run_env_cache[build_func.__name__] = cached
+                logger.debug(
+                    f"built {build_func.__name__} environment in {time.time() - start_time:.3f}s"
+                )
+        return dict(cached[1])
+
+    return cached_build
+
+
 def setup_run():
-    """Setup all the constant environment variables."""
+    """Setup all the constant environment variables.
+
+    notes: the result is cached, only rebuilt when the config changes (see get_config_key).
+    """
+    # Ensure the directory for the checkpoint files already exists
+    fh.ensure_path(cmaq_config.chk_path)
+    return _build_run_env()
+
+
+@memoize_run_env
+def _build_run_env():
     env_dict = {
         "NPCOL_NPROW": f"{cmaq_config.npcol} {cmaq_config.nprow}",
         "IOAPI_LOG_WRITE": "T" if cmaq_config.ioapi_logging else "F",
@@ -71,6 +143,8 @@ def setup_run():
         "CTM_STTIME": "".join([f"{i:02d}" for i in cmaq_config.sttime]),
         "CTM_RUNLEN": "".join([f"{i:02d}" for i in cmaq_config.runlen]),
         "CTM_TSTEP": "".join([f"{i:02d}" for i in cmaq_config.tstep]),
+        "LOCAL_CMAQ_COURANT": cmaq_config.local_courant,
+        "LOCAL_CMAQ_DECAY": str(cmaq_config.local_decay),
     }
 
     if str(cmaq_config.emis_lays).strip().lower() == "template":
@@ -104,9 +178,6 @@ def setup_run():
     else:
         env_dict["AVG_CONC_SPCS"] = str(cmaq_config.avg_conc_spcs)
 
-    # Ensure the directory for the checkpoint files already exists
-    fh.ensure_path(cmaq_config.chk_path)
-
     env_dict["ADJ_CHEM_CHK"] = cmaq_config.chem_chk + " -v"
     env_dict["ADJ_VDIFF_CHK"] = cmaq_config.vdiff_chk + " -v"
     env_dict["ADJ_AERO_CHK"] = cmaq_config.aero_chk + " -v"
@@ -236,7 +307,7 @@ def run_cmaq(
     res = subprocess.run(
         cmd,
         shell=True,
-        executable="/bin/csh",
+        executable=cmaq_config.cmd_shell,
         capture_output=True,
         text=True,
         env=environment,
@@ -267,10 +338,11 @@ def run_cmaq(
     return res
 
 
-def run_fwd_single(date: datetime.date, is_first: bool) -> None:
-    """Run cmaq fwd for a single day.
+def get_fwd_env(date: datetime.date, is_first: bool) -> dict[str, str]:
+    """Get the environment for a cmaq fwd run of a single day.
 
     input: dt.date, Boolean (is this day the first of the model)
+    output: dictionary (envvar_name: value).
     """
     env_dict = setup_run()
 
@@ -300,8 +372,17 @@ def run_fwd_single(date: datetime.date, is_first: bool) -> None:
         env_dict["INIT_TRAC_1"] = prev_grid
         env_dict["CTM_XFIRST_IN"] = prev_xfirst
 
-    env_dict = parse_env_dict(env_dict, date)
+    return parse_env_dict(env_dict, date)
+
+
+def run_fwd_single(date: datetime.date, is_first: bool) -> None:
+    """Run cmaq fwd for a single day.
 
+    input: dt.date, Boolean (is this day the first of the model)
+    """
+    env_dict = get_fwd_env(date, is_first)
+
+    record_outputs("fwd", cmaq_config.wipeout_fwd_list, date)
     run_cmaq(
         cmaq_config.fwd_prog,
         env_dict=env_dict,
@@ -310,14 +391,55 @@ def run_fwd_single(date: datetime.date, is_first: bool) -> None:
     )
 
 
+def get_bwd_env(date: datetime.date, is_first: bool) -> dict[str, str]:
+    """Get the environment for a cmaq bwd run of a single day.
+
+    input: dt.date, Boolean (is this the first time called)
+    output: dictionary (envvar_name: value).
+    """
+    env_dict = setup_bwd_run()
+
+    if is_first is not True:
+        prev_conc = dt.move_tag(cmaq_config.conc_sense_file, 1)
+        prev_emis = dt.move_tag(cmaq_config.emis_sense_file, 1)
+        prev_scale = dt.move_tag(cmaq_config.emis_scale_sense_file, 1)
+        env_dict["INIT_LGRID_1"] = prev_conc
+        env_dict["INIT_EM_1"] = prev_emis
+        env_dict["INIT_EM_SF_1"] = prev_scale
+
+    return parse_env_dict(env_dict, date)
+
+
 def run_bwd_single(date, is_first):
     """Run cmaq bwd for a single day.
 
     input: dt.date, Boolean (is this the first time called)
     output: None.
     """
+    env_dict = get_bwd_env(date, is_first)
+
+    record_outputs("bwd", cmaq_config.wipeout_bwd_list, date)
+    run_cmaq(
+        cmaq_config.bwd_prog,
+        date=date,
+        template_stdout_filename=cmaq_config.bwd_stdout_log,
+        env_dict=env_dict,
+    )
+
+
+def setup_bwd_run():
+    """Setup all the constant environment variables of a backward run.
+
+    notes: the result is cached, only rebuilt when the config changes (see get_config_key).
+    """
     env_dict = setup_run()
+    env_dict.update(_build_bwd_run_env())
+    return env_dict
 
+
+@memoize_run_env
+def _build_bwd_run_env():
+    env_dict = {}
     env_dict["CTM_APPL"] = cmaq_config.bwd_appl
     env_dict["CTM_XFIRST_OUT"] = cmaq_config.bwd_xfirst_file
     env_dict["CTM_XFIRST_IN"] = cmaq_config.fwd_xfirst_file
@@ -351,23 +473,7 @@ def run_bwd_single(date, is_first):
         env_dict["CTM_EMSENSL"] = str(emsensl)
     else:
         env_dict["CTM_EMSENSL"] = str(cmaq_config.sense_emis_lays)
-
-    if is_first is not True:
-        prev_conc = dt.move_tag(cmaq_config.conc_sense_file, 1)
-        prev_emis = dt.move_tag(cmaq_config.emis_sense_file, 1)
-        prev_scale = dt.move_tag(cmaq_config.emis_scale_sense_file, 1)
-        env_dict["INIT_LGRID_1"] = prev_conc
-        env_dict["INIT_EM_1"] = prev_emis
-        env_dict["INIT_EM_SF_1"] = prev_scale
-
-    env_dict = parse_env_dict(env_dict, date)
-
-    run_cmaq(
-        cmaq_config.bwd_prog,
-        date=date,
-        template_stdout_filename=cmaq_config.bwd_stdout_log,
-        env_dict=env_dict,
-    )
+    return env_dict
 
 
 def clear_local_logs():
@@ -384,14 +490,168 @@ def clear_local_logs():
                 os.remove(full_file_name)
 
 
+# completed days of cmaq runs {run_type: {YYYYMMDD: input_hash}}, mirrors cmaq_config.progress_file
+progress = None
+progress_path = None
+
+
+def get_progress():
+    """Get the record of completed days of cmaq runs.
+    input: None
+    output: dict {run_type ('fwd' or 'bwd'): {YYYYMMDD: input_hash}}.
+
+    notes: loaded from cmaq_config.progress_file on first use.
+    """
+    global progress
+    global progress_path
+    if progress is None or progress_path != cmaq_config.progress_file:
+        progress = {"fwd": {}, "bwd": {}}
+        progress_path = cmaq_config.progress_file
+        if os.path.isfile(progress_path):
+            with open(progress_path) as f:
+                progress.update(json.load(f))
+    return progress
+
+
+def save_progress():
+    """Write the record of completed days of cmaq runs to cmaq_config.progress_file."""
+    fh.ensure_path(progress_path, inc_file=True)
+    tmp_path = f"{progress_path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(get_progress(), f)
+    os.replace(tmp_path, progress_path)
+
+
+def hash_inputs(prev_hash: str, env_dict: dict[str, str], input_files: list[str]) -> str:
+    """
+    Hash everything a single day cmaq run depends on.
+
+    Parameters
+    ----------
+    prev_hash
+        Hash of the previous day of the run, so a day depends on all days before it
+    env_dict
+        Environment of the run
+    input_files
+        Files read by the run that change between runs (emissions, forcing, etc.)
+
+    Returns
+    -------
+    Hex digest of the inputs
+    """
+    digest = hashlib.blake2b(prev_hash.encode(), digest_size=20)
+    digest.update(json.dumps(sorted(env_dict.items())).encode())
+    for fname in input_files:
+        digest.update(fname.encode())
+        if os.path.isfile(fname):
+            with open(fname, "rb") as f:
+                for block in iter(functools.partial(f.read, 2**20), b""):
+                    digest.update(block)
+        else:
+            digest.update(b"missing")
+    return digest.hexdigest()
+
+
+def _day_files(file_list: list[str], date: datetime.date) -> list[str]:
+    # only templated files belong to a single day
+    return [dt.replace_date(pattern, date) for pattern in file_list if "<" in pattern]
+
+
+def _outputs_valid(file_list: list[str], date: datetime.date) -> bool:
+    for fname in _day_files(file_list, date):
+        if not os.path.isfile(fname) or os.path.getsize(fname) == 0:
+            return False
+    return True
+
+
+def _run_day(run_type: str, run_single, date: datetime.date, is_first: bool, input_hash: str):
+    """Run a single day of cmaq, retrying failures and recording progress."""
+    day = date.strftime("%Y%m%d")
+    file_list = getattr(cmaq_config, f"wipeout_{run_type}_list")
+    check_list = getattr(cmaq_config, f"{run_type}_resume_check")
+    day_progress = get_progress()[run_type]
+
+    if cmaq_config.resume_runs is True:
+        if day_progress.get(day) == input_hash and _outputs_valid(check_list, date):
+            logger.info(f"{run_type} {day} already completed with the same inputs, skipping.")
+            return
+        if day_progress.pop(day, None) is not None:
+            save_progress()
+
+    attempt = 0
+    while True:
+        # remove any partial output of this day before running it
+        remove_files(_day_files(file_list, date))
+        try:
+            run_single(date, is_first)
+            break
+        except ValueError:
+            if attempt >= cmaq_config.run_retries:
+                raise
+            delay = cmaq_config.retry_delay * 2**attempt
+            attempt += 1
+            logger.warning(
+                f"{run_type} {day} failed, retry {attempt} of {cmaq_config.run_retries} "
+                f"in {delay}s."
+            )
+            time.sleep(delay)
+
+    if cmaq_config.resume_runs is True:
+        day_progress[day] = input_hash
+        save_progress()
+
+
+def log_skipped_days(run_type: str):
+    """Report the days without observations that are not run."""
+    skip_dates = [date for date in dt.get_datelist() if date not in dt.get_model_datelist()]
+    if len(skip_dates) > 0:
+        logger.info(
+            f"{run_type} skipping {len(skip_dates)} days after the last observation "
+            f"({skip_dates[0]} to {skip_dates[-1]})."
+        )
+
+
+def write_zero_sensitivity(date: datetime.date):
+    """
+    Write the sensitivity outputs of a day that has no forcing.
+
+    Parameters
+    ----------
+    date
+        Date after the last observation, which is not run
+    """
+    sense_files = [
+        (template_defn.sense_conc, cmaq_config.conc_sense_file),
+        (template_defn.sense_emis, cmaq_config.emis_sense_file),
+    ]
+    record_outputs("bwd", [dest for _, dest in sense_files], date)
+    for template, dest in sense_files:
+        spcs = ncf.get_attr(template, "VAR-LIST").split()
+        var_change = {spc: np.zeros(ncf.get_variable(template, spc).shape) for spc in spcs}
+        dest = dt.replace_date(dest, date)
+        fh.ensure_path(dest, inc_file=True)
+        ncf.create_from_template(template, dest, var_change=var_change, date=date)
+
+
 def run_fwd():
     """Run cmaq fwd from current config.
     input: None
     output: None.
+
+    notes: days completed by a previous run with identical inputs are skipped,
+    see cmaq_config.resume_runs.
+    days after data_access.model_end_date are not run, see dt.get_model_datelist.
     """
+    log_skipped_days("fwd")
+    input_hash = ""
     isfirst = True
-    for cur_date in dt.get_datelist():
-        run_fwd_single(cur_date, isfirst)
+    for cur_date in dt.get_model_datelist():
+        if cmaq_config.resume_runs is True:
+            input_files = [dt.replace_date(cmaq_config.emis_file, cur_date)]
+            if isfirst is True:
+                input_files.append(dt.replace_date(cmaq_config.icon_file, cur_date))
+            input_hash = hash_inputs(input_hash, get_fwd_env(cur_date, isfirst), input_files)
+        _run_day("fwd", run_fwd_single, cur_date, isfirst, input_hash)
         isfirst = False
         clear_local_logs()
 
@@ -400,44 +660,163 @@ def run_bwd():
     """Run cmaq bwd from current config.
     input: None
     output: None.
+
+    notes: days completed by a previous run with identical inputs are skipped,
+    see cmaq_config.resume_runs.
+    days after data_access.model_end_date are not run, their sensitivities are
+    exactly zero as they have no forcing, see dt.get_model_datelist.
     """
+    log_skipped_days("bwd")
+    model_dates = dt.get_model_datelist()
+    for cur_date in dt.get_datelist():
+        if cur_date not in model_dates:
+            write_zero_sensitivity(cur_date)
+
+    fwd_progress = get_progress()["fwd"]
+    input_hash = ""
     isfirst = True
-    for cur_date in dt.get_datelist()[::-1]:
-        run_bwd_single(cur_date, isfirst)
+    for cur_date in model_dates[::-1]:
+        if cmaq_config.resume_runs is True:
+            # the bwd run depends on the fwd run up to the same day
+            fwd_hash = fwd_progress.get(cur_date.strftime("%Y%m%d"), "")
+            input_files = [dt.replace_date(cmaq_config.force_file, cur_date)]
+            env_dict = get_bwd_env(cur_date, isfirst)
+            input_hash = hash_inputs(input_hash + fwd_hash, env_dict, input_files)
+        _run_day("bwd", run_bwd_single, cur_date, isfirst, input_hash)
         isfirst = False
         clear_local_logs()
 
 
-def _cleanup(file_list: list[str]):
+# files created by cmaq runs {run_type: {filepath: None}}, mirrors cmaq_config.manifest_file
+manifest = None
+manifest_path = None
+
+
+def get_manifest():
+    """Get the record of files created by cmaq runs.
+    input: None
+    output: dict {run_type ('fwd' or 'bwd'): {filepath: None}}.
+
+    notes: loaded from cmaq_config.manifest_file on first use.
+    a run_type is missing if there is no record of the files it created.
+    """
+    global manifest
+    global manifest_path
+    if manifest is None or manifest_path != cmaq_config.manifest_file:
+        manifest = {}
+        manifest_path = cmaq_config.manifest_file
+        if os.path.isfile(manifest_path):
+            with open(manifest_path) as f:
+                manifest = {k: dict.fromkeys(v) for k, v in json.load(f).items()}
+    return manifest
+
+
+def save_manifest():
+    """Write the record of files created by cmaq runs to cmaq_config.manifest_file."""
+    fh.ensure_path(manifest_path, inc_file=True)
+    tmp_path = f"{manifest_path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({k: list(v) for k, v in get_manifest().items()}, f)
+    os.replace(tmp_path, manifest_path)
+
+
+def record_outputs(run_type: str, file_list: list[str], date: datetime.date):
     """
-    Deletes a list of files.
+    Add the files a single day cmaq run can create to the manifest.
 
-    Each file may contain dates, which are replaced with wildcards before deletion.
+    Parameters
+    ----------
+    run_type
+        'fwd' or 'bwd'
+    file_list
+        List of templated files created by the run
+    date
+        Date of the run
+    """
+    files = get_manifest().setdefault(run_type, {})
+    files.update(dict.fromkeys(dt.replace_date(pattern, date) for pattern in file_list))
+    save_manifest()
+
+
+def remove_files(file_list: list[str]):
+    """
+    Remove a list of files.
+
+    Missing files are ignored.
 
     Parameters
     ----------
     file_list
-        List of templated files to be deleted
+        List of files to be removed
     """
-    clear_local_logs()
+    for fname in file_list:
+        try:
+            os.remove(fname)
+        except (FileNotFoundError, IsADirectoryError):
+            pass
 
-    all_tags = dt.tag_map.keys()
-    for pat_name in file_list:
-        name = pat_name
-        # Loop over the different date tags and replace them with a wildcard
-        for t in all_tags:
-            name = name.replace(t, "*")
-        for fname in glob.glob(name):
-            if os.path.isfile(fname):
-                os.remove(fname)
 
+def _cleanup(run_type: str, file_list: list[str], keep_progress: bool = False):
+    """
+    Deletes the files created by cmaq runs.
 
-def wipeout_bwd():
-    """Delete all files created by a backward run of cmaq."""
-    _cleanup(cmaq_config.wipeout_bwd_list)
+    Files listed in the manifest for run_type are removed. If there is no record
+    of run_type in the manifest, each templated file has its dates replaced with
+    wildcards and every matching file is removed.
 
+    Parameters
+    ----------
+    run_type
+        'fwd' or 'bwd'
+    file_list
+        List of templated files to be deleted
+    keep_progress
+        Keep the files of days recorded as completed, so a following run can resume
+        from them. Only used if cmaq_config.resume_runs is True.
+    """
+    clear_local_logs()
+
+    files = get_manifest()
+    day_progress = get_progress()[run_type]
+    if keep_progress is True and cmaq_config.resume_runs is True and run_type in files:
+        keep = set()
+        for day in day_progress.keys():
+            date = datetime.datetime.strptime(day, "%Y%m%d").date()
+            keep.update(dt.replace_date(pattern, date) for pattern in file_list)
+        remove_files([fname for fname in files[run_type] if fname not in keep])
+        files[run_type] = {fname: None for fname in files[run_type] if fname in keep}
+        save_manifest()
+        return
+
+    if day_progress:
+        day_progress.clear()
+        save_progress()
+    if run_type in files:
+        remove_files(list(files[run_type]))
+    else:
+        logger.debug(f"no manifest of {run_type} files, searching for files to delete.")
+        all_tags = dt.tag_map.keys()
+        for pat_name in file_list:
+            name = pat_name
+            # Loop over the different date tags and replace them with a wildcard
+            for t in all_tags:
+                name = name.replace(t, "*")
+            remove_files([fname for fname in glob.glob(name) if os.path.isfile(fname)])
+    files[run_type] = {}
+    save_manifest()
+
+
+def wipeout_bwd(keep_progress=False):
+    """Delete all files created by a backward run of cmaq.
+
+    notes: if keep_progress is True the files of completed days are kept for resuming.
+    """
+    _cleanup("bwd", cmaq_config.wipeout_bwd_list, keep_progress=keep_progress)
 
-def wipeout_fwd():
-    """Delete all files created by a forward run of cmaq."""
 
-    _cleanup(cmaq_config.wipeout_fwd_list)
+def wipeout_fwd(keep_progress=False):
+    """Delete all files created by a forward run of cmaq.
+
+    notes: if keep_progress is True the files of completed days are kept for resuming.
+    """
+    _cleanup("fwd", cmaq_config.wipeout_fwd_list, keep_progress=keep_progress)
@@ -0,0 +1,160 @@
+#
+# Copyright 2025 The Superpower Institute
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""
+Convergence monitor stopping the minimization once it stops making progress.
+
+After every iteration the monitor records:
+
+- ``cost_reduction``, the cost reduction of the iteration relative to the cost
+- ``grad_reduction``, the projected gradient norm relative to the start
+- ``step_ratio``, the length of the step of the iteration relative to the distance
+  of the unknowns from the prior, both in units of the prior uncertainty
+
+and stops the minimization when any enabled threshold has been met for
+``patience`` iterations in a row. A threshold of 0 is disabled.
+The metrics, the decision and an estimate of the model hours saved
+(the iterations not run times the mean iteration time) are written as json.
+"""
+
+import json
+import os
+import time
+
+import attrs
+import numpy as np
+
+from openmethane.util.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+@attrs.define
+class ConvergenceMonitor:
+    """Track the progress of every iteration & decide when to stop."""
+
+    maxiter: int
+    cost_reduction: float = 0.0
+    grad_reduction: float = 0.0
+    step_ratio: float = 0.0
+    patience: int = 2
+    bg_vector: np.ndarray | None = attrs.field(default=None, eq=False, repr=False)
+    lower: np.ndarray | None = attrs.field(default=None, eq=False, repr=False)
+    records: list[dict] = attrs.field(factory=list, repr=False)
+    decision: str | None = None
+    _prev: dict | None = attrs.field(default=None, repr=False)
+    _init_grad_norm: float | None = attrs.field(default=None, repr=False)
+    _met: dict[str, int] = attrs.field(factory=dict, repr=False)
+
+    @property
+    def enabled(self) -> bool:
+        return self.cost_reduction > 0 or self.grad_reduction > 0 or self.step_ratio > 0
+
+    def projected_gradient(self, vector: np.ndarray, gradient: np.ndarray) -> np.ndarray:
+        """Gradient without the components pushing unknowns below their lower bound."""
+        if self.lower is None:
+            return gradient
+        at_bound = (vector <= self.lower) & (gradient > 0)
+        return np.where(at_bound, 0.0, gradient)
+
+    def start(self, vector: np.ndarray, cost: float, gradient: np.ndarray):
+        """Record the start of the minimization."""
+        self._prev = {"vector": np.array(vector), "cost": float(cost), "time": time.time()}
+        self._init_grad_norm = float(np.linalg.norm(self.projected_gradient(vector, gradient)))
+
+    def update(self, vector: np.ndarray, cost: float, gradient: np.ndarray | None) -> bool:
+        """
+        Record an iteration
+
+        Parameters
+        ----------
+        vector
+            Unknowns of the iteration
+        cost
+            Cost of the iteration
+        gradient
+            Gradient of the iteration, None if unavailable
+
+        Returns
+        -------
+        True if the minimization should stop
+        """
+        assert self._prev is not None, "ConvergenceMonitor.start must be called first"
+        now = time.time()
+        vector = np.array(vector)
+        cost_change = self._prev["cost"] - cost
+        record = {
+            "iteration": len(self.records) + 1,
+            "cost": float(cost),
+            "cost_reduction": float(cost_change / max(abs(self._prev["cost"]), abs(cost), 1.0)),
+            "grad_reduction": None,
+            "step_ratio": None,
+            "seconds": now - self._prev["time"],
+        }
+        if gradient is not None and self._init_grad_norm:
+            grad_norm = np.linalg.norm(self.projected_gradient(vector, np.asarray(gradient)))
+            record["grad_reduction"] = float(grad_norm / self._init_grad_norm)
+        if self.bg_vector is not None:
+            distance = np.linalg.norm(vector - self.bg_vector)
+            step = np.linalg.norm(vector - self._prev["vector"])
+            record["step_ratio"] = float(step / distance) if distance > 0 else None
+        self.records.append(record)
+        self._prev = {"vector": vector, "cost": float(cost), "time": now}
+
+        thresholds = {
+            "cost_reduction": self.cost_reduction,
+            "grad_reduction": self.grad_reduction,
+            "step_ratio": self.step_ratio,
+        }
+        for name, threshold in thresholds.items():
+            value = record[name]
+            if threshold > 0 and value is not None and abs(value) <= threshold:
+                self._met[name] = self._met.get(name, 0) + 1
+            else:
+                self._met[name] = 0
+            if self.decision is None and self._met[name] >= self.patience:
+                self.decision = (
+                    f"{name} <= {threshold} for {self.patience} iterations "
+                    f"(at iteration {record['iteration']})"
+                )
+        if self.decision is not None:
+            logger.info(f"convergence monitor stopping the minimization: {self.decision}")
+        return self.decision is not None
+
+    @property
+    def hours_saved(self) -> float:
+        """Estimated hours saved by stopping early, from the mean iteration time."""
+        if self.decision is None or len(self.records) == 0:
+            return 0.0
+        mean_seconds = np.mean([record["seconds"] for record in self.records])
+        return float(max(self.maxiter - len(self.records), 0) * mean_seconds / 3600)
+
+    def write(self, filepath: str):
+        """Write the thresholds, metrics of every iteration & decision as json."""
+        summary = {
+            "thresholds": {
+                "cost_reduction": self.cost_reduction,
+                "grad_reduction": self.grad_reduction,
+                "step_ratio": self.step_ratio,
+                "patience": self.patience,
+                "maxiter": self.maxiter,
+            },
+            "iterations": self.records,
+            "decision": self.decision,
+            "estimated_hours_saved": self.hours_saved,
+        }
+        os.makedirs(os.path.dirname(filepath), exist_ok=True)
+        with open(filepath, "w") as f:
+            json.dump(summary, f, indent=2)
@@ -16,7 +16,7 @@
 
 import datetime
 
-from openmethane.fourdvar.params import date_defn
+from openmethane.fourdvar.params import data_access, date_defn
 
 # map string tags to date conversion functions
 tag_map = {
@@ -51,6 +51,18 @@ def get_datelist() -> list[datetime.date]:
     return datelist
 
 
+def get_model_datelist() -> list[datetime.date]:
+    """Get the list of dates which CMAQ is run for.
+
+    output: list of datetime.date objects.
+
+    notes: dates after data_access.model_end_date are not simulated,
+    they have no observations so do not change the cost or gradient.
+    """
+    end_date = data_access.model_end_date
+    return [date for date in get_datelist() if end_date is None or date <= end_date]
+
+
 def replace_date(src: str, date: datetime.date | datetime.datetime | tuple[int, int, int]) -> str:
     """Replace date tags with date data.
 
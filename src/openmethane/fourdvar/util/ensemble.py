@@ -0,0 +1,252 @@
+#
+# Copyright 2025 The Superpower Institute
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""Run independent CMAQ simulations concurrently.
+
+Every member of an ensemble runs in a forked process with its own workspace
+in cmaq_config.ensemble_path. All the cmaq_config paths under cmaq_base and
+chk_path are moved into the workspace, so members never share emission, forcing,
+output or checkpoint files. The number of concurrent members is limited so the
+CPU/MPI slots used (npcol * nprow per run) stay within cmaq_config.ensemble_slots.
+"""
+
+import multiprocessing
+import os
+import time
+from collections.abc import Callable, Sequence
+from concurrent.futures import ProcessPoolExecutor
+
+from openmethane.fourdvar import datadef as d
+from openmethane.fourdvar._transform import transform
+from openmethane.fourdvar.params import cmaq_config
+from openmethane.fourdvar.util import cmaq_handle, cmaq_io_files
+from openmethane.util.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+def get_member_path(index: int) -> str:
+    """Path of the workspace used by an ensemble member."""
+    return os.path.join(cmaq_config.ensemble_path, f"member_{index:03d}")
+
+
+def get_max_parallel(nmembers: int) -> int:
+    """
+    Number of ensemble members that can run at once
+
+    Parameters
+    ----------
+    nmembers
+        Number of members in the ensemble
+
+    Returns
+    -------
+    Members that fit in cmaq_config.ensemble_slots, between 1 and nmembers
+    """
+    run_slots = int(cmaq_config.npcol) * int(cmaq_config.nprow)
+    total_slots = cmaq_config.ensemble_slots or os.cpu_count() or 1
+    if run_slots > total_slots:
+        logger.warning(f"each run uses {run_slots} slots, more than the {total_slots} available")
+    return max(1, min(nmembers, total_slots // run_slots))
+
+
+def get_workspace_config(member_path: str) -> dict:
+    """
+    Get the cmaq_config values that isolate a run in a workspace
+
+    Parameters
+    ----------
+    member_path
+        Directory of the workspace
+
+    Returns
+    -------
+    Changed cmaq_config values {name: value}
+    """
+    # longest prefix first, chk_path is often inside cmaq_base
+    moves = sorted(
+        [
+            (cmaq_config.chk_path, os.path.join(member_path, "chkpnt")),
+            (cmaq_config.cmaq_base, member_path),
+        ],
+        key=lambda move: len(move[0]),
+        reverse=True,
+    )
+
+    def relocate(value):
+        if isinstance(value, list):
+            return [relocate(v) for v in value]
+        if isinstance(value, str):
+            for old, new in moves:
+                if value == old or value.startswith(old + os.sep):
+                    return new + value[len(old) :]
+        return value
+
+    config = {}
+    for name, value in vars(cmaq_config).items():
+        if name.startswith("_") or name == "ensemble_path":
+            continue
+        new_value = relocate(value)
+        if new_value != value:
+            config[name] = new_value
+
+    # inputs written for each run, even when configured outside cmaq_base
+    for name, subdir in (("emis_file", "emissions"), ("force_file", "force")):
+        if name not in config:
+            file_name = os.path.basename(getattr(cmaq_config, name))
+            config[name] = os.path.join(member_path, subdir, file_name)
+
+    # CMAQ writes logs in the current directory, each member runs in its workspace
+    config["curdir"] = member_path
+    config["cwd_logs"] = [
+        os.path.join(member_path, "CTM_LOG_*"),
+        os.path.join(member_path, "N_SPC_EMIS.dat"),
+    ]
+    return config
+
+
+def enter_workspace(member_path: str, config: dict):
+    """
+    Point the CMAQ params of this process at a workspace
+
+    notes: only call in a process that is dedicated to the workspace,
+    the original params are not restored.
+
+    Parameters
+    ----------
+    member_path
+        Directory of the workspace
+    config
+        cmaq_config values from get_workspace_config
+    """
+    for name, value in config.items():
+        setattr(cmaq_config, name, value)
+
+    # forget the files and run records of the parent process
+    cmaq_io_files.firsttime = True
+    cmaq_io_files.all_files = {}
+    cmaq_handle.manifest = None
+    cmaq_handle.progress = None
+
+    make_workspace(member_path, config)
+    os.chdir(member_path)
+
+
+def make_workspace(member_path: str, config: dict):
+    """Create the directories of a workspace, safe to call from concurrent members."""
+    for name in ("emis_file", "force_file"):
+        os.makedirs(os.path.dirname(config[name]), exist_ok=True)
+    os.makedirs(member_path, exist_ok=True)
+
+
+def _run_member(member_path: str, config: dict, func: Callable, args: tuple):
+    enter_workspace(member_path, config)
+    start_time = time.time()
+    result = func(*args)
+    logger.debug(f"{member_path} completed in {time.time() - start_time:.2f}s")
+    return result
+
+
+def run_ensemble(func: Callable, members: Sequence[tuple]) -> list:
+    """
+    Run a function for every member of an ensemble in separate workspaces
+
+    Parameters
+    ----------
+    func
+        Function run for each member, must be defined at the top level of a module.
+        CMAQ runs made by the function use the member workspace.
+    members
+        Arguments passed to func for each member
+
+    Returns
+    -------
+    Results of func in the same order as members
+    """
+    members = list(members)
+    if len(members) == 0:
+        return []
+    max_parallel = get_max_parallel(len(members))
+    logger.info(f"running {len(members)} ensemble members, {max_parallel} at a time")
+
+    # the workspace config is derived from the params of this process,
+    # a worker may already have moved its params into another workspace
+    jobs = []
+    for index, args in enumerate(members):
+        member_path = get_member_path(index)
+        config = get_workspace_config(member_path)
+        # members share parent directories, create them before forking
+        make_workspace(member_path, config)
+        jobs.append((member_path, config, func, tuple(args)))
+
+    # members are forked so they inherit the params & class setup of this process
+    with ProcessPoolExecutor(
+        max_workers=max_parallel, mp_context=multiprocessing.get_context("fork")
+    ) as pool:
+        futures = [pool.submit(_run_member, *job) for job in jobs]
+        return [future.result() for future in futures]
+
+
+def _forward(physical: d.PhysicalData) -> d.ModelOutputData:
+    model_input = transform(physical, d.ModelInputData)
+    return transform(model_input, d.ModelOutputData)
+
+
+def _gradient(
+    physical: d.PhysicalData, observed: d.ObservationData
+) -> tuple[d.ObservationData, d.PhysicalAdjointData]:
+    model_output = _forward(physical)
+    simulated = transform(model_output, d.ObservationData)
+    residual = d.ObservationData.get_residual(observed, simulated)
+    w_residual = d.ObservationData.error_weight(residual)
+    adj_forcing = transform(w_residual, d.AdjointForcingData)
+    sensitivity = transform(adj_forcing, d.SensitivityData)
+    return simulated, transform(sensitivity, d.PhysicalAdjointData)
+
+
+def run_forward(physical_list: Sequence[d.PhysicalData]) -> list[d.ModelOutputData]:
+    """
+    Run the forward model for several sets of physical values at once
+
+    Parameters
+    ----------
+    physical_list
+        Model inputs of each member
+
+    Returns
+    -------
+    ModelOutputData of each member, reading the output files in the member workspace
+    """
+    return run_ensemble(_forward, [(physical,) for physical in physical_list])
+
+
+def run_gradient(
+    physical_list: Sequence[d.PhysicalData], observed: d.ObservationData
+) -> list[tuple[d.ObservationData, d.PhysicalAdjointData]]:
+    """
+    Run the forward and adjoint model for several sets of physical values at once
+
+    Parameters
+    ----------
+    physical_list
+        Model inputs of each member
+    observed
+        Observations compared with the simulated values of every member
+
+    Returns
+    -------
+    (simulated observations, gradient of the observation cost) of each member
+    """
+    return run_ensemble(_gradient, [(physical, observed) for physical in physical_list])
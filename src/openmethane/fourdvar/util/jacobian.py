@@ -0,0 +1,204 @@
+#
+# Copyright 2025 The Superpower Institute
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""Explicit Jacobian of the simulated observations for small control spaces.
+
+With linear transport the simulated observations are an affine function of the
+unknowns, so the Jacobian column of each unknown is the change in the simulated
+observations from a unit perturbation of that unknown. The perturbed forward runs
+are independent and run as an ensemble. Columns are saved after every batch, so
+an interrupted build resumes with the missing columns.
+
+In the preconditioned control space the prior covariance is the identity, so the
+Gaussian inversion has a closed form solution (see solve).
+"""
+
+import os
+from collections.abc import Callable
+
+import numpy as np
+import scipy.linalg
+
+from openmethane.fourdvar import datadef as d
+from openmethane.fourdvar._transform import transform
+from openmethane.fourdvar.util import ensemble
+from openmethane.fourdvar.util import file_handle as fh
+from openmethane.util.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+def _simulate(physical: d.PhysicalData) -> np.ndarray:
+    model_input = transform(physical, d.ModelInputData)
+    model_output = transform(model_input, d.ModelOutputData)
+    return np.array(transform(model_output, d.ObservationData).get_vector())
+
+
+def load_jacobian(
+    filepath: str, base_vector: np.ndarray, base_simulated: np.ndarray, columns: np.ndarray
+) -> np.ndarray:
+    """
+    Load the columns of a Jacobian built around the same base vector
+
+    Parameters
+    ----------
+    filepath
+        Saved Jacobian, may not exist
+    base_vector
+        Unknowns the Jacobian is built around
+    base_simulated
+        Simulated observations of base_vector
+    columns
+        Index of the unknowns in the Jacobian
+
+    Returns
+    -------
+    Jacobian (nobs, len(columns)), columns not yet built are NaN
+    """
+    jacobian = np.full((len(base_simulated), len(columns)), np.nan)
+    if not os.path.isfile(filepath):
+        return jacobian
+    with np.load(filepath) as saved:
+        if (
+            np.array_equal(saved["base_vector"], base_vector)
+            and np.array_equal(saved["base_simulated"], base_simulated)
+            and np.array_equal(saved["columns"], columns)
+        ):
+            jacobian = saved["jacobian"]
+        else:
+            logger.warning(f"{filepath} was built around a different vector, rebuilding")
+    return jacobian
+
+
+def save_jacobian(
+    filepath: str,
+    base_vector: np.ndarray,
+    base_simulated: np.ndarray,
+    columns: np.ndarray,
+    jacobian: np.ndarray,
+):
+    """Write the (partly built) Jacobian, replacing any previous file."""
+    fh.ensure_path(os.path.dirname(filepath))
+    tmp_file = os.path.join(os.path.dirname(filepath), f"tmp_{os.path.basename(filepath)}")
+    np.savez(
+        tmp_file,
+        base_vector=base_vector,
+        base_simulated=base_simulated,
+        columns=columns,
+        jacobian=jacobian,
+    )
+    os.replace(tmp_file, filepath)
+
+
+def build_jacobian(
+    filepath: str,
+    base_vector: np.ndarray,
+    base_simulated: np.ndarray,
+    columns: np.ndarray | None = None,
+) -> np.ndarray:
+    """
+    Build the Jacobian of the simulated observations with one forward run per unknown
+
+    Parameters
+    ----------
+    filepath
+        Where the Jacobian is saved, columns already saved there are reused
+    base_vector
+        Unknowns the Jacobian is built around
+    base_simulated
+        Simulated observations of base_vector
+    columns
+        Index of the unknowns to build the Jacobian for, default all unknowns
+
+    Returns
+    -------
+    Jacobian (nobs, len(columns)) in the preconditioned control space
+    """
+    if columns is None:
+        columns = np.arange(len(base_vector))
+    jacobian = load_jacobian(filepath, base_vector, base_simulated, columns)
+    missing = np.flatnonzero(np.isnan(jacobian).any(axis=0))
+    logger.info(f"building {len(missing)} of {len(columns)} jacobian columns")
+
+    # each batch reuses the same ensemble workspaces
+    batch_size = ensemble.get_max_parallel(len(missing))
+    for start in range(0, len(missing), batch_size):
+        batch = missing[start : start + batch_size]
+        physical_list = []
+        for i in batch:
+            vector = base_vector.copy()
+            vector[columns[i]] += 1.0
+            physical_list.append(transform(d.UnknownData(vector), d.PhysicalData))
+        simulated = ensemble.run_ensemble(_simulate, [(physical,) for physical in physical_list])
+        for i, column in zip(batch, simulated):
+            jacobian[:, i] = column - base_simulated
+        save_jacobian(filepath, base_vector, base_simulated, columns, jacobian)
+        logger.info(f"built {start + len(batch)} of {len(missing)} jacobian columns")
+    return jacobian
+
+
+def solve(
+    jacobian: np.ndarray,
+    base_vector: np.ndarray,
+    base_simulated: np.ndarray,
+    bg_vector: np.ndarray,
+    observed: np.ndarray,
+    whiten: Callable[[np.ndarray], np.ndarray],
+) -> dict:
+    """
+    Solve the Gaussian inversion in closed form
+
+    Parameters
+    ----------
+    jacobian
+        Jacobian (nobs, nunknowns) from build_jacobian
+    base_vector
+        Unknowns the Jacobian is built around
+    base_simulated
+        Simulated observations of base_vector
+    bg_vector
+        Prior unknowns, the prior covariance is the identity
+    observed
+        Observed values
+    whiten
+        Multiplies (nobs, ...) arrays by the inverse square root of the observation
+        error covariance (eg: ObservationData.whiten)
+
+    Returns
+    -------
+    dict of
+        vector: posterior unknowns
+        simulated: simulated observations of the posterior
+        covariance: posterior error covariance of the unknowns
+        averaging_kernel: sensitivity of the posterior to the true unknowns
+        dofs: degrees of freedom for signal, the trace of the averaging kernel
+    """
+    weighted_jac = whiten(jacobian)
+    identity = np.eye(len(bg_vector))
+    hessian = identity + weighted_jac.T @ weighted_jac
+    factor = scipy.linalg.cho_factor(hessian)
+
+    bg_simulated = base_simulated + jacobian @ (bg_vector - base_vector)
+    innovation = whiten(observed - bg_simulated)
+    vector = bg_vector + scipy.linalg.cho_solve(factor, weighted_jac.T @ innovation)
+    covariance = scipy.linalg.cho_solve(factor, identity)
+    averaging_kernel = identity - covariance
+    return {
+        "vector": vector,
+        "simulated": base_simulated + jacobian @ (vector - base_vector),
+        "covariance": covariance,
+        "averaging_kernel": averaging_kernel,
+        "dofs": np.trace(averaging_kernel),
+    }
@@ -0,0 +1,580 @@
+#
+# Copyright 2025 The Superpower Institute
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""
+Local stand-in for the CMAQ forward and adjoint executables.
+
+Runs a single day of a linear tracer model using the environment built by
+``cmaq_handle`` (see ``get_fwd_env`` and ``get_bwd_env``), so the fourdvar
+transforms can be run and profiled without a compiled CMAQ.
+
+usage::
+
+    ADJOINT_FWD="python -m openmethane.fourdvar.util.local_cmaq fwd"
+    ADJOINT_BWD="python -m openmethane.fourdvar.util.local_cmaq bwd"
+
+The forward model is, for each output timestep ``k``::
+
+    c[k+1] = decay * advect(c[k]) + tsec * unit[k] * emis[k]
+
+where ``unit`` converts mol/s into ppm/s exactly as ``map_sense`` assumes,
+``advect`` is first order upwind advection with constant courant numbers
+(inflow from the boundary file) and ``decay`` a first order loss.
+With the default settings there is no transport at all.
+The backward model is the exact adjoint of the forward model, so the
+gradient of the cost function matches finite differences to rounding error.
+
+Outputs are IOAPI style netCDF files: the hourly CONC, the final CGRID (used as
+the initial condition of the next day), the adjoint LGRID sensitivities and an
+advection checkpoint (ADJ_HADV_CHK) holding the transport used by the forward run.
+"""
+
+import datetime
+import os
+import shlex
+import sys
+import time
+
+import attrs
+import netCDF4
+import numpy as np
+
+# physical constants (precision matches cmaq & map_sense)
+mwair = 28.9628
+ppm_scale = 1e6
+kg_scale = 1e-3
+
+# global attributes describing the vertical grid, copied from the met file
+layer_attrs = ("VGTYP", "VGTOP")
+
+
+def get_path(name):
+    """Get a file path from the environment, without any IOAPI flags.
+    input: string (envvar name)
+    output: string.
+    """
+    return os.environ[name].split()[0]
+
+
+def hms_to_sec(hms):
+    """Convert an IOAPI HHMMSS value into seconds.
+    input: int or string
+    output: int.
+    """
+    hms = int(hms)
+    return 3600 * (hms // 10000) + 60 * ((hms // 100) % 100) + (hms % 100)
+
+
+def sec_to_hms(sec):
+    """Convert seconds into an IOAPI HHMMSS value.
+    input: int
+    output: int.
+    """
+    return 10000 * (sec // 3600) + 100 * ((sec // 60) % 60) + (sec % 60)
+
+
+def read_griddesc(path, gridname):
+    """Read the horizontal grid definition from an IOAPI GRIDDESC file.
+    input: string (path/to/GRIDDESC), string (name of grid)
+    output: dict {attr_name: value} of IOAPI global attributes.
+    """
+    with open(path) as griddesc:
+        lines = [shlex.split(line) for line in griddesc if line.strip()]
+    # the file has a segment of coordinate systems then a segment of grids,
+    # each segment is a sequence of (name, values) pairs ended by a blank name
+    segments = [[]]
+    for line in lines:
+        if line in ([" "], [""]):
+            segments.append([])
+        else:
+            segments[-1].append(line)
+    coords = dict(zip([line[0] for line in segments[1][::2]], segments[1][1::2]))
+    grids = dict(zip([line[0] for line in segments[2][::2]], segments[2][1::2]))
+    assert gridname in grids, f"grid {gridname} not in {path}"
+    coord_name, *grid = grids[gridname]
+    gdtyp, *proj = coords[coord_name]
+    xorig, yorig, xcell, ycell, ncols, nrows, nthik = grid
+    return {
+        "GDTYP": np.int32(gdtyp),
+        "P_ALP": float(proj[0]),
+        "P_BET": float(proj[1]),
+        "P_GAM": float(proj[2]),
+        "XCENT": float(proj[3]),
+        "YCENT": float(proj[4]),
+        "XORIG": float(xorig),
+        "YORIG": float(yorig),
+        "XCELL": float(xcell),
+        "YCELL": float(ycell),
+        "NCOLS": np.int32(ncols),
+        "NROWS": np.int32(nrows),
+        "NTHIK": np.int32(nthik),
+    }
+
+
+@attrs.frozen
+class Transport:
+    """Linear transport applied to the concentration once per timestep."""
+
+    courant_x: float = 0.0
+    courant_y: float = 0.0
+    decay: float = 1.0
+
+    def __attrs_post_init__(self):
+        msg = "courant numbers must be between -1 and 1 for a stable upwind scheme"
+        assert abs(self.courant_x) <= 1 and abs(self.courant_y) <= 1, msg
+
+    @classmethod
+    def from_env(cls, tsec):
+        """Read the transport settings from the environment.
+        input: int (seconds per timestep)
+        output: Transport.
+        """
+        courant = os.environ.get("LOCAL_CMAQ_COURANT", "0 0")
+        courant_x, courant_y = (float(c) for c in courant.split())
+        decay_rate = float(os.environ.get("LOCAL_CMAQ_DECAY", "0"))
+        return cls(courant_x, courant_y, float(np.exp(-decay_rate * tsec)))
+
+    def forward(self, conc, boundary):
+        """Apply one timestep of transport.
+        input: np.ndarray (lay, row, col), np.ndarray (lay, row+2, col+2)
+        output: np.ndarray (lay, row, col).
+
+        notes: boundary holds the inflow values in the outer ring of cells.
+        """
+        padded = boundary.copy()
+        padded[:, 1:-1, 1:-1] = conc
+        padded[:, 1:-1, 1:-1] = _upwind(padded, self.courant_x, axis=2)
+        conc = _upwind(padded, self.courant_y, axis=1)
+        return self.decay * conc
+
+    def adjoint(self, sense):
+        """Apply the adjoint of one timestep of transport.
+        input: np.ndarray (lay, row, col)
+        output: np.ndarray (lay, row, col).
+
+        notes: the boundary inflow does not depend on the concentration, so it has no adjoint.
+        """
+        sense = self.decay * sense
+        sense = _upwind_adjoint(sense, self.courant_y, axis=1)
+        return _upwind_adjoint(sense, self.courant_x, axis=2)
+
+
+def _upwind(padded, courant, axis):
+    """Upwind advection of the interior of a padded array along an axis."""
+    inner = (slice(None), slice(1, -1), slice(1, -1))
+    upstream = list(inner)
+    upstream[axis] = slice(None, -2) if courant >= 0 else slice(2, None)
+    return (1 - abs(courant)) * padded[inner] + abs(courant) * padded[tuple(upstream)]
+
+
+def _upwind_adjoint(sense, courant, axis):
+    """Transpose of _upwind, ignoring the (constant) boundary cells."""
+    result = (1 - abs(courant)) * sense
+    head = [slice(None)] * 3
+    tail = [slice(None)] * 3
+    head[axis] = slice(None, -1)
+    tail[axis] = slice(1, None)
+    if courant >= 0:
+        result[tuple(head)] += courant * sense[tuple(tail)]
+    else:
+        result[tuple(tail)] += -courant * sense[tuple(head)]
+    return result
+
+
+def perimeter_to_ghost(perim, nrows, ncols):
+    """Place an IOAPI boundary (PERIM) array in the outer ring of a padded grid.
+    input: np.ndarray (lay, perim), int, int
+    output: np.ndarray (lay, row+2, col+2).
+
+    notes: only for boundary files with NTHIK=1, sides are ordered south, east, north, west.
+    """
+    nlays = perim.shape[0]
+    assert perim.shape[1] == 2 * (nrows + ncols + 2), "boundary file is not NTHIK=1"
+    ghost = np.zeros((nlays, nrows + 2, ncols + 2))
+    south = ncols + 1
+    east = south + nrows + 1
+    north = east + ncols + 1
+    ghost[:, 0, 1:] = perim[:, :south]
+    ghost[:, 1:, -1] = perim[:, south:east]
+    ghost[:, -1, :-1] = perim[:, east:north]
+    ghost[:, :-1, 0] = perim[:, north:]
+    return ghost
+
+
+@attrs.frozen
+class RunSettings:
+    """Settings of a single day run, read from the environment."""
+
+    start: datetime.datetime
+    tsec: int
+    nstep: int
+    spcs: list[str]
+    conc_lays: tuple[int, int]
+    emis_lays: int
+
+    @classmethod
+    def from_env(cls):
+        """Read the run settings from the environment.
+        input: None
+        output: RunSettings.
+        """
+        start = datetime.datetime.strptime(os.environ["CTM_STDATE"], "%Y%j")
+        start += datetime.timedelta(seconds=hms_to_sec(os.environ["CTM_STTIME"]))
+        tsec = hms_to_sec(os.environ["CTM_TSTEP"])
+        runlen = hms_to_sec(os.environ["CTM_RUNLEN"])
+        assert runlen % tsec == 0, "CTM_RUNLEN must be a multiple of CTM_TSTEP"
+        blev, elev = (int(lay) for lay in os.environ["CONC_BLEV_ELEV"].split())
+        return cls(
+            start=start,
+            tsec=tsec,
+            nstep=runlen // tsec,
+            spcs=os.environ["CONC_SPCS"].split(),
+            conc_lays=(blev - 1, elev),
+            emis_lays=int(os.environ["CTM_EMLAYS"]),
+        )
+
+    def tflag(self, nvars, step=0, nrec=None):
+        """Build the IOAPI TFLAG values for a range of output records.
+        input: int, int, int (defaults to every record from step)
+        output: np.ndarray (nrec, nvars, 2).
+        """
+        if nrec is None:
+            nrec = self.nstep + 1 - step
+        tflag = np.zeros((nrec, nvars, 2), dtype="i4")
+        for i in range(nrec):
+            valid = self.start + datetime.timedelta(seconds=(step + i) * self.tsec)
+            tflag[i, :, 0] = int(valid.strftime("%Y%j"))
+            tflag[i, :, 1] = sec_to_hms(valid.hour * 3600 + valid.minute * 60 + valid.second)
+        return tflag
+
+
+def get_emis_unit(settings):
+    """Get the conversion from emissions (mol/s) to concentration change (ppm/s).
+    input: RunSettings
+    output: np.ndarray (nstep+1, emis_lays, row, col).
+
+    notes: matches the unit conversion of map_sense, including the interpolation
+    of DENSA_J to the middle of each output timestep.
+    """
+    with netCDF4.Dataset(get_path("MET_CRO_3D")) as met:
+        lay_sigma = np.array(met.getncattr("VGLVLS"), dtype=float)
+        cell_area = float(met.getncattr("XCELL") * met.getncattr("YCELL"))
+        rhoj = met.variables["DENSA_J"][:, : settings.emis_lays, ...].astype(float)
+    lay_thick = (lay_sigma[:-1] - lay_sigma[1:])[: settings.emis_lays]
+    lay_thick = lay_thick.reshape((1, -1, 1, 1))
+
+    nrec = settings.nstep + 1
+    assert (rhoj.shape[0] - 1) > 0 and settings.nstep % (rhoj.shape[0] - 1) == 0, (
+        "incompatible timesteps"
+    )
+    reps = settings.nstep // (rhoj.shape[0] - 1)
+    rhoj_interp = np.zeros((nrec, *rhoj.shape[1:]))
+    for r in range(reps):
+        frac = float(2 * r + 1) / float(2 * reps)
+        rhoj_interp[r:-1:reps, ...] = (1 - frac) * rhoj[:-1, ...] + frac * rhoj[1:, ...]
+    rhoj_interp[-1, ...] = rhoj[-1, ...]
+    return (ppm_scale * kg_scale * mwair) / (rhoj_interp * lay_thick) / cell_area
+
+
+def read_record(path, spcs, record, nlays=None):
+    """Read a single timestep of each species from an IOAPI file.
+    input: string, list, int, int (number of layers to return, zero padded)
+    output: dict {spc: np.ndarray (lay, row, col)}.
+    """
+    result = {}
+    with netCDF4.Dataset(path) as ncf_file:
+        for spc in spcs:
+            arr = ncf_file.variables[spc][record, ...].astype(float)
+            if nlays is not None and arr.shape[0] != nlays:
+                padded = np.zeros((nlays, *arr.shape[1:]))
+                padded[: min(nlays, arr.shape[0])] = arr[:nlays]
+                arr = padded
+            result[spc] = arr
+    return result
+
+
+def create_output(path, settings, variables, lays, upnam, filedesc, step=0, nrec=None):
+    """Create an IOAPI style output file on the model grid.
+    input: string, RunSettings, dict {varname: (units, var_desc)}, tuple (first, last+1 layer),
+           string, string, int, int
+    output: netCDF4.Dataset (open for writing).
+
+    notes: the first record is settings.start + step timesteps, files with
+    nrec=1 are written as a single snapshot of that time.
+    """
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    gridname = os.environ["GRID_NAME"]
+    attrs_dict = read_griddesc(get_path("GRIDDESC"), gridname)
+    with netCDF4.Dataset(get_path("MET_CRO_3D")) as met:
+        attrs_dict.update({name: met.getncattr(name) for name in layer_attrs})
+        vglvls = np.array(met.getncattr("VGLVLS"))
+
+    now = datetime.datetime.now()
+    cdate = np.int32(now.strftime("%Y%j"))
+    ctime = np.int32(now.strftime("%H%M%S"))
+    valid = settings.start + datetime.timedelta(seconds=step * settings.tsec)
+    nlays = lays[1] - lays[0]
+    attrs_dict.update(
+        {
+            "IOAPI_VERSION": "local_cmaq stand-in (openmethane)".ljust(80),
+            "EXEC_ID": os.environ.get("CTM_PROGNAME", "local_cmaq").ljust(80)[:80],
+            "CDATE": cdate,
+            "CTIME": ctime,
+            "WDATE": cdate,
+            "WTIME": ctime,
+            "SDATE": np.int32(valid.strftime("%Y%j")),
+            "STIME": np.int32(sec_to_hms(valid.hour * 3600 + valid.minute * 60 + valid.second)),
+            "TSTEP": np.int32(sec_to_hms(settings.tsec)),
+            "NLAYS": np.int32(nlays),
+            "NVARS": np.int32(len(variables)),
+            "VGLVLS": vglvls[lays[0] : lays[1] + 1].astype("f4"),
+            "FTYPE": np.int32(1),
+            "GDNAM": gridname.ljust(16)[:16],
+            "UPNAM": upnam.ljust(16)[:16],
+            "VAR-LIST": "".join(f"{name:<16}" for name in variables),
+            "FILEDESC": filedesc.ljust(80),
+            "HISTORY": "",
+        }
+    )
+    ncf_file = netCDF4.Dataset(path, "w", format="NETCDF3_64BIT_OFFSET")
+    ncf_file.setncatts(attrs_dict)
+    ncf_file.createDimension("TSTEP", None)
+    ncf_file.createDimension("DATE-TIME", 2)
+    ncf_file.createDimension("LAY", nlays)
+    ncf_file.createDimension("VAR", len(variables))
+    ncf_file.createDimension("ROW", int(attrs_dict["NROWS"]))
+    ncf_file.createDimension("COL", int(attrs_dict["NCOLS"]))
+
+    tflag = ncf_file.createVariable("TFLAG", "i4", ("TSTEP", "VAR", "DATE-TIME"))
+    tflag.setncatts(
+        {
+            "units": "<YYYYDDD,HHMMSS>",
+            "long_name": "TFLAG".ljust(16),
+            "var_desc": "Timestep-valid flags:  (1) YYYYDDD or (2) HHMMSS".ljust(80),
+        }
+    )
+    for name, (units, var_desc) in variables.items():
+        var = ncf_file.createVariable(name, "f4", ("TSTEP", "LAY", "ROW", "COL"))
+        var.setncatts(
+            {"long_name": name.ljust(16), "units": units.ljust(16), "var_desc": var_desc.ljust(80)}
+        )
+    tflag[:] = settings.tflag(len(variables), step=step, nrec=nrec)
+    return ncf_file
+
+
+def run_fwd():
+    """Run the forward model for a single day.
+    input: None
+    output: None.
+    """
+    settings = RunSettings.from_env()
+    transport = Transport.from_env(settings.tsec)
+    emis_unit = get_emis_unit(settings)
+
+    init = read_record(get_path("INIT_GASC_1"), settings.spcs, -1)
+    nlays, nrows, ncols = next(iter(init.values())).shape
+    with netCDF4.Dataset(get_path("BNDY_GASC_1")) as bcon:
+        boundary = {
+            spc: perimeter_to_ghost(bcon.variables[spc][0, ...].astype(float), nrows, ncols)
+            for spc in settings.spcs
+        }
+    with netCDF4.Dataset(get_path("EMIS_1")) as emis_file:
+        msg = "emissions must have the same timestep as the output"
+        assert hms_to_sec(emis_file.getncattr("TSTEP")) == settings.tsec, msg
+        assert len(emis_file.dimensions["TSTEP"]) > settings.nstep, "emissions end before the run"
+        emis_spcs = [spc for spc in settings.spcs if spc in emis_file.variables]
+        emis = {
+            spc: emis_file.variables[spc][: settings.nstep + 1, : settings.emis_lays, ...]
+            for spc in emis_spcs
+        }
+
+    conc_vars = {spc: ("ppmV", f"Variable {spc}") for spc in settings.spcs}
+    lay_start, lay_end = settings.conc_lays
+    conc_file = create_output(
+        get_path("CTM_CONC_1"),
+        settings,
+        conc_vars,
+        settings.conc_lays,
+        "WR_CONC",
+        "Concentration file output from local_cmaq",
+    )
+    chk_file = create_output(
+        get_path("ADJ_HADV_CHK"),
+        settings,
+        conc_vars,
+        (0, nlays),
+        "HADV_CHK",
+        "Advection checkpoint from local_cmaq",
+        nrec=settings.nstep,
+    )
+    chk_file.setncatts(
+        {
+            "COURANT_X": transport.courant_x,
+            "COURANT_Y": transport.courant_y,
+            "DECAY": transport.decay,
+        }
+    )
+
+    with conc_file, chk_file:
+        for spc, conc in init.items():
+            conc_file.variables[spc][0, ...] = conc[lay_start:lay_end]
+        for k in range(settings.nstep):
+            for spc in settings.spcs:
+                chk_file.variables[spc][k, ...] = init[spc]
+                init[spc] = transport.forward(init[spc], boundary[spc])
+                if spc in emis:
+                    rate = emis_unit[k] * emis[spc][k, ...]
+                    init[spc][: settings.emis_lays] += settings.tsec * rate
+                conc_file.variables[spc][k + 1, ...] = init[spc][lay_start:lay_end]
+
+    with create_output(
+        get_path("S_CGRID"),
+        settings,
+        conc_vars,
+        (0, nlays),
+        "CGRID",
+        "Final concentrations from local_cmaq",
+        step=settings.nstep,
+        nrec=1,
+    ) as cgrid_file:
+        for spc, conc in init.items():
+            cgrid_file.variables[spc][0, ...] = conc
+
+
+def run_bwd():
+    """Run the adjoint model for a single day.
+    input: None
+    output: None.
+
+    notes: the transport is read from the forward checkpoint of the same day.
+    """
+    settings = RunSettings.from_env()
+    with netCDF4.Dataset(get_path("ADJ_HADV_CHK")) as chk_file:
+        msg = "forward checkpoint does not match this run"
+        assert int(chk_file.getncattr("SDATE")) == int(settings.start.strftime("%Y%j")), msg
+        assert len(chk_file.dimensions["TSTEP"]) == settings.nstep, msg
+        transport = Transport(
+            float(chk_file.getncattr("COURANT_X")),
+            float(chk_file.getncattr("COURANT_Y")),
+            float(chk_file.getncattr("DECAY")),
+        )
+        shape = tuple(len(chk_file.dimensions[dim]) for dim in ("LAY", "ROW", "COL"))
+    nlays = shape[0]
+
+    emis_unit = get_emis_unit(settings)
+    sense_lays = int(os.environ["CTM_EMSENSL"])
+    force_path = get_path("ADJ_FORCE")
+    if "INIT_LGRID_1" in os.environ:
+        sense = read_record(get_path("INIT_LGRID_1"), settings.spcs, 0, nlays=nlays)
+    else:
+        sense = {spc: np.zeros(shape) for spc in settings.spcs}
+    with netCDF4.Dataset(get_path("EMIS_1")) as emis_file:
+        emis = {
+            spc: emis_file.variables[spc][: settings.nstep + 1, : settings.emis_lays, ...]
+            for spc in settings.spcs
+            if spc in emis_file.variables
+        }
+
+    lgrid_vars = {
+        spc: ("CF/ppmV", f"Sensitivity of cost function to {spc}") for spc in settings.spcs
+    }
+    lgrid_vars["RHOJ"] = ("CF/m*kg/m**3", "Sensitivity of cost function to RHOJ")
+    em_vars = {
+        spc: ("CF/(ppmv/s)", f"Sensitivity of cost function to emissions of {spc}")
+        for spc in settings.spcs
+    }
+    sf_vars = {
+        spc: ("CF", f"Sensitivity of cost function to emission scaling of {spc}")
+        for spc in settings.spcs
+    }
+    lgrid_file = create_output(
+        get_path("ADJ_LGRID"),
+        settings,
+        lgrid_vars,
+        (0, nlays),
+        "OP_ADJ_FILE",
+        "Adjoint concentration sensitivity from local_cmaq",
+    )
+    em_file = create_output(
+        get_path("ADJ_LGRID_EM"),
+        settings,
+        em_vars,
+        (0, sense_lays),
+        "OP_ADJ_FILE",
+        "Adjoint emission sensitivity from local_cmaq",
+    )
+    sf_file = create_output(
+        get_path("ADJ_LGRID_EM_SF"),
+        settings,
+        sf_vars,
+        (0, sense_lays),
+        "OP_ADJ_FILE",
+        "Adjoint emission scaling sensitivity from local_cmaq",
+    )
+
+    with lgrid_file, em_file, sf_file:
+        lgrid_file.variables["RHOJ"][: settings.nstep + 1, ...] = 0.0
+        last = read_record(force_path, settings.spcs, settings.nstep, nlays=nlays)
+        for spc in settings.spcs:
+            sense[spc] += last[spc]
+            lgrid_file.variables[spc][settings.nstep, ...] = sense[spc]
+            em_file.variables[spc][settings.nstep, ...] = 0.0
+            sf_file.variables[spc][settings.nstep, ...] = 0.0
+        for k in range(settings.nstep - 1, -1, -1):
+            force = read_record(force_path, settings.spcs, k, nlays=nlays)
+            for spc in settings.spcs:
+                # emissions of step k are added at the end of the step
+                em_sense = np.zeros((sense_lays, *sense[spc].shape[1:]))
+                emis_lays = min(sense_lays, settings.emis_lays)
+                em_sense[:emis_lays] = settings.tsec * sense[spc][:emis_lays]
+                em_file.variables[spc][k, ...] = em_sense
+                if spc in emis:
+                    rate = np.zeros_like(em_sense)
+                    rate[:emis_lays] = (emis_unit[k] * emis[spc][k, ...])[:emis_lays]
+                    sf_file.variables[spc][k, ...] = em_sense * rate
+                else:
+                    sf_file.variables[spc][k, ...] = 0.0
+
+                sense[spc] = transport.adjoint(sense[spc]) + force[spc]
+                lgrid_file.variables[spc][k, ...] = sense[spc]
+
+
+def main(args):
+    """Run the stand-in model.
+    input: list (command line arguments, 'fwd' or 'bwd')
+    output: int (exit status).
+    """
+    if len(args) != 1 or args[0] not in ("fwd", "bwd"):
+        print("usage: python -m openmethane.fourdvar.util.local_cmaq fwd|bwd", file=sys.stderr)
+        return 2
+    run_type = args[0]
+    start_time = time.time()
+    if run_type == "fwd":
+        run_fwd()
+    else:
+        run_bwd()
+    elapsed = time.time() - start_time
+    msg = f"local_cmaq {run_type} {os.environ['CTM_STDATE']} completed in {elapsed:.2f}s"
+    print(msg)
+    if "LOGFILE" in os.environ:
+        os.makedirs(os.path.dirname(os.environ["LOGFILE"]) or ".", exist_ok=True)
+        with open(os.environ["LOGFILE"], "w") as log_file:
+            log_file.write(msg + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
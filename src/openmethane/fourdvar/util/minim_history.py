@@ -0,0 +1,258 @@
+#
+# Copyright 2025 The Superpower Institute
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""Persist the state of the L-BFGS minimizer so an inversion can be resumed.
+
+Every cost & gradient evaluation is saved at the next iteration callback,
+with the cost history and the L-BFGS correction pairs (s, y) of the accepted
+iterations. scipy's L-BFGS-B cannot be given an existing curvature memory,
+but it is deterministic: restarting from the same start vector and replaying
+the saved evaluations rebuilds exactly the same quasi-Newton state without
+running the model. Evaluations after the last saved iteration run the model.
+"""
+
+import hashlib
+import itertools
+import os
+
+import numpy as np
+
+from openmethane.fourdvar.util import file_handle
+from openmethane.util.logger import get_logger
+
+logger = get_logger(__name__)
+
+state_name = "lbfgs_state.npz"
+eval_name = "eval{:05d}.npz"
+
+
+def get_key(vector: np.ndarray) -> str:
+    """Digest identifying a vector exactly."""
+    return hashlib.blake2b(np.ascontiguousarray(vector).tobytes(), digest_size=20).hexdigest()
+
+
+class MinimHistory:
+    """Record of the evaluations and iterations of a minimization.
+
+    Parameters
+    ----------
+    path
+        Directory the history is saved in
+    maxcor
+        Number of correction pairs kept by the L-BFGS memory
+    """
+
+    def __init__(self, path: str | os.PathLike, maxcor: int = 10):
+        self.path = str(path)
+        self.maxcor = maxcor
+        self.x0 = None
+        # completed evaluations of this minimization, in order.
+        # the vector & gradient are dropped once saved, unless needed for the (s, y) pairs
+        self.evaluations = []
+        self.partial = {}
+        self.saved = 0
+        # index into evaluations of each accepted iteration
+        self.iterations = []
+        # saved evaluations served without calling the cost & gradient functions
+        # {vector key: evaluation number}
+        self.replay = {}
+        self.replay_iterations = 0
+
+    @classmethod
+    def load(cls, path: str | os.PathLike, maxcor: int = 10) -> "MinimHistory":
+        """
+        Load the history of a previous minimization to replay
+
+        Parameters
+        ----------
+        path
+            Directory the history was saved in, may not exist
+        maxcor
+            Number of correction pairs kept by the L-BFGS memory
+
+        Returns
+        -------
+        History, replaying every saved evaluation up to the last saved iteration
+        """
+        history = cls(path, maxcor)
+        state_file = os.path.join(path, state_name)
+        if not os.path.isfile(state_file):
+            return history
+        with np.load(state_file) as state:
+            history.x0 = state["x0"]
+            neval = int(state["neval"])
+            history.replay_iterations = len(state["iter_index"])
+        for i in range(neval):
+            with np.load(os.path.join(path, eval_name.format(i))) as record:
+                history.replay[get_key(record["x"])] = i
+        logger.info(
+            f"loaded {neval} evaluations and {history.replay_iterations} iterations from {path}"
+        )
+        return history
+
+    def wrap(self, cost_func, grad_func):
+        """
+        Wrap the cost & gradient functions to record (and replay) evaluations
+
+        Parameters
+        ----------
+        cost_func
+            Function of the vector returning the cost
+        grad_func
+            Function of the vector returning the gradient
+
+        Returns
+        -------
+        (cost, gradient) functions for the minimizer
+        """
+
+        def cost(vector, **kwargs):
+            key = get_key(vector)
+            if key in self.replay:
+                value = float(self._load_replay(key)["cost"])
+            else:
+                value = cost_func(vector, **kwargs)
+            self._record(key, vector, cost=value)
+            return value
+
+        def gradient(vector):
+            key = get_key(vector)
+            if key in self.replay:
+                value = self._load_replay(key)["gradient"]
+            else:
+                value = grad_func(vector)
+            self._record(key, vector, gradient=np.array(value))
+            return value
+
+        return cost, gradient
+
+    def _load_replay(self, key):
+        with np.load(os.path.join(self.path, eval_name.format(self.replay[key]))) as record:
+            return {"cost": record["cost"], "gradient": record["gradient"]}
+
+    def _record(self, key, vector, **values):
+        if self.x0 is None:
+            self.x0 = np.array(vector)
+        record = self.partial.setdefault(key, {"key": key, "x": np.array(vector)})
+        record.update(values)
+        if "cost" in record and "gradient" in record:
+            record["gradient_norm"] = np.linalg.norm(record["gradient"])
+            self.evaluations.append(self.partial.pop(key))
+
+    def record_iteration(self, vector: np.ndarray) -> bool:
+        """
+        Record an accepted iteration and save the history
+
+        Parameters
+        ----------
+        vector
+            Vector accepted by the minimizer
+
+        Returns
+        -------
+        True if the iteration was completed before the restart
+        """
+        key = get_key(vector)
+        index = next(
+            i
+            for i in range(len(self.evaluations) - 1, -1, -1)
+            if self.evaluations[i]["key"] == key
+        )
+        self.iterations.append(index)
+        replayed = len(self.iterations) <= self.replay_iterations
+        if not replayed:
+            self.save()
+        return replayed
+
+    def get_cost(self) -> np.ndarray:
+        """Cost of the start vector and each accepted iteration."""
+        return np.array([self.evaluations[i]["cost"] for i in [0, *self.iterations]])
+
+    def get_gradient_norm(self) -> np.ndarray:
+        """Norm of the gradient at the start vector and each accepted iteration."""
+        return np.array([self.evaluations[i]["gradient_norm"] for i in [0, *self.iterations]])
+
+    def get_evaluation(self, index: int) -> tuple[np.ndarray, np.ndarray]:
+        """(vector, gradient) of an evaluation, read from the history directory once saved."""
+        record = self.evaluations[index]
+        if record["x"] is not None:
+            return record["x"], record["gradient"]
+        with np.load(os.path.join(self.path, eval_name.format(index))) as saved:
+            return saved["x"], saved["gradient"]
+
+    def get_pairs(self, npairs: int | None = None) -> tuple[np.ndarray, np.ndarray]:
+        """
+        L-BFGS correction pairs of the most recent iterations
+
+        Parameters
+        ----------
+        npairs
+            Number of iterations to get pairs for, default maxcor
+
+        Returns
+        -------
+        (s, y) each with shape (npairs, nvector), oldest first.
+        s is the change in the vector, y the change in the gradient between iterations.
+        pairs that do not have positive curvature (s.y > 0) are skipped, as by L-BFGS.
+        """
+        if npairs is None:
+            npairs = self.maxcor
+        index = [0, *self.iterations][-npairs - 1 :]
+        s_list = []
+        y_list = []
+        for prev, cur in itertools.pairwise(index):
+            prev_x, prev_gradient = self.get_evaluation(prev)
+            cur_x, cur_gradient = self.get_evaluation(cur)
+            s = cur_x - prev_x
+            y = cur_gradient - prev_gradient
+            if np.dot(s, y) > np.finfo(float).eps * np.dot(y, y):
+                s_list.append(s)
+                y_list.append(y)
+        nvec = len(self.x0)
+        return np.array(s_list).reshape((-1, nvec)), np.array(y_list).reshape((-1, nvec))
+
+    def save(self):
+        """Write the new evaluations and the current state to the history directory."""
+        file_handle.ensure_path(self.path)
+        for i in range(self.saved, len(self.evaluations)):
+            record = self.evaluations[i]
+            np.savez(
+                os.path.join(self.path, eval_name.format(i)),
+                x=record["x"],
+                cost=record["cost"],
+                gradient=record["gradient"],
+            )
+        self.saved = len(self.evaluations)
+
+        s, y = self.get_pairs()
+        tmp_file = os.path.join(self.path, f"tmp_{state_name}")
+        np.savez(
+            tmp_file,
+            x0=self.x0,
+            neval=self.saved,
+            iter_index=np.array(self.iterations, dtype=int),
+            cost=self.get_cost(),
+            gradient_norm=self.get_gradient_norm(),
+            s=s,
+            y=y,
+        )
+        os.replace(tmp_file, os.path.join(self.path, state_name))
+
+        # only keep the vectors & gradients needed for the next (s, y) pairs in memory
+        keep = set([0, *self.iterations][-self.maxcor - 1 :])
+        for i, record in enumerate(self.evaluations):
+            if i not in keep and record["x"] is not None:
+                record["x"] = None
+                record["gradient"] = None
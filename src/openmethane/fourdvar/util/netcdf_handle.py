@@ -13,16 +13,18 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 #
+import fcntl
 import os
 import shutil
-import subprocess
 from typing import Any
 
 import netCDF4 as ncf
 import numpy as np
 
 import openmethane.fourdvar.util.date_handle as dt
+from openmethane.fourdvar.params import archive_defn
 from openmethane.util.logger import get_logger
+from openmethane.util.netcdf_compress import compress_file, compress_files
 
 logger = get_logger(__name__)
 
@@ -43,11 +45,119 @@ def validate(filepath, dataset):
         for var, data in dataset.items():
             if var not in ncf_var.keys():
                 return False
-            if data.shape != ncf_var[var][:].shape:
+            if data.shape != ncf_var[var].shape:
                 return False
     return True
 
 
+# ioctl request to clone a file on copy-on-write filesystems (linux FICLONE)
+_FICLONE = 0x40049409
+
+# largest block of template data (in bytes) held in memory while it is copied
+copy_block_bytes = 64 * 1024 * 1024
+
+
+def copy_unchanged(source, dest):
+    """Create a copy of a file that is never modified in place.
+    input: string (path/to/old.ncf), string (path/to/new.ncf)
+    output: None.
+
+    notes: uses archive_defn.unchanged_copy_mode to hard-link or reflink source when possible.
+    if dest already exists it is replaced.
+    """
+    mode = archive_defn.unchanged_copy_mode
+    assert mode in ("copy", "hardlink", "reflink"), f"invalid unchanged_copy_mode {mode}"
+    if os.path.lexists(dest):
+        os.remove(dest)
+    if mode == "hardlink":
+        try:
+            os.link(source, dest)
+            return
+        except OSError:
+            logger.debug(f"cannot hard-link {source}, copying instead.")
+    elif mode == "reflink":
+        try:
+            with open(source, "rb") as src, open(dest, "wb") as dst:
+                fcntl.ioctl(dst.fileno(), _FICLONE, src.fileno())
+            return
+        except OSError:
+            logger.debug(f"cannot reflink {source}, copying instead.")
+    shutil.copyfile(source, dest)
+
+
+def _clone_template(source, dest, skip_data=(), skip_records=None):
+    """Create dest with the dimensions, variables & attributes of source.
+    input: string (path/to/old.ncf), string (path/to/new.ncf), collection of var names,
+           dict (var name: list of int)
+    output: open ncf.Dataset obj (dest).
+
+    notes: data is copied for every variable except those in skip_data,
+    and the records (first index) in skip_records of a variable,
+    which are left for the caller to write. compression and chunking match source.
+    data is copied in blocks of up to copy_block_bytes, never a whole variable at once.
+    """
+    if skip_records is None:
+        skip_records = {}
+    # dest may be linked to another file (see copy_unchanged), never write through it
+    if os.path.lexists(dest):
+        os.remove(dest)
+    with ncf.Dataset(source, "r") as src:
+        dst = ncf.Dataset(dest, "w", format=src.data_model)
+        try:
+            _clone_group(src, dst, skip_data, skip_records)
+        except BaseException:
+            dst.close()
+            raise
+    return dst
+
+
+def _clone_group(src, dst, skip_data, skip_records):
+    dst.setncatts({name: src.getncattr(name) for name in src.ncattrs()})
+    for name, dim in src.dimensions.items():
+        dst.createDimension(name, None if dim.isunlimited() else len(dim))
+    is_nc4 = src.data_model.startswith("NETCDF4")
+    for name, var in src.variables.items():
+        attrs = {attr: var.getncattr(attr) for attr in var.ncattrs()}
+        kwargs = {"fill_value": attrs.pop("_FillValue", None)}
+        if is_nc4:
+            filters = var.filters()
+            kwargs.update(
+                zlib=filters["zlib"],
+                complevel=filters["complevel"],
+                shuffle=filters["shuffle"],
+                fletcher32=filters["fletcher32"],
+            )
+            chunking = var.chunking()
+            if chunking == "contiguous":
+                kwargs["contiguous"] = True
+            elif chunking is not None:
+                kwargs["chunksizes"] = chunking
+        out = dst.createVariable(name, var.datatype, var.dimensions, **kwargs)
+        out.setncatts(attrs)
+        if name not in skip_data:
+            _copy_data(var, out, skip_records.get(name, ()))
+    for name, group in src.groups.items():
+        _clone_group(group, dst.createGroup(name), skip_data, skip_records)
+
+
+def _copy_data(var, out, skip_records=()):
+    """Copy the data of a variable in blocks of records, except the records in skip_records."""
+    var.set_auto_maskandscale(False)
+    out.set_auto_maskandscale(False)
+    if var.ndim == 0 or var.dtype == str:
+        out[...] = var[...]
+        return
+    record_bytes = int(np.prod(var.shape[1:], dtype=int)) * var.dtype.itemsize
+    block = max(copy_block_bytes // max(record_bytes, 1), 1)
+    keep = np.setdiff1d(np.arange(var.shape[0]), skip_records)
+    # runs of consecutive records to copy, each split into blocks
+    for run in np.split(keep, np.flatnonzero(np.diff(keep) != 1) + 1):
+        for start in range(0, len(run), block):
+            first = run[start]
+            last = run[min(start + block, len(run)) - 1] + 1
+            out[first:last] = var[first:last]
+
+
 def create_from_template(source, dest, var_change=None, date=None, overwrite=True):
     """Create a new copy of a netCDF file, with new variable data.
     input: string (path/to/old.ncf), string (path/to/new.ncf), dict, date obj, boolean
@@ -61,6 +171,9 @@ def create_from_template(source, dest, var_change=None, date=None, overwrite=Tru
     overwrite == True will overwrite files variables with var_change
     overwrite == False will add var_change variables to file values.
     if dest already exists it is overwritten.
+    only the structure of source and its unchanged variables are copied,
+    each changed variable is written once.
+    if nothing is changed dest is created with copy_unchanged.
 
     designed for IOAPI compliant netCDF files, other netCDF files may not work.
     """
@@ -68,15 +181,49 @@ def create_from_template(source, dest, var_change=None, date=None, overwrite=Tru
     if var_change is None:
         var_change = {}
     assert validate(source, var_change), "changes to template are invalid"
-    logger.debug(f"copy {source} to {dest}.")
-    shutil.copyfile(source, dest)
-    with ncf.Dataset(dest, "a") as ncf_file:
+    if len(var_change) == 0 and date is None:
+        logger.debug(f"copy unchanged {source} to {dest}.")
+        copy_unchanged(source, dest)
+        return
+
+    logger.debug(f"create {dest} from template {source}.")
+    if overwrite is False:
+        orig_data = get_variable(source, list(var_change.keys()))
+        var_change = {var: data + orig_data[var] for var, data in var_change.items()}
+    with _clone_template(source, dest, skip_data=var_change.keys()) as ncf_file:
+        for var, data in var_change.items():
+            ncf_file.variables[var][:] = data
+        if date is not None:
+            set_date(ncf_file, date)
+
+
+def create_from_template_records(source, dest, tsteps, var_change=None, date=None):
+    """Create a new copy of a netCDF file, replacing only some timesteps of variables.
+    input: string (path/to/old.ncf), string (path/to/new.ncf), list of int, dict, date obj
+    output: None.
+
+    notes: var_change is a dict of variables to change
+        key = name of variable to change
+        value = numpy.ndarray of new values for the records in tsteps,
+                shape must match the variable with a first dimension of len(tsteps)
+    records not listed in tsteps keep the template values and are copied in blocks,
+    the variables are never read into memory whole.
+    date is the date to set the new file to (SDATE & TFLAG),
+        if None date is left unmodified
+    if dest already exists it is overwritten.
+    """
+    if var_change is None:
+        var_change = {}
+    tsteps = np.asarray(tsteps, dtype=int)
+    logger.debug(f"create {dest} from template {source}, changing {len(tsteps)} records.")
+    skip_records = {var: tsteps for var in var_change.keys()}
+    with _clone_template(source, dest, skip_records=skip_records) as ncf_file:
         for var, data in var_change.items():
-            if overwrite is True:
-                ncf_file.variables[var][:] = data
-            else:
-                orig_data = ncf_file.variables[var][:]
-                ncf_file.variables[var][:] = data + orig_data
+            ncf_var = ncf_file.variables[var]
+            msg = f"changes to {var} records are invalid"
+            assert data.shape == (len(tsteps), *ncf_var.shape[1:]), msg
+            if len(tsteps) > 0:
+                ncf_var[tsteps] = data
         if date is not None:
             set_date(ncf_file, date)
 
@@ -128,40 +275,39 @@ def get_all_attr(filepath):
     return attr_dict
 
 
-try_ncks = True
-
-
 def copy_compress(source, dest) -> None:
     """Create a compressed copy of a netCDF file.
     input: string (path/src.ncf), string (path/dst.ncf)
     output: None.
 
     notes: if dst already exists it is overwritten.
+    compression settings are taken from archive_defn.
     """
-    global try_ncks
-    copy_msg = f"copy {source} to {dest}."
-    if try_ncks is True:
-        copy_cmd = ["ncks", "-4", "-L4", "-O", source, dest]
-        try:
-            with open(os.devnull, "w") as DEVNULL:
-                statcode = subprocess.check_call(copy_cmd, stdout=DEVNULL, stderr=DEVNULL)
-        except (
-            OSError,
-            subprocess.CalledProcessError,
-        ):
-            statcode = 1
-        if statcode != 0:
-            try_ncks = False
-            msg = "failed to copy_compress netCDF file with ncks, "
-            msg += "switching to uncompressed copying."
-            logger.warning(msg)
-        else:
-            logger.debug(copy_msg)
-            return
+    logger.debug(f"copy {source} to {dest}.")
+    compress_file(
+        source,
+        dest,
+        complevel=archive_defn.compress_level,
+        chunking=archive_defn.compress_chunking,
+    )
 
-    # if code reaches here ncks-copy failed or wasn't tried.
-    shutil.copyfile(source, dest)
-    logger.debug(copy_msg)
+
+def copy_compress_many(paths) -> None:
+    """Create compressed copies of several netCDF files concurrently.
+    input: list of tuples [(string (path/src.ncf), string (path/dst.ncf))]
+    output: None.
+
+    notes: any dst that already exists is overwritten.
+    archive_defn.compress_workers files are compressed at once.
+    """
+    paths = list(paths)
+    logger.debug(f"copy {len(paths)} files with {archive_defn.compress_workers} workers.")
+    compress_files(
+        paths,
+        max_workers=archive_defn.compress_workers,
+        complevel=archive_defn.compress_level,
+        chunking=archive_defn.compress_chunking,
+    )
 
 
 def set_date(fileobj, start_date):
@@ -0,0 +1,207 @@
+#
+# Copyright 2025 The Superpower Institute
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""
+Block-diagonal observation error covariance.
+
+Satellite retrieval errors are correlated between neighbouring soundings of the
+same overpass. With ``input_defn.obs_error_blocks`` set, the observations are
+split into blocks and the errors within a block have a correlation of
+``exp(-distance / input_defn.obs_error_corr_km)`` between sounding centres,
+with each observation keeping its own ``uncertainty``. Errors of different
+blocks are independent.
+
+The blocks are one of:
+
+- ``orbit``, soundings of the same orbit. Uses the ``orbit`` of each observation
+  if available, otherwise a new orbit starts after a gap of ``ORBIT_GAP``
+- ``scanline:<seconds>``, segments of each orbit spanning that many seconds
+  of scanlines
+
+A fraction ``NUGGET`` of each error variance is uncorrelated, so co-located
+soundings (distance 0) still give a positive definite covariance. Blocks of more
+than ``MAX_BLOCK_SIZE`` observations are split into segments of consecutive
+soundings in time, bounding the O(n^2) memory and O(n^3) factorisation of a block.
+
+Each block covariance is factorised once when the observations are read, the
+cost of applying the inverse is then linear in the number of observations.
+Observations alone in their block keep the diagonal weighting.
+"""
+
+import datetime
+from typing import Any
+
+import attrs
+import numpy as np
+import scipy.linalg
+
+from openmethane.util.logger import get_logger
+
+logger = get_logger(__name__)
+
+# soundings further apart in time belong to different orbits
+ORBIT_GAP = datetime.timedelta(minutes=20)
+EARTH_RADIUS_KM = 6371.0
+# uncorrelated fraction of the error variance of each observation
+NUGGET = 0.01
+# most observations in a block, larger blocks are split into segments in time
+MAX_BLOCK_SIZE = 1000
+
+
+@attrs.frozen
+class ObsErrorBlocks:
+    """Cholesky factors of the error covariance of each block of observations."""
+
+    uncertainty: np.ndarray = attrs.field(eq=False, repr=False)
+    diag_index: np.ndarray = attrs.field(eq=False, repr=False)
+    index: list[np.ndarray] = attrs.field(eq=False, repr=False)
+    factor: list[np.ndarray] = attrs.field(eq=False, repr=False)
+
+    @property
+    def nblocks(self) -> int:
+        return len(self.index)
+
+    def weight(self, values: np.ndarray) -> np.ndarray:
+        """Multiply by the inverse error covariance.
+
+        input: np.ndarray (nobs,)
+        output: np.ndarray (nobs,).
+        """
+        result = np.empty(len(values))
+        result[self.diag_index] = values[self.diag_index] / self.uncertainty[self.diag_index] ** 2
+        for index, factor in zip(self.index, self.factor):
+            result[index] = scipy.linalg.cho_solve((factor, True), values[index])
+        return result
+
+    def whiten(self, values: np.ndarray) -> np.ndarray:
+        """Multiply by the inverse of the Cholesky factor of the error covariance.
+
+        input: np.ndarray (nobs, ...)
+        output: np.ndarray (nobs, ...), with independent unit variance errors.
+        """
+        values = np.asarray(values, dtype=float)
+        unc = self.uncertainty.reshape((-1,) + (1,) * (values.ndim - 1))
+        result = np.empty(values.shape)
+        result[self.diag_index] = values[self.diag_index] / unc[self.diag_index]
+        for index, factor in zip(self.index, self.factor):
+            result[index] = scipy.linalg.solve_triangular(factor, values[index], lower=True)
+        return result
+
+
+def distance_km(lat: np.ndarray, lon: np.ndarray) -> np.ndarray:
+    """Great circle distance between every pair of points, in km."""
+    lat, lon = np.radians(lat), np.radians(lon)
+    dlat = lat[:, None] - lat[None, :]
+    dlon = lon[:, None] - lon[None, :]
+    cos_lat = np.cos(lat)
+    hav = np.sin(dlat / 2) ** 2 + np.outer(cos_lat, cos_lat) * np.sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(hav, 0.0, 1.0)))
+
+
+def orbit_label(meta: list[dict[str, Any]]) -> np.ndarray:
+    """Orbit number of every observation."""
+    if all("orbit" in odict for odict in meta):
+        return np.array([int(odict["orbit"]) for odict in meta])
+    times = np.array([odict["time"] for odict in meta])
+    order = np.argsort(times)
+    new_orbit = np.diff(times[order]) > ORBIT_GAP
+    label = np.empty(len(meta), dtype=int)
+    label[order] = np.concatenate([[0], np.cumsum(new_orbit)])
+    return label
+
+
+def block_label(meta: list[dict[str, Any]], spec: str) -> np.ndarray:
+    """Error block of every observation, as described by spec."""
+    orbit = orbit_label(meta)
+    if spec == "orbit":
+        return orbit
+    assert spec.startswith("scanline:"), f"invalid observation error blocks {spec}"
+    seconds = float(spec[len("scanline:") :])
+    times = np.array([odict["time"] for odict in meta])
+    segment = np.empty(len(meta), dtype=int)
+    for num in np.unique(orbit):
+        in_orbit = orbit == num
+        elapsed = (times[in_orbit] - times[in_orbit].min()) / datetime.timedelta(seconds=1)
+        segment[in_orbit] = np.floor(elapsed.astype(float) / seconds)
+    _, label = np.unique(np.stack([orbit, segment], axis=1), axis=0, return_inverse=True)
+    return label.ravel()
+
+
+def split_blocks(
+    label: np.ndarray, times: np.ndarray, max_size: int = MAX_BLOCK_SIZE
+) -> list[np.ndarray]:
+    """Indices of each block, blocks larger than max_size split into segments in time."""
+    order = np.lexsort((times, label))
+    starts = np.flatnonzero(np.diff(label[order], prepend=label.min() - 1))
+    blocks = []
+    for block in np.split(order, starts[1:]):
+        nsegment = -(-len(block) // max_size)
+        blocks.extend(np.array_split(block, nsegment))
+    return blocks
+
+
+def build_error_blocks(
+    meta: list[dict[str, Any]], uncertainty: list[float], spec: str, corr_km: float
+) -> ObsErrorBlocks | None:
+    """
+    Factorise the error covariance of each block of observations
+
+    Parameters
+    ----------
+    meta
+        Metadata of each observation, with the time and latitude & longitude centre
+    uncertainty
+        Standard deviation of the error of each observation
+    spec
+        Observation error blocks (see input_defn.obs_error_blocks), empty for independent errors
+    corr_km
+        Correlation length of the errors within a block
+
+    Returns
+    -------
+    ObsErrorBlocks or None if the errors are independent
+    """
+    if spec == "" or len(meta) == 0:
+        return None
+    assert corr_km > 0, "correlated observation errors need a correlation length"
+    uncertainty = np.asarray(uncertainty, dtype=float)
+    label = block_label(meta, spec)
+    times = np.array([odict["time"] for odict in meta])
+    lat = np.array([odict["latitude_center"] for odict in meta], dtype=float)
+    lon = np.array([odict["longitude_center"] for odict in meta], dtype=float)
+
+    diag_index = []
+    index = []
+    factor = []
+    for block in split_blocks(label, times, MAX_BLOCK_SIZE):
+        if len(block) == 1:
+            diag_index.append(block[0])
+            continue
+        correlation = (1 - NUGGET) * np.exp(-distance_km(lat[block], lon[block]) / corr_km)
+        correlation[np.diag_indices(len(block))] = 1.0
+        covariance = correlation * np.outer(uncertainty[block], uncertainty[block])
+        index.append(block)
+        factor.append(scipy.linalg.cholesky(covariance, lower=True))
+
+    sizes = [len(block) for block in index]
+    logger.info(
+        f"{len(index)} correlated observation error blocks, largest {max(sizes, default=1)}"
+    )
+    return ObsErrorBlocks(
+        uncertainty=uncertainty,
+        diag_index=np.array(diag_index, dtype=int),
+        index=index,
+        factor=factor,
+    )
@@ -0,0 +1,392 @@
+#
+# Copyright 2025 The Superpower Institute
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""
+Chain the inversions of consecutive (or overlapping) periods.
+
+With ``input_defn.chain_next`` set, an inversion archives what a following period
+chained to it needs, and with ``input_defn.prev_window`` set to the archive directory
+of the inversion of the previous period, the inversion of this period starts from:
+
+- the posterior emission & boundary scaling of the previous period, mapped onto the
+  dates of this period by ``map_posterior``. Timesteps covered by both periods take
+  the posterior of the previous period, the others its mean at the same time of day
+- a preconditioner of the minimization: the posterior covariance of the previous
+  period, estimated from its lbfgs iterations by ``estimate_posterior`` and mapped onto
+  the dates of this period like the posterior by ``load_posterior``. scipy's
+  L-BFGS-B cannot be given a curvature memory, so the minimization is instead run in
+  the unknowns scaled by its square root, where the directions the previous periods
+  constrained have about the unit curvature of the rest. Only for minimizations
+  without bounds, those with bounds only reuse the start
+- the concentrations at the end of the previous period, archived by
+  ``archive_chain_icon`` and used as ``cmaq_config.icon_file``, so this period must
+  start the day after the previous period ends
+
+The prior & its uncertainty are unchanged, so the solution is that of an independent
+inversion of the period, reached in fewer iterations.
+"""
+
+import datetime
+import os
+import shutil
+
+import numpy as np
+
+from openmethane.fourdvar import datadef as d
+from openmethane.fourdvar._transform import transform
+from openmethane.fourdvar.datadef.abstract._physical_abstract_data import PhysicalAbstractData
+from openmethane.fourdvar.params import archive_defn, cmaq_config, data_access, input_defn
+from openmethane.fourdvar.transfunc.condition import get_unknown_lengths
+from openmethane.fourdvar.util import date_handle as dt
+from openmethane.fourdvar.util import netcdf_handle as ncf
+from openmethane.fourdvar.util import posterior_uncertainty
+from openmethane.fourdvar.util.archive_handle import get_archive_path
+from openmethane.fourdvar.util.minim_history import MinimHistory
+from openmethane.fourdvar.util.posterior_uncertainty import LowRankPosterior
+from openmethane.util.logger import get_logger
+
+logger = get_logger(__name__)
+
+DAY_SECONDS = 24 * 60 * 60
+
+
+def map_steps(
+    values: np.ndarray,
+    prev_start: datetime.date,
+    prev_step: float,
+    start: datetime.date,
+    nstep: int,
+    step: float,
+) -> np.ndarray:
+    """
+    Map the timesteps (first axis) of the previous period onto this period
+
+    Parameters
+    ----------
+    values
+        Values of each timestep of the previous period
+    prev_start
+        Start date of the previous period
+    prev_step
+        Length of the timesteps of the previous period, in days
+    start
+        Start date of this period
+    nstep
+        Number of timesteps of this period
+    step
+        Length of the timesteps of this period, in days
+
+    Returns
+    -------
+    Values of each timestep of this period: the overlap weighted mean of the
+    previous timesteps covering the same time, or without any the mean of the
+    previous timesteps at the same time of day
+    """
+    values = np.asarray(values, dtype=float)
+    offset = (start - prev_start).days
+    edges = np.arange(values.shape[0] + 1) * prev_step
+    per_day = max(int(round(1.0 / prev_step)), 1)
+    result = np.empty((nstep, *values.shape[1:]))
+    for k in range(nstep):
+        begin = offset + k * step
+        end = begin + step
+        overlap = np.clip(np.minimum(edges[1:], end) - np.maximum(edges[:-1], begin), 0.0, None)
+        if overlap.sum() > 0:
+            result[k] = np.tensordot(overlap / overlap.sum(), values, axes=1)
+        else:
+            phase = int(round((begin % 1.0) / prev_step)) % per_day
+            result[k] = values[phase::per_day].mean(axis=0)
+    return result
+
+
+def map_posterior(prev_window: str, background: d.PhysicalData) -> d.PhysicalData:
+    """
+    Map the posterior of the previous period onto the dates of this period
+
+    Parameters
+    ----------
+    prev_window
+        Archive directory of the previous period
+    background
+        Prior of this period
+
+    Returns
+    -------
+    PhysicalData with the shape of background
+    """
+    filename = os.path.join(prev_window, archive_defn.posterior_multipliers)
+    prev_start = datetime.datetime.strptime(str(ncf.get_attr(filename, "SDATE")), "%Y%j").date()
+    start = dt.get_datelist()[0]
+    prev_emis = ncf.get_variable(filename, background.spcs, group="emis")
+    prev_bcon = ncf.get_variable(filename, background.spcs, group="bcon")
+    prev_tday = float(ncf.get_attr(filename, "TDAY", group="emis"))
+    prev_tsec = float(ncf.get_attr(filename, "TSEC", group="bcon"))
+
+    emis = {}
+    bcon = {}
+    for spc in background.spcs:
+        shape = background.emis[spc].shape
+        assert prev_emis[spc].shape[1:] == shape[1:], "previous period has a different grid"
+        emis[spc] = map_steps(
+            prev_emis[spc], prev_start, prev_tday, start, shape[0], float(background.tday_emis)
+        )
+        shape = background.bcon[spc].shape
+        assert prev_bcon[spc].shape[1:] == shape[1:], "previous period has different bcon regions"
+        bcon[spc] = map_steps(
+            prev_bcon[spc],
+            prev_start,
+            prev_tsec / DAY_SECONDS,
+            start,
+            shape[0],
+            float(background.tsec_bcon) / DAY_SECONDS,
+        )
+    icon = background.icon if input_defn.inc_icon is True else None
+    logger.info(f"starting from the posterior of the period starting {prev_start}")
+    return d.PhysicalData(icon, emis, bcon)
+
+
+def estimate_posterior(
+    history: MinimHistory,
+    preconditioner: LowRankPosterior | None = None,
+    max_rank: int = 50,
+) -> LowRankPosterior:
+    """
+    Estimate the posterior covariance of the unknowns from the lbfgs iterations
+
+    Parameters
+    ----------
+    history
+        History of the minimization
+    preconditioner
+        Preconditioner the minimization was run with, if any
+    max_rank
+        Maximum number of directions kept
+
+    Returns
+    -------
+    LowRankPosterior of the unknowns
+
+    notes: the pairs are the change from the start of each iteration, larger than the
+    change between iterations so less affected by the rounding of the gradient, and
+    directions of the iterations lost to that rounding are dropped. with a preconditioner
+    the estimate is made in the unknowns of the minimizer (scaled by its square root) and
+    combined with it, so each period of a chain adds to the curvature of the previous ones.
+    """
+    index = [0, *history.iterations]
+    x0, gradient0 = history.get_evaluation(0)
+    s = []
+    y = []
+    for i in index[1:]:
+        x, gradient = history.get_evaluation(i)
+        s.append(x - x0)
+        y.append(gradient - gradient0)
+    s = np.array(s).reshape((-1, len(x0)))
+    y = np.array(y).reshape((-1, len(x0)))
+    if preconditioner is None:
+        return posterior_uncertainty.from_pairs(s, y, rtol=1e-3)
+    scaled = posterior_uncertainty.from_pairs(
+        preconditioner.inverse_sqrt(s.T).T, preconditioner.sqrt(y.T).T, rtol=1e-3
+    )
+    # P^1/2 (I - U r U') P^1/2 with P = I - V q V', as the identity less a low-rank reduction
+    return _low_rank(
+        np.hstack([preconditioner.vectors, preconditioner.sqrt(scaled.vectors)]),
+        np.concatenate([preconditioner.reduction, scaled.reduction]),
+        max_rank,
+    )
+
+
+def _low_rank(vectors: np.ndarray, reduction: np.ndarray, max_rank: int) -> LowRankPosterior:
+    """The identity less vectors @ diag(reduction) @ vectors.T, with orthonormal vectors."""
+    basis, upper = np.linalg.qr(vectors)
+    eigval, eigvec = np.linalg.eigh((upper * reduction) @ upper.T)
+    keep = np.argsort(eigval)[::-1][:max_rank]
+    keep = keep[eigval[keep] > 0]
+    return LowRankPosterior(vectors=basis @ eigvec[:, keep], reduction=eigval[keep])
+
+
+def archive_posterior(posterior: LowRankPosterior):
+    """Archive the estimated posterior covariance & the dates of its unknowns."""
+    p = PhysicalAbstractData
+    np.savez(
+        os.path.join(get_archive_path(), archive_defn.chain_posterior),
+        vectors=posterior.vectors,
+        reduction=posterior.reduction,
+        start=dt.get_datelist()[0].isoformat(),
+        tday_emis=float(p.tday_emis),
+        nstep_emis=int(p.nstep_emis),
+        tsec_bcon=float(p.tsec_bcon),
+        nstep_bcon=int(p.nstep_bcon),
+    )
+
+
+def map_vectors(
+    vectors: np.ndarray,
+    prev_start: datetime.date,
+    prev_tday: float,
+    prev_nstep_emis: int,
+    prev_tsec: float,
+    prev_nstep_bcon: int,
+) -> np.ndarray | None:
+    """
+    Map vectors of the unknowns of the previous period onto the unknowns of this period
+
+    Parameters
+    ----------
+    vectors
+        Columns of vectors of the unknowns of the previous period
+    prev_start
+        Start date of the previous period
+    prev_tday
+        Length of the emission timesteps of the previous period, in days
+    prev_nstep_emis
+        Number of emission timesteps of the previous period
+    prev_tsec
+        Length of the boundary condition timesteps of the previous period, in seconds
+    prev_nstep_bcon
+        Number of boundary condition timesteps of the previous period
+
+    Returns
+    -------
+    Columns of vectors of the unknowns of this period, or None if the unknowns of the
+    periods cannot be matched
+
+    notes: the emission & boundary unknowns of each species are mapped by map_steps,
+    which needs unknowns ordered by timestep, so not with time correlated emission errors
+    (see transfunc/condition.py).
+    """
+    p = PhysicalAbstractData
+    icon_len, emis_len, bcon_len = get_unknown_lengths()
+    emis_size = emis_len // p.nstep_emis
+    bcon_size = bcon_len // p.nstep_bcon
+    prev_emis_len = prev_nstep_emis * emis_size
+    prev_bcon_len = prev_nstep_bcon * bcon_size
+    if len(vectors) != len(p.spcs) * (icon_len + prev_emis_len + prev_bcon_len):
+        logger.info("previous period has different unknowns, not preconditioning")
+        return None
+    if input_defn.emis_corr_days > 0 and max(prev_nstep_emis, p.nstep_emis) > 1:
+        logger.info("time correlated emission unknowns cannot be mapped, not preconditioning")
+        return None
+
+    start = dt.get_datelist()[0]
+    ncol = vectors.shape[1]
+    result = []
+    i = 0
+    for _ in p.spcs:
+        result.append(vectors[i : i + icon_len])
+        i += icon_len
+        emis = vectors[i : i + prev_emis_len].reshape((prev_nstep_emis, emis_size, ncol))
+        emis = map_steps(emis, prev_start, prev_tday, start, p.nstep_emis, float(p.tday_emis))
+        result.append(emis.reshape((-1, ncol)))
+        i += prev_emis_len
+        bcon = vectors[i : i + prev_bcon_len].reshape((prev_nstep_bcon, bcon_size, ncol))
+        bcon = map_steps(
+            bcon,
+            prev_start,
+            prev_tsec / DAY_SECONDS,
+            start,
+            p.nstep_bcon,
+            float(p.tsec_bcon) / DAY_SECONDS,
+        )
+        result.append(bcon.reshape((-1, ncol)))
+        i += prev_bcon_len
+    return np.vstack(result)
+
+
+def load_posterior(prev_window: str, nvec: int) -> LowRankPosterior | None:
+    """
+    Load the estimated posterior covariance of the previous period
+
+    Parameters
+    ----------
+    prev_window
+        Archive directory of the previous period
+    nvec
+        Number of unknowns of this period
+
+    Returns
+    -------
+    LowRankPosterior of the unknowns of this period, mapped onto its dates by map_vectors
+    if they differ from those of the previous period, or None if the previous period has
+    no estimate (not solved by lbfgs) or its unknowns cannot be matched
+
+    notes: the mapped covariance is the prior less the mapped reduction, which is
+    limited to the largest reduction of the previous period.
+    """
+    filename = os.path.join(prev_window, archive_defn.chain_posterior)
+    if not os.path.isfile(filename):
+        logger.info(f"no posterior estimate in {prev_window}, not preconditioning")
+        return None
+    with np.load(filename) as saved:
+        posterior = LowRankPosterior(vectors=saved["vectors"], reduction=saved["reduction"])
+        prev_dates = (
+            datetime.date.fromisoformat(str(saved["start"])),
+            float(saved["tday_emis"]),
+            int(saved["nstep_emis"]),
+            float(saved["tsec_bcon"]),
+            int(saved["nstep_bcon"]),
+        )
+    p = PhysicalAbstractData
+    dates = (
+        dt.get_datelist()[0],
+        float(p.tday_emis),
+        int(p.nstep_emis),
+        float(p.tsec_bcon),
+        int(p.nstep_bcon),
+    )
+    if prev_dates != dates:
+        vectors = map_vectors(posterior.vectors, *prev_dates)
+        if vectors is None:
+            return None
+        max_reduction = posterior.reduction.max(initial=0.0)
+        posterior = _low_rank(vectors, posterior.reduction, len(posterior.reduction))
+        posterior = LowRankPosterior(
+            vectors=posterior.vectors, reduction=np.minimum(posterior.reduction, max_reduction)
+        )
+        logger.info(f"mapped the posterior estimate of the period starting {prev_dates[0]}")
+    if posterior.vectors.shape[0] != nvec:
+        logger.info("previous period has a different number of unknowns, not preconditioning")
+        return None
+    return posterior
+
+
+def archive_chain_icon(physical: d.PhysicalData):
+    """Archive the concentrations at the end of the period, for the solution.
+
+    input: PhysicalData (solution)
+    output: None.
+
+    notes: the final concentrations of the last day (cmaq_config.last_grid_file) are the
+    initial conditions of the day after, archived as archive_defn.chain_icon_file of that
+    day. the model is run again unless the last run was of the solution for every day,
+    including those after the last observation (see data_access.model_end_date).
+    """
+    vector = transform(physical, d.UnknownData).get_vector()
+    prev_vector = data_access.prev_vector
+    is_solution = prev_vector is not None and np.allclose(prev_vector, vector)
+    if not is_solution or dt.get_model_datelist() != dt.get_datelist():
+        model_end_date = data_access.model_end_date
+        data_access.model_end_date = None
+        try:
+            model_in = transform(physical, d.ModelInputData)
+            transform(model_in, d.ModelOutputData)
+        finally:
+            data_access.model_end_date = model_end_date
+        data_access.prev_vector = vector
+    end_date = dt.get_datelist()[-1]
+    icon_name = dt.replace_date(archive_defn.chain_icon_file, dt.add_days(end_date, 1))
+    shutil.copyfile(
+        dt.replace_date(cmaq_config.last_grid_file, end_date),
+        os.path.join(get_archive_path(), icon_name),
+    )
@@ -0,0 +1,212 @@
+#
+# Copyright 2025 The Superpower Institute
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""
+Low-rank posterior uncertainty of the unknowns.
+
+In the preconditioned control space the prior covariance is the identity and
+the posterior covariance is the inverse of the hessian of the cost, ``I + H'R^-1H``.
+Each L-BFGS iteration gives a pair (s, y), the change in the unknowns and in the
+gradient, with ``y = hessian @ s`` when transport is linear. Projecting the
+hessian onto the span of the s vectors gives Ritz estimates of its eigenpairs
+without any more model runs. As with Lanczos, the iterations resolve the best
+constrained directions (the largest eigenvalues) first. The posterior
+covariance is then approximated as
+
+    P = I - U diag(1 - 1 / eigenvalue) U'
+
+which keeps the prior uncertainty in the directions the iterations have not
+explored, and is exact once the span holds the constrained directions.
+"""
+
+import attrs
+import numpy as np
+
+from openmethane.fourdvar import datadef as d
+from openmethane.fourdvar._transform import transform
+from openmethane.fourdvar.params import input_defn
+from openmethane.fourdvar.util.cluster_map import ClusterMap
+
+
+@attrs.frozen
+class LowRankPosterior:
+    """Posterior covariance of the unknowns, the identity less a low-rank reduction."""
+
+    vectors: np.ndarray = attrs.field(eq=False, repr=False)
+    reduction: np.ndarray = attrs.field(eq=False, repr=False)
+
+    @property
+    def dofs(self) -> float:
+        """Degrees of freedom for signal, the trace of the averaging kernel."""
+        return float(self.reduction.sum())
+
+    def variance(self) -> np.ndarray:
+        """Posterior variance of every unknown, the prior variance is one."""
+        return np.maximum(1.0 - (self.vectors**2) @ self.reduction, 0.0)
+
+    def functional_variance(self, weights: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """Prior & posterior variance of linear functions of the unknowns.
+
+        input: np.ndarray (nfunc, nunknowns)
+        output: tuple of np.ndarray (nfunc,), (prior variance, posterior variance).
+        """
+        prior = (weights**2).sum(axis=1)
+        projected = weights @ self.vectors
+        return prior, np.maximum(prior - (projected**2) @ self.reduction, 0.0)
+
+    def sqrt(self, vector: np.ndarray) -> np.ndarray:
+        """Multiply a vector (or columns of vectors) by the symmetric square root."""
+        scale = np.sqrt(1.0 - self.reduction) - 1.0
+        return vector + self.vectors @ (scale * (self.vectors.T @ vector).T).T
+
+    def inverse_sqrt(self, vector: np.ndarray) -> np.ndarray:
+        """Multiply a vector (or columns of vectors) by the inverse of sqrt."""
+        scale = 1.0 / np.sqrt(1.0 - self.reduction) - 1.0
+        return vector + self.vectors @ (scale * (self.vectors.T @ vector).T).T
+
+
+def from_pairs(s: np.ndarray, y: np.ndarray, rtol: float = 1e-8) -> LowRankPosterior:
+    """
+    Approximate the posterior from the L-BFGS correction pairs
+
+    Parameters
+    ----------
+    s
+        Change in the unknowns of each iteration (npairs, nunknowns)
+    y
+        Change in the gradient of each iteration (npairs, nunknowns)
+    rtol
+        Directions of s with a singular value below rtol times the largest are dropped
+
+    Returns
+    -------
+    LowRankPosterior with at most npairs eigenvectors
+    """
+    if len(s) == 0:
+        return LowRankPosterior(vectors=np.zeros((s.shape[1], 0)), reduction=np.zeros(0))
+    # orthonormal basis of the span of s (s' = q sigma v'), dropping directions lost to rounding
+    q, sigma, vt = np.linalg.svd(s.T, full_matrices=False)
+    keep = sigma > rtol * sigma[0]
+    q, sigma, vt = q[:, keep], sigma[keep], vt[keep]
+    # hessian @ q = y' v sigma^-1, projected onto the basis
+    projected = q.T @ (y.T @ vt.T) / sigma
+    eigval, eigvec = np.linalg.eigh(0.5 * (projected + projected.T))
+    # the hessian is the identity plus a positive semi-definite term
+    eigval = np.maximum(eigval, 1.0)
+    return LowRankPosterior(vectors=q @ eigvec, reduction=1.0 - 1.0 / eigval)
+
+
+def from_covariance(covariance: np.ndarray) -> LowRankPosterior:
+    """Express a full posterior covariance (eg: from jacobian.solve) as a LowRankPosterior."""
+    eigval, eigvec = np.linalg.eigh(covariance)
+    return LowRankPosterior(vectors=eigvec, reduction=1.0 - np.minimum(eigval, 1.0))
+
+
+def _unknown_ratio(values: np.ndarray) -> d.PhysicalData:
+    # physical values of unit-less unknowns, dividing out the prior uncertainty
+    scaled = transform(d.UnknownData(values), d.PhysicalData)
+    p = d.PhysicalData
+
+    def ratio(num, den):
+        return np.divide(num, den, out=np.zeros(np.shape(num)), where=np.asarray(den) != 0)
+
+    icon = None
+    if input_defn.inc_icon is True:
+        icon = {spc: float(ratio(scaled.icon[spc], p.icon_unc[spc])) for spc in scaled.spcs}
+    emis = {spc: ratio(scaled.emis[spc], p.emis_unc[spc]) for spc in scaled.spcs}
+    bcon = {spc: ratio(scaled.bcon[spc], p.bcon_unc[spc]) for spc in scaled.spcs}
+    return d.PhysicalData(icon, emis, bcon)
+
+
+def cell_reduction(posterior: LowRankPosterior) -> d.PhysicalData:
+    """
+    Uncertainty reduction of every grid cell
+
+    Parameters
+    ----------
+    posterior
+        Posterior covariance of the unknowns
+
+    Returns
+    -------
+    PhysicalData of 1 - posterior / prior standard deviation,
+    cells in the same cluster share the reduction of their unknown
+    """
+    # the prior variance of every cell is one, in units of its prior uncertainty.
+    # each eigenvector removes its reduction times its squared (possibly correlated) cell values
+    explained = _unknown_ratio(np.zeros(posterior.vectors.shape[0]))
+    icon = {spc: 0.0 for spc in explained.spcs}
+    emis = {spc: np.zeros_like(explained.emis[spc]) for spc in explained.spcs}
+    bcon = {spc: np.zeros_like(explained.bcon[spc]) for spc in explained.spcs}
+    for vector, reduction in zip(posterior.vectors.T, posterior.reduction):
+        cell = _unknown_ratio(vector)
+        for spc in cell.spcs:
+            if input_defn.inc_icon is True:
+                icon[spc] += reduction * cell.icon[spc] ** 2
+            emis[spc] += reduction * cell.emis[spc] ** 2
+            bcon[spc] += reduction * cell.bcon[spc] ** 2
+
+    def to_reduction(value):
+        return 1.0 - np.sqrt(np.maximum(1.0 - value, 0.0))
+
+    if input_defn.inc_icon is True:
+        icon = {spc: float(to_reduction(icon[spc])) for spc in icon}
+    else:
+        icon = None
+    return d.PhysicalData(
+        icon,
+        {spc: to_reduction(emis[spc]) for spc in emis},
+        {spc: to_reduction(bcon[spc]) for spc in bcon},
+    )
+
+
+def region_reduction(posterior: LowRankPosterior, regions: ClusterMap) -> d.PhysicalData:
+    """
+    Uncertainty reduction of the total emissions of each region
+
+    Parameters
+    ----------
+    posterior
+        Posterior covariance of the unknowns
+    regions
+        Regions of the grid
+
+    Returns
+    -------
+    PhysicalData of 1 - posterior / prior standard deviation of the emissions
+    summed over each region, for every emission timestep & layer.
+    every cell of a region holds its reduction, icon & bcon hold the cell reduction.
+    """
+    p = d.PhysicalAdjointData
+    grid_shape = (p.nstep_emis, p.nlays_emis, regions.nclusters)
+    cell = cell_reduction(posterior)
+
+    emis = {}
+    for spc in p.spcs:
+        weights = []
+        for flat in range(np.prod(grid_shape)):
+            indicator = np.zeros(grid_shape)
+            indicator.flat[flat] = 1.0
+            # the regional total is linear in the unknowns, its weights are the adjoint
+            sense = d.PhysicalAdjointData(
+                {s: 0.0 for s in p.spcs} if input_defn.inc_icon is True else None,
+                {s: regions.expand(indicator * (s == spc)) for s in p.spcs},
+                {s: np.zeros_like(cell.bcon[s]) for s in p.spcs},
+            )
+            weights.append(transform(sense, d.UnknownData).get_vector())
+        prior, post = posterior.functional_variance(np.array(weights))
+        reduction = 1.0 - np.sqrt(np.divide(post, prior, out=np.ones_like(prior), where=prior > 0))
+        emis[spc] = regions.expand(reduction.reshape(grid_shape))
+    return d.PhysicalData(cell.icon if input_defn.inc_icon is True else None, emis, cell.bcon)
@@ -0,0 +1,138 @@
+#
+# Copyright 2025 The Superpower Institute
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""
+Separable correlation of the prior emission errors.
+
+The prior error covariance of the emissions is ``B = S C S`` with S the diagonal
+``emis_unc`` and C a correlation of ``exp(-distance / length)`` along each of
+the time, row and column axes. C is the Kronecker product of the correlation
+of each axis, and the Cholesky factor L of each axis is a first order
+autoregressive filter:
+
+    x[0] = u[0]
+    x[i] = rho * x[i - 1] + sqrt(1 - rho**2) * u[i],  rho = exp(-spacing / length)
+
+so ``C = L L'`` is applied as a recursive filter along each axis in turn. L,
+its transpose and its inverse (a bidiagonal matrix) each cost O(n) and need no
+storage beyond the unknowns. ``uncondition`` applies L, ``condition_adjoint``
+applies L' and ``condition`` applies the inverse of L.
+"""
+
+import functools
+
+import attrs
+import numpy as np
+import scipy.signal
+
+from openmethane.fourdvar.params import cmaq_config, date_defn, input_defn
+from openmethane.fourdvar.util import date_handle as dt
+from openmethane.fourdvar.util import netcdf_handle as ncf
+
+
+def _filter(arr: np.ndarray, rho: float, axis: int, reverse: bool) -> np.ndarray:
+    scale = np.sqrt(1.0 - rho**2)
+    arr = np.moveaxis(arr, axis, 0)
+    if reverse:
+        arr = arr[::-1]
+    # the first element keeps unit weight, so every element has unit variance
+    src = np.array(arr, dtype=float)
+    if not reverse:
+        src[0] /= scale
+    result = scipy.signal.lfilter([scale], [1.0, -rho], src, axis=0)
+    if reverse:
+        result[-1] /= scale
+        result = result[::-1]
+    return np.moveaxis(result, 0, axis)
+
+
+@attrs.frozen
+class PriorCorrelation:
+    """Correlation of each axis of the emission unknowns, 0 for an uncorrelated axis."""
+
+    rho: tuple[float, ...]
+
+    def sqrt(self, arr: np.ndarray) -> np.ndarray:
+        """Apply the correlation factor L, correlating unit variance values."""
+        for axis, rho in enumerate(self.rho):
+            if rho > 0:
+                arr = _filter(arr, rho, axis, reverse=False)
+        return arr
+
+    def sqrt_adjoint(self, arr: np.ndarray) -> np.ndarray:
+        """Apply the transpose of L, the adjoint of sqrt."""
+        for axis, rho in enumerate(self.rho):
+            if rho > 0:
+                arr = _filter(arr, rho, axis, reverse=True)
+        return arr
+
+    def inverse_sqrt(self, arr: np.ndarray) -> np.ndarray:
+        """Apply the inverse of L, the inverse of sqrt."""
+        for axis, rho in enumerate(self.rho):
+            if rho > 0:
+                arr = np.moveaxis(np.array(arr, dtype=float), axis, 0)
+                result = arr.copy()
+                result[1:] = (arr[1:] - rho * arr[:-1]) / np.sqrt(1.0 - rho**2)
+                arr = np.moveaxis(result, 0, axis)
+        return arr
+
+
+def get_rho(spacing: float, length: float) -> float:
+    """Correlation of neighbouring values, 0 when the length scale is 0."""
+    if length <= 0:
+        return 0.0
+    return float(np.exp(-spacing / length))
+
+
+@functools.lru_cache
+def get_correlation(
+    days: float, km: float, tday_emis: float, cell_km: tuple[float, float], clustered: bool
+) -> PriorCorrelation | None:
+    """Get the (cached) correlation of the emission unknowns, None if uncorrelated.
+
+    input: float (time length scale), float (spatial length scale),
+           float (days per emission timestep), tuple of float (grid cell height & width),
+           bool (emission unknowns are clusters of cells)
+    output: PriorCorrelation or None.
+    """
+    if days <= 0 and km <= 0:
+        return None
+    time_rho = get_rho(tday_emis, days)
+    if clustered:
+        assert km <= 0, "spatial correlation needs an unknown for every grid cell"
+        # emission unknowns are (time, layer, cluster)
+        return PriorCorrelation(rho=(time_rho, 0.0, 0.0))
+    # emission unknowns are (time, layer, row, col)
+    return PriorCorrelation(
+        rho=(time_rho, 0.0, get_rho(cell_km[0], km), get_rho(cell_km[1], km))
+    )
+
+
+def get_emis_correlation(tday_emis: float, clustered: bool) -> PriorCorrelation | None:
+    """Get the correlation of the emission unknowns from input_defn, None if uncorrelated.
+
+    input: float (days per emission timestep), bool (emission unknowns are clusters)
+    output: PriorCorrelation or None.
+    """
+    days = input_defn.emis_corr_days
+    km = input_defn.emis_corr_km
+    cell_km = (0.0, 0.0)
+    if km > 0 and not clustered:
+        grid_file = dt.replace_date(cmaq_config.grid_cro_2d, date_defn.start_date)
+        cell_km = (
+            float(ncf.get_attr(grid_file, "YCELL")) / 1000.0,
+            float(ncf.get_attr(grid_file, "XCELL")) / 1000.0,
+        )
+    return get_correlation(days, km, float(tday_emis), cell_km, clustered)
@@ -0,0 +1,99 @@
+#
+# Copyright 2025 The Superpower Institute
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""
+Average soundings sharing a model cell and time step into super-observations.
+
+With ``input_defn.superob`` set, ``ObservationData.from_file`` replaces all the
+soundings with the same dominant weight_grid coordinate (date, time step, layer,
+row, col, species, as in ``lite_coord``) by their inverse variance weighted mean.
+The observation operator is linear, so the super-observation weight_grid is the
+same weighted mean of the sounding weight grids. The simulated super-observation
+is then the weighted mean of the simulated soundings, and the uncertainty is that
+of the weighted mean of independent errors.
+"""
+
+import datetime
+from typing import Any
+
+import numpy as np
+
+
+def dominant_coord(odict: dict[str, Any]) -> tuple:
+    """The lite_coord of an observation, or the weight_grid coordinate with the largest weight."""
+    coord = odict.get("lite_coord")
+    if coord is None:
+        coord = max((weight, key) for key, weight in odict["weight_grid"].items())[1]
+    return tuple(coord)
+
+
+def combine(obs_list: list[dict[str, Any]]) -> dict[str, Any]:
+    """
+    Combine soundings into one super-observation
+
+    Parameters
+    ----------
+    obs_list
+        Observations with a value, uncertainty & weight_grid
+
+    Returns
+    -------
+    The inverse variance weighted mean observation, with the other metadata
+    of the first observation and the number of soundings in superob_count
+    """
+    precision = np.array([1.0 / odict["uncertainty"] ** 2 for odict in obs_list])
+    share = precision / precision.sum()
+
+    weight_grid = {}
+    for odict, frac in zip(obs_list, share):
+        for coord, weight in odict["weight_grid"].items():
+            weight_grid[coord] = weight_grid.get(coord, 0.0) + frac * weight
+
+    result = dict(obs_list[0])
+    result["value"] = float(sum(frac * odict["value"] for odict, frac in zip(obs_list, share)))
+    result["uncertainty"] = float(1.0 / np.sqrt(precision.sum()))
+    result["weight_grid"] = weight_grid
+    result["lite_coord"] = dominant_coord(obs_list[0])
+    result["superob_count"] = len(obs_list)
+    if all("time" in odict for odict in obs_list):
+        start = min(odict["time"] for odict in obs_list)
+        elapsed = [(odict["time"] - start) / datetime.timedelta(seconds=1) for odict in obs_list]
+        result["time"] = start + datetime.timedelta(seconds=float(np.dot(share, elapsed)))
+    for key in ("latitude_center", "longitude_center"):
+        if all(key in odict for odict in obs_list):
+            result[key] = float(np.dot(share, [odict[key] for odict in obs_list]))
+    return result
+
+
+def superob(observations: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    """
+    Average the soundings sharing a dominant model cell and time step
+
+    Parameters
+    ----------
+    observations
+        Observations with a weight_grid (not obs-lite)
+
+    Returns
+    -------
+    One observation for each dominant coordinate, in order of first appearance.
+    observations alone in their cell are returned unchanged
+    """
+    groups = {}
+    for odict in observations:
+        groups.setdefault(dominant_coord(odict), []).append(odict)
+    return [
+        obs_list[0] if len(obs_list) == 1 else combine(obs_list) for obs_list in groups.values()
+    ]
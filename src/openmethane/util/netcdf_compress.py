@@ -0,0 +1,168 @@
+#
+# Copyright 2025 The Superpower Institute
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""Compress netCDF files to netCDF4 with zlib and shuffle, without requiring ncks"""
+
+import os
+import pathlib
+from concurrent.futures import ProcessPoolExecutor
+
+import netCDF4
+import numpy as np
+
+# maximum number of values read into memory at once when copying a variable
+COPY_BLOCK_SIZE = 2**26
+
+
+def _copy_group(
+    src: netCDF4.Dataset | netCDF4.Group,
+    dst: netCDF4.Dataset | netCDF4.Group,
+    complevel: int,
+    shuffle: bool,
+    chunking: dict[str, int] | None,
+    significant_digits: int | None,
+):
+    dst.setncatts({name: src.getncattr(name) for name in src.ncattrs()})
+
+    for name, dim in src.dimensions.items():
+        dst.createDimension(name, None if dim.isunlimited() else len(dim))
+
+    for name, var in src.variables.items():
+        var.set_auto_maskandscale(False)
+        # variable length types (eg: strings) and scalars cannot be compressed
+        compress = (
+            var.ndim > 0 and not isinstance(var.datatype, netCDF4.VLType) and var.dtype != str
+        )
+
+        kwargs = {}
+        if compress:
+            kwargs = {"compression": "zlib", "complevel": complevel, "shuffle": shuffle}
+            if chunking is not None:
+                kwargs["chunksizes"] = [
+                    min(chunking.get(dim_name, max(size, 1)), max(size, 1))
+                    for dim_name, size in zip(var.dimensions, var.shape)
+                ]
+            if significant_digits is not None and np.issubdtype(var.dtype, np.floating):
+                kwargs["significant_digits"] = significant_digits
+                kwargs["quantize_mode"] = "BitGroom"
+
+        attrs = {attr: var.getncattr(attr) for attr in var.ncattrs()}
+        fill_value = attrs.pop("_FillValue", None)
+        out = dst.createVariable(
+            name, var.datatype, var.dimensions, fill_value=fill_value, **kwargs
+        )
+        out.set_auto_maskandscale(False)
+        out.setncatts(attrs)
+
+        if var.ndim == 0:
+            out.assignValue(var.getValue())
+        elif var.size > 0:
+            # copy in blocks of the first dimension to bound memory use
+            row_size = max(int(np.prod(var.shape[1:])), 1)
+            step = max(COPY_BLOCK_SIZE // row_size, 1)
+            for start in range(0, var.shape[0], step):
+                end = min(start + step, var.shape[0])
+                out[start:end] = var[start:end]
+
+    for name, group in src.groups.items():
+        _copy_group(
+            group,
+            dst.createGroup(name),
+            complevel=complevel,
+            shuffle=shuffle,
+            chunking=chunking,
+            significant_digits=significant_digits,
+        )
+
+
+def compress_file(
+    source: str | pathlib.Path,
+    dest: str | pathlib.Path,
+    complevel: int = 4,
+    shuffle: bool = True,
+    chunking: dict[str, int] | None = None,
+    significant_digits: int | None = None,
+) -> None:
+    """Write a zlib compressed netCDF4 copy of a netCDF file
+
+    Produces the same data, dimensions and attributes as ``ncks -4 -L4``.
+
+    Args:
+        source: Path to the netCDF file to compress
+        dest: Path of the compressed file, may be the same as source.
+            If dest already exists it is overwritten.
+        complevel: zlib compression level (1-9)
+        shuffle: Apply the shuffle filter before compression
+        chunking: Chunk length for each named dimension,
+            dimensions not listed are a single chunk.
+            None uses the netCDF library default chunking.
+        significant_digits: Number of significant digits to retain in floating
+            point variables (default is to retain all)
+
+    Returns:
+        Nothing
+    """
+    dest = pathlib.Path(dest)
+    # write to a temporary file first so source and dest can be the same file
+    tmp_path = dest.with_name(f".{dest.name}.{os.getpid()}.tmp")
+    try:
+        with netCDF4.Dataset(source, "r") as src, netCDF4.Dataset(
+            tmp_path, "w", format="NETCDF4"
+        ) as dst:
+            _copy_group(
+                src,
+                dst,
+                complevel=complevel,
+                shuffle=shuffle,
+                chunking=chunking,
+                significant_digits=significant_digits,
+            )
+        os.replace(tmp_path, dest)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+
+
+def compress_files(
+    paths: list[tuple[str | pathlib.Path, str | pathlib.Path]],
+    max_workers: int | None = None,
+    **kwargs,
+) -> None:
+    """Compress several netCDF files concurrently
+
+    Args:
+        paths: (source, dest) pairs, see compress_file
+        max_workers: Number of worker processes, defaults to the number of CPUs.
+            1 compresses every file in the current process.
+        kwargs: Compression options passed to compress_file
+
+    Returns:
+        Nothing
+    """
+    paths = list(paths)
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    max_workers = min(max_workers, len(paths))
+
+    if max_workers <= 1:
+        for source, dest in paths:
+            compress_file(source, dest, **kwargs)
+        return
+
+    # netCDF/HDF5 is not thread safe, so files are compressed in separate processes
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        futures = [pool.submit(compress_file, source, dest, **kwargs) for source, dest in paths]
+        for future in futures:
+            future.result()
@@ -1,4 +1,5 @@
 import os
+import sys
 from importlib import reload
 from pathlib import Path
 
@@ -6,6 +7,7 @@ import pytest
 import xarray as xr
 
 from openmethane.fourdvar import env
+from openmethane.fourdvar.datadef.abstract._physical_abstract_data import PhysicalAbstractData
 from openmethane.fourdvar.params import (
     archive_defn,
     cmaq_config,
@@ -15,6 +17,7 @@ from openmethane.fourdvar.params import (
     root_path_defn,
     template_defn,
 )
+from openmethane.fourdvar.util import cmaq_handle, cmaq_io_files
 
 
 @pytest.fixture
@@ -155,3 +158,60 @@ def target_environment(monkeypatch):
     os.environ.update(initial_env)
 
     _reload_params()
+
+
+@pytest.fixture
+def local_model(test_data_dir, target_environment, tmp_path, monkeypatch):
+    """Run fourdvar for two days in tmp_path with the local stand-in for CMAQ."""
+    # the test data only has met for the first day, reuse it for the second
+    met_dir = tmp_path / "mcip"
+    met_dir.mkdir()
+    for day in ("2022-12-07", "2022-12-08"):
+        (met_dir / day).symlink_to(test_data_dir / "mcip" / "2022-12-07")
+
+    target_environment(
+        "docker-test",
+        overrides={
+            "STORE_PATH": str(tmp_path),
+            "END_DATE": "2022-12-08",
+            "MET_DIR": str(met_dir),
+            "CMAQ_SHELL": "/bin/sh",
+            "ADJOINT_FWD": f"{sys.executable} -m openmethane.fourdvar.util.local_cmaq fwd",
+            "ADJOINT_BWD": f"{sys.executable} -m openmethane.fourdvar.util.local_cmaq bwd",
+        },
+    )
+    for name in ("manifest", "progress"):
+        monkeypatch.setattr(cmaq_handle, name, None)
+    monkeypatch.setattr(cmaq_handle, "run_env_cache", {})
+    monkeypatch.setattr(cmaq_io_files, "firsttime", True)
+    monkeypatch.setattr(cmaq_io_files, "all_files", {})
+    monkeypatch.chdir(tmp_path)
+    for path in (cmaq_config.emis_file, cmaq_config.force_file):
+        os.makedirs(os.path.dirname(path))
+
+
+@pytest.fixture
+def local_prior(local_model, monkeypatch):
+    """Prior PhysicalData file for the local_model run, at input_defn.prior_file."""
+    from scripts.cmaq_preprocess.make_prior import make_prior
+
+    # forget the shape of any PhysicalData loaded by earlier tests
+    for name in (
+        "tday_emis",
+        "nstep_emis",
+        "nlays_emis",
+        "nrows",
+        "ncols",
+        "spcs",
+        "emis_unc",
+        "bcon_region",
+        "tsec_bcon",
+        "nstep_bcon",
+        "bcon_up_lay",
+        "bcon_unc",
+        "icon_unc",
+    ):
+        monkeypatch.setattr(PhysicalAbstractData, name, None, raising=False)
+
+    make_prior(save_path=input_defn.prior_file, emis_template=template_defn.emis)
+    return Path(input_defn.prior_file)
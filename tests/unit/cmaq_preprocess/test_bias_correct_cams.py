@@ -3,9 +3,17 @@
 import datetime
 import shutil
 
+import numpy as np
 import xarray as xr
 
-from openmethane.cmaq_preprocess.bias import calculate_icon_bias, correct_icon_bcon
+import openmethane.fourdvar.datadef as d
+from openmethane.cmaq_preprocess.bias import (
+    calculate_emissions_bias,
+    calculate_icon_bias,
+    calculate_mean_obs,
+    correct_icon_bcon,
+)
+from openmethane.fourdvar.params import cmaq_config
 
 
 def test_bias_zero_after_correct(test_data_dir, tmp_path, monkeypatch, metcro3d_file):
@@ -58,3 +66,18 @@ def test_bias_zero_after_correct(test_data_dir, tmp_path, monkeypatch, metcro3d_
         end_date=end_date,
     )
     assert abs(new_bias) <= 1e-6
+
+
+def test_emissions_bias(local_prior, test_data_dir, monkeypatch):
+    monkeypatch.setattr(cmaq_config, "ensemble_slots", 2)
+    obs_file = test_data_dir / "obs" / "test_obs_2022-12-07.pic.gz"
+
+    bias = calculate_emissions_bias(prior_file=local_prior, obs_file=obs_file, species="CH4")
+
+    # same as running each model in the main workspace
+    prior = d.PhysicalData.from_file(local_prior)
+    mean_emis = calculate_mean_obs(prior, obs_file)
+    prior.emis["CH4"] *= 0.0
+    mean_no_emis = calculate_mean_obs(prior, obs_file)
+    assert bias > 0
+    np.testing.assert_allclose(bias, mean_emis - mean_no_emis)
@@ -1,8 +1,15 @@
 import datetime
 
+import numpy as np
 import pytest
 
-from openmethane.fourdvar.datadef.observation_data import ObservationData, load_observations_from_file
+from openmethane.fourdvar.datadef.observation_data import (
+    ObservationData,
+    load_archive_values,
+    load_observations_from_file,
+)
+from openmethane.fourdvar.params import input_defn
+from openmethane.fourdvar.util import archive_handle, file_handle
 
 
 @pytest.mark.parametrize(
@@ -72,6 +79,16 @@ def test_observation_data(test_data_dir, target_environment):
     obs.length == 1575
 
 
+def test_get_last_date(test_data_dir, target_environment):
+    target_environment("docker-test", overrides={"END_DATE": "2022-12-08"})
+
+    ObservationData.from_file(test_data_dir / "obs" / "test_obs_2022-12-07.pic.gz")
+    assert ObservationData.get_last_date() == datetime.date(2022, 12, 7)
+
+    ObservationData.from_file(test_data_dir / "obs" / "test_obs_2022-12-*.pic.gz")
+    assert ObservationData.get_last_date() == datetime.date(2022, 12, 8)
+
+
 def test_observation_data_missing(test_data_dir, target_environment):
     target_environment("docker-test")
 
@@ -80,3 +97,79 @@ def test_observation_data_missing(test_data_dir, target_environment):
         FileNotFoundError, match=f"No valid observations files found matching {inp_file}"
     ):
         ObservationData.from_file(inp_file)
+
+
+def _assert_same(actual, expected):
+    assert type(actual) is type(expected)
+    if isinstance(expected, dict):
+        assert list(actual.keys()) == list(expected.keys())
+        for key in expected:
+            _assert_same(actual[key], expected[key])
+    elif isinstance(expected, list | tuple):
+        assert len(actual) == len(expected)
+        for a, e in zip(actual, expected):
+            _assert_same(a, e)
+    elif isinstance(expected, np.ndarray):
+        np.testing.assert_array_equal(actual, expected)
+    else:
+        assert actual == expected
+
+
+def test_archive_values_reconstructs_lite(test_data_dir, target_environment, tmp_path, monkeypatch):
+    target_environment("docker-test")
+    monkeypatch.setattr(archive_handle, "archive_path", str(tmp_path))
+    monkeypatch.setattr(archive_handle, "finished_setup", True)
+
+    observed = ObservationData.from_file(test_data_dir / "obs" / "test_obs_2022-12-07.pic.gz")
+    simulated = ObservationData(np.array(observed.value) + 1.5)
+
+    simulated.archive("obs_lite.pic.gz", force_lite=True)
+    simulated.archive_values("obs_lite_iter0001.npz", observed=observed)
+    simulated.archive_values("obs_lite_iter0002.npz", observed=observed)
+
+    meta_file = tmp_path / ObservationData.meta_archive_name
+    reconstructed = load_archive_values(tmp_path / "obs_lite_iter0002.npz", meta_file)
+    expected = file_handle.load_list(tmp_path / "obs_lite.pic.gz")
+    _assert_same(reconstructed, expected)
+
+    with np.load(tmp_path / "obs_lite_iter0001.npz") as arrays:
+        np.testing.assert_allclose(arrays["residual"], 1.5)
+
+    # values only archives are much smaller than the full lite archive
+    lite_size = (tmp_path / "obs_lite.pic.gz").stat().st_size
+    assert (tmp_path / "obs_lite_iter0001.npz").stat().st_size < lite_size / 10
+
+
+def test_correlated_error_weight(test_data_dir, target_environment, monkeypatch):
+    target_environment("docker-test")
+    obs_file = test_data_dir / "obs" / "test_obs_2022-12-07.pic.gz"
+    residual = ObservationData.from_file(obs_file)
+    values = residual.get_vector() - residual.get_vector().mean()
+    residual = ObservationData(values)
+    diagonal = ObservationData.error_weight(residual).get_vector()
+    np.testing.assert_allclose(diagonal, values / np.array(ObservationData.uncertainty) ** 2)
+
+    # restored to independent errors after the test
+    monkeypatch.setattr(ObservationData, "error_blocks", None)
+    monkeypatch.setattr(input_defn, "obs_error_blocks", "scanline:2")
+    ObservationData.from_file(obs_file)
+    assert ObservationData.error_blocks.nblocks > 0
+    weighted = ObservationData.error_weight(residual).get_vector()
+
+    # the cost is the same weighted or whitened, and smaller than with independent errors
+    np.testing.assert_allclose(values @ weighted, (ObservationData.whiten(values) ** 2).sum())
+    assert values @ weighted < values @ diagonal
+
+
+def test_superob(test_data_dir, target_environment, monkeypatch):
+    target_environment("docker-test")
+    obs_file = test_data_dir / "obs" / "test_obs_2022-12-07.pic.gz"
+    monkeypatch.setattr(input_defn, "superob", True)
+
+    obs = ObservationData.from_file(obs_file)
+    obs.assert_params()
+
+    # one observation per model cell & time step
+    assert obs.length == 77
+    assert len(set(ObservationData.lite_coord)) == obs.length
+    assert sum(meta.get("superob_count", 1) for meta in ObservationData.misc_meta) == 165
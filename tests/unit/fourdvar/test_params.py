@@ -131,6 +131,8 @@ def test_cmaq_config(data_regression, target_environment, target):
     attributes = set([item for item in dir(cmaq_config) if not item.startswith("_")]) - {
         "env",
         "os",
+        "archive_defn",
+        "input_defn",
         "store_path",
         "logger",
         "get_logger",
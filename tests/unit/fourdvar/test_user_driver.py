@@ -0,0 +1,329 @@
+import json
+import os
+import pathlib
+import runpy
+
+import numpy as np
+import pytest
+
+import openmethane.fourdvar._main_driver as main_driver
+import openmethane.fourdvar.datadef as d
+from openmethane.fourdvar import user_driver
+from openmethane.fourdvar._transform import transform
+from openmethane.fourdvar.params import archive_defn, cmaq_config, data_access, input_defn
+from openmethane.fourdvar.transfunc.condition import get_bcon_index
+from openmethane.fourdvar.util import (
+    archive_handle,
+    cluster_map,
+    cmaq_handle,
+    jacobian,
+    period_chain,
+)
+
+
+class _Archivable:
+    """Writes an empty file for each archive, from the background writer."""
+
+    def __init__(self, path):
+        self.path = path
+        path.mkdir()
+
+    @property
+    def archived(self):
+        archive_handle.flush()
+        return sorted(f.name for f in self.path.iterdir())
+
+    def archive(self, name, **kwargs):
+        (self.path / name).touch()
+
+    def archive_values(self, name, **kwargs):
+        (self.path / name).touch()
+
+
+def _fail(*args, **kwargs):
+    raise AssertionError("callback should not transform or read model output")
+
+
+@pytest.fixture
+def previous_evaluation(monkeypatch, tmp_path):
+    vector = np.arange(5.0)
+    evaluation = {
+        "vector": vector,
+        "physical": _Archivable(tmp_path / "physical"),
+        "simulated": _Archivable(tmp_path / "simulated"),
+        "cost": {"cost": 3.0, "bg_cost": 1.0, "ob_cost": 2.0, "bias": 0.0, "chisq": 1.0},
+    }
+    monkeypatch.setattr(data_access, "prev_evaluation", evaluation)
+    monkeypatch.setattr(user_driver, "iter_num", 0)
+    monkeypatch.setattr(archive_defn, "iter_obs_lite", True)
+    monkeypatch.setattr(data_access, "bcon_response", None)
+    monkeypatch.setattr(user_driver, "get_observed", lambda: None)
+    return evaluation
+
+
+def test_callback_reuses_evaluation(previous_evaluation, monkeypatch):
+    monkeypatch.setattr(user_driver, "transform", _fail)
+    monkeypatch.setattr(user_driver.d, "ModelOutputData", _fail)
+
+    user_driver.callback_func(previous_evaluation["vector"].copy())
+
+    assert previous_evaluation["physical"].archived == ["iter0001.ncf"]
+    assert previous_evaluation["simulated"].archived == ["obs_lite_iter0001.npz"]
+
+
+def test_callback_different_vector(previous_evaluation, monkeypatch):
+    monkeypatch.setattr(user_driver, "transform", _fail)
+
+    with pytest.raises(AssertionError, match="should not transform"):
+        user_driver.callback_func(previous_evaluation["vector"] + 1.0)
+    assert previous_evaluation["physical"].archived == []
+
+
+@pytest.fixture
+def local_inversion(local_prior, test_data_dir, monkeypatch):
+    obs_file = test_data_dir / "obs" / "test_obs_2022-12-07.pic.gz"
+    monkeypatch.setattr(input_defn, "obs_file", str(obs_file))
+    monkeypatch.setattr(user_driver, "observed", None)
+    monkeypatch.setattr(user_driver, "background", None)
+    monkeypatch.setattr(user_driver, "iter_num", 0)
+    monkeypatch.setattr(archive_handle, "finished_setup", False)
+    monkeypatch.setattr(data_access, "bcon_response", None)
+    monkeypatch.setenv("ALLOW_NEGATIVE_EMISSIONS", "true")
+    monkeypatch.setattr(cmaq_config, "local_courant", "0.3 0.2")
+
+
+def test_get_observed_trim_to_obs(local_inversion, monkeypatch):
+    monkeypatch.setattr(data_access, "model_end_date", None)
+    monkeypatch.setattr(input_defn, "trim_to_obs", False)
+    user_driver.get_observed()
+    assert data_access.model_end_date is None
+
+    monkeypatch.setattr(user_driver, "observed", None)
+    monkeypatch.setattr(input_defn, "trim_to_obs", True)
+    observed = user_driver.get_observed()
+    assert data_access.model_end_date == observed.get_last_date()
+
+
+def test_minim_cg(local_inversion, monkeypatch):
+    monkeypatch.setenv("MINIM_SOLVER", "cg")
+    monkeypatch.setenv("MAX_ITERATIONS", "5")
+    user_driver.setup()
+    prior_vector = transform(user_driver.get_background(), d.UnknownData).get_vector()
+
+    answer = user_driver.minim(main_driver.cost_func, main_driver.gradient_func, prior_vector)
+
+    solution, cost, info, start = answer
+    # few observations, converges before the iteration limit
+    assert info["warnflag"] == 0
+    assert 0 < info["nit"] < 5
+    assert info["funcalls"] == info["nit"]
+    assert cost < start["start_cost"]
+    for i in range(1, info["nit"] + 1):
+        assert os.path.isfile(os.path.join(archive_handle.get_archive_path(), f"iter{i:04}.ncf"))
+    # the cost is quadratic, so the cost & gradient of the solution follow without a model run
+    np.testing.assert_allclose(main_driver.cost_func(solution), cost, rtol=1e-5)
+    gradient = main_driver.gradient_func(solution)
+    np.testing.assert_allclose(
+        gradient, info["grad"], atol=1e-3 * np.linalg.norm(start["start_grad"])
+    )
+    # the hessian is the identity plus a positive semi-definite observation term
+    assert (info["ritz_values"] > 1 - 1e-6).all()
+
+
+def test_minim_jacobian(local_inversion, monkeypatch):
+    monkeypatch.setattr(input_defn, "cluster_map", "landuse")
+    cluster_map.get_cluster_map.cache_clear()
+    monkeypatch.setattr(cmaq_config, "ensemble_slots", 4)
+    monkeypatch.setenv("MINIM_SOLVER", "jacobian")
+    user_driver.setup()
+    prior_vector = transform(user_driver.get_background(), d.UnknownData).get_vector()
+
+    answer = user_driver.minim(main_driver.cost_func, main_driver.gradient_func, prior_vector)
+
+    solution, cost, info, start = answer
+    archive_path = archive_handle.get_archive_path()
+    assert os.path.isfile(os.path.join(archive_path, "iter0001.ncf"))
+    jacobian_file = os.path.join(archive_path, archive_defn.jacobian)
+    with np.load(jacobian_file) as saved:
+        assert saved["jacobian"].shape == (d.ObservationData.length, len(prior_vector))
+        base_simulated = saved["base_simulated"]
+    with np.load(os.path.join(archive_path, archive_defn.jacobian_posterior)) as posterior:
+        np.testing.assert_allclose(posterior["dofs"], info["dofs"])
+
+    # the closed form solution is the minimum of the cost
+    np.testing.assert_allclose(main_driver.cost_func(solution), cost, rtol=1e-5)
+    gradient = main_driver.gradient_func(solution)
+    tolerance = 1e-4 * np.linalg.norm(start["start_grad"])
+    assert np.linalg.norm(gradient) < tolerance
+    np.testing.assert_allclose(gradient, info["grad"], atol=tolerance)
+
+    covariance = info["covariance"]
+    np.testing.assert_allclose(covariance, covariance.T, atol=1e-12)
+    assert (np.linalg.eigvalsh(covariance) > 0).all()
+    assert 0 < info["dofs"] < len(prior_vector)
+
+    # the saved jacobian is reused without running the model
+    monkeypatch.setattr(jacobian.ensemble, "run_ensemble", _fail)
+    jac = jacobian.build_jacobian(jacobian_file, prior_vector, base_simulated)
+    assert not np.isnan(jac).any()
+
+
+def test_minim_bcon_response(local_inversion, monkeypatch):
+    monkeypatch.setattr(input_defn, "cluster_map", "landuse")
+    cluster_map.get_cluster_map.cache_clear()
+    monkeypatch.setattr(cmaq_config, "ensemble_slots", 4)
+    monkeypatch.setenv("BCON_RESPONSE", "true")
+    monkeypatch.setenv("MAX_ITERATIONS", "3")
+    user_driver.setup()
+    prior_vector = transform(user_driver.get_background(), d.UnknownData).get_vector()
+    bcon_index = get_bcon_index()
+
+    answer = user_driver.minim(main_driver.cost_func, main_driver.gradient_func, prior_vector)
+
+    solution, cost, info, start = answer
+    assert len(bcon_index) == 8
+    assert data_access.bcon_response.response.shape == (d.ObservationData.length, 8)
+    assert os.path.isfile(os.path.join(archive_handle.get_archive_path(), "bcon_response.npz"))
+    assert cost < start["start_cost"]
+    # the boundary unknowns of the solution are optimal for its emissions
+    assert not np.array_equal(solution[bcon_index], prior_vector[bcon_index])
+    # the model runs of the solution itself
+    data_access.bcon_response = None
+    np.testing.assert_allclose(main_driver.cost_func(solution), cost, rtol=1e-6)
+    gradient = main_driver.gradient_func(solution)
+    assert np.abs(gradient[bcon_index]).max() < 1e-4 * np.linalg.norm(start["start_grad"])
+
+
+def test_minim_clears_bcon_response(local_inversion, monkeypatch):
+    monkeypatch.setattr(data_access, "bcon_response", object())
+    monkeypatch.setenv("MAX_ITERATIONS", "1")
+    user_driver.setup()
+    prior_vector = transform(user_driver.get_background(), d.UnknownData).get_vector()
+
+    user_driver.minim(main_driver.cost_func, main_driver.gradient_func, prior_vector)
+
+    # without BCON_RESPONSE the responses of an earlier minimization are not used
+    assert data_access.bcon_response is None
+
+
+def test_minim_convergence_monitor(local_inversion, monkeypatch):
+    monkeypatch.setenv("MAX_ITERATIONS", "20")
+    monkeypatch.setenv("CONVERGENCE_COST_REDUCTION", "1e-3")
+    monkeypatch.setenv("CONVERGENCE_PATIENCE", "1")
+    user_driver.setup()
+    prior_vector = transform(user_driver.get_background(), d.UnknownData).get_vector()
+
+    answer = user_driver.minim(main_driver.cost_func, main_driver.gradient_func, prior_vector)
+
+    info = answer[2]
+    assert info["warnflag"] == 0
+    assert info["task"].startswith("CONVERGENCE: MONITOR cost_reduction")
+    with open(os.path.join(archive_handle.get_archive_path(), archive_defn.convergence)) as f:
+        saved = json.load(f)
+    assert len(saved["iterations"]) == info["nit"]
+    assert saved["iterations"][-1]["cost_reduction"] <= 1e-3
+    assert all(record["cost_reduction"] > 1e-3 for record in saved["iterations"][:-1])
+    assert saved["iterations"][-1]["grad_reduction"] < 1
+    assert saved["estimated_hours_saved"] > 0
+    # the iterations are archived by the background writer in this archive
+    archive_path = archive_handle.get_archive_path()
+    for num in range(1, info["nit"] + 1):
+        assert os.path.isfile(os.path.join(archive_path, f"iter{num:04}.ncf"))
+        assert os.path.isfile(os.path.join(archive_path, f"obs_lite_iter{num:04}.npz"))
+    # nothing is archived for a following chained period unless asked for
+    assert not os.path.exists(
+        os.path.join(archive_handle.get_archive_path(), archive_defn.chain_posterior)
+    )
+
+
+def test_minim_chained_period(local_inversion, monkeypatch):
+    monkeypatch.setenv("MAX_ITERATIONS", "20")
+    monkeypatch.setattr(input_defn, "chain_next", True)
+    user_driver.setup()
+    background = user_driver.get_background()
+    prior_vector = transform(background, d.UnknownData).get_vector()
+    first = user_driver.minim(main_driver.cost_func, main_driver.gradient_func, prior_vector)
+    prev_window = archive_handle.get_archive_path()
+    solution = transform(d.UnknownData(first[0]), d.PhysicalData)
+    solution.archive(archive_defn.posterior_multipliers)
+    period_chain.archive_chain_icon(solution)
+    # only the concentrations at the end of the period are archived
+    assert os.path.isfile(os.path.join(prev_window, "chain_icon.20221209.nc"))
+    assert not os.path.exists(os.path.join(prev_window, "chain_icon.20221208.nc"))
+
+    # the next period starts from the solution & posterior covariance of this one
+    monkeypatch.setattr(archive_handle, "finished_setup", False)
+    monkeypatch.setattr(user_driver, "iter_num", 0)
+    user_driver.setup()
+    start = period_chain.map_posterior(prev_window, background)
+    start_vector = transform(start, d.UnknownData).get_vector()
+    np.testing.assert_allclose(start_vector, first[0], rtol=1e-5, atol=1e-6)
+    preconditioner = period_chain.load_posterior(prev_window, len(start_vector))
+    assert preconditioner.vectors.shape[1] > 0
+
+    second = user_driver.minim(
+        main_driver.cost_func,
+        main_driver.gradient_func,
+        start_vector,
+        preconditioner=preconditioner,
+    )
+    assert second[2]["nit"] < first[2]["nit"]
+    np.testing.assert_allclose(second[1], first[1], rtol=1e-6)
+
+
+
+def test_restart_chained_period(local_inversion, monkeypatch):
+    # the first period stops early, so the next one starts away from the minimum
+    monkeypatch.setenv("MAX_ITERATIONS", "2")
+    monkeypatch.setattr(input_defn, "chain_next", True)
+    monkeypatch.setattr(archive_defn, "experiment", "first_period")
+    user_driver.setup()
+    background = user_driver.get_background()
+    prior_vector = transform(background, d.UnknownData).get_vector()
+    first = user_driver.minim(main_driver.cost_func, main_driver.gradient_func, prior_vector)
+    prev_window = archive_handle.get_archive_path()
+    solution = transform(d.UnknownData(first[0]), d.PhysicalData)
+    solution.archive(archive_defn.posterior_multipliers)
+
+    # the next period, uninterrupted & interrupted after its first iteration
+    monkeypatch.setattr(input_defn, "chain_next", False)
+    monkeypatch.setattr(input_defn, "prev_window", prev_window)
+    start = transform(period_chain.map_posterior(prev_window, background), d.UnknownData)
+    start_vector = start.get_vector()
+    preconditioner = period_chain.load_posterior(prev_window, len(start_vector))
+    answers = {}
+    for experiment, maxiter in (("second_period_full", "20"), ("second_period", "1")):
+        monkeypatch.setattr(archive_defn, "experiment", experiment)
+        monkeypatch.setattr(archive_handle, "finished_setup", False)
+        monkeypatch.setattr(user_driver, "iter_num", 0)
+        monkeypatch.setenv("MAX_ITERATIONS", maxiter)
+        user_driver.setup()
+        answers[experiment] = user_driver.minim(
+            main_driver.cost_func,
+            main_driver.gradient_func,
+            start_vector,
+            preconditioner=preconditioner,
+        )
+    full = answers["second_period_full"]
+    interrupted = answers["second_period"]
+    assert interrupted[2]["nit"] == 1 < full[2]["nit"]
+
+    # resume it as a new process would, the saved evaluations are replayed without CMAQ
+    monkeypatch.setenv("MAX_ITERATIONS", "20")
+    monkeypatch.setattr(user_driver, "iter_num", 0)
+    monkeypatch.setattr(archive_handle, "archive_path", "")
+    fwd_runs = []
+    run_fwd = cmaq_handle.run_fwd
+    monkeypatch.setattr(cmaq_handle, "run_fwd", lambda: fwd_runs.append(1) or run_fwd())
+    resumed = []
+    monkeypatch.setattr(
+        user_driver, "post_process", lambda physical, metadata: resumed.append(metadata)
+    )
+    runpy.run_path(str(pathlib.Path(__file__).parents[3] / "restart_script.py"))
+
+    cost, info, _ = resumed[0]
+    assert len(fwd_runs) <= info["funcalls"] - interrupted[2]["funcalls"]
+    # the same minimization as without the interruption
+    assert info["nit"] == full[2]["nit"]
+    assert info["funcalls"] == full[2]["funcalls"]
+    np.testing.assert_allclose(cost, full[1], rtol=1e-12)
@@ -0,0 +1,67 @@
+import importlib
+
+import numpy as np
+import pytest
+
+from openmethane.fourdvar.datadef import AdjointForcingData, ObservationData
+from openmethane.fourdvar.params import template_defn
+from openmethane.fourdvar.transfunc.calc_forcing import calc_forcing
+from openmethane.fourdvar.util import cmaq_io_files, file_handle, netcdf_handle
+
+# the package re-exports the function under the same name as the module
+calc_forcing_module = importlib.import_module("openmethane.fourdvar.transfunc.calc_forcing")
+
+
+@pytest.fixture
+def forcing_environment(test_data_dir, target_environment, tmp_path, monkeypatch):
+    target_environment("docker-test", overrides={"STORE_PATH": str(tmp_path)})
+    # rebuild the file lists using the temporary store path
+    monkeypatch.setattr(cmaq_io_files, "firsttime", True)
+    monkeypatch.setattr(cmaq_io_files, "all_files", {})
+    file_handle.ensure_path(str(tmp_path / "run-cmaq" / "force"))
+    monkeypatch.chdir(tmp_path)
+
+    ObservationData.from_file(test_data_dir / "obs" / "test_obs_2022-12-07.pic.gz")
+
+
+def _dense_forcing(w_residual):
+    # Reference implementation filling the full forcing array
+    shape = netcdf_handle.get_variable(template_defn.force, "CH4").shape
+    forcing = {}
+    for ymd, ilist in ObservationData.ind_by_date.items():
+        arr = np.zeros(shape)
+        for i in ilist:
+            for coord, weight in ObservationData.weight_grid[i].items():
+                if str(coord[0]) == ymd:
+                    step, lay, row, col, _ = coord[1:]
+                    arr[step, lay, row, col] += 1e3 * w_residual.value[i] * weight
+        forcing["force." + ymd] = arr
+    return forcing
+
+
+def test_calc_forcing_matches_dense(forcing_environment):
+    rng = np.random.default_rng(0)
+    w_residual = ObservationData(rng.normal(size=ObservationData.length))
+
+    forcing = calc_forcing(w_residual)
+
+    expected = _dense_forcing(w_residual)
+    for label, arr in expected.items():
+        np.testing.assert_allclose(forcing.get_variable(label, "CH4"), arr, rtol=1e-6)
+
+    # only the timesteps with observations are held in memory
+    tsteps = calc_forcing_module.forcing_index["force.20221207"]["tsteps"]
+    assert 0 < len(tsteps) < arr.shape[0]
+
+
+def test_calc_forcing_reuses_buffers(forcing_environment):
+    w_residual = ObservationData(np.ones(ObservationData.length))
+
+    calc_forcing(w_residual)
+    buffer = calc_forcing_module.forcing_buffer[("force.20221207", "CH4")]
+    forcing = calc_forcing(w_residual)
+
+    assert calc_forcing_module.forcing_buffer[("force.20221207", "CH4")] is buffer
+    expected = _dense_forcing(w_residual)["force.20221207"]
+    np.testing.assert_allclose(forcing.get_variable("force.20221207", "CH4"), expected, rtol=1e-6)
+    assert isinstance(forcing, AdjointForcingData)
@@ -0,0 +1,112 @@
+import numpy as np
+import pytest
+
+import openmethane.fourdvar.datadef as d
+from openmethane.fourdvar._transform import transform
+from openmethane.fourdvar.params import input_defn
+from openmethane.fourdvar.transfunc.condition import log_emis_adjoint
+from openmethane.fourdvar.util import cluster_map, prior_correlation
+
+
+@pytest.fixture
+def clustered(local_prior, monkeypatch):
+    monkeypatch.setattr(input_defn, "cluster_map", "block:3x4")
+    cluster_map.get_cluster_map.cache_clear()
+    return d.PhysicalData.from_file(local_prior)
+
+
+def test_cluster_unknowns(clustered):
+    p = d.PhysicalData
+    clusters = cluster_map.get_emis_clusters(p.nrows, p.ncols)
+    emis_len = p.nstep_emis * p.nlays_emis * clusters.nclusters
+    rng = np.random.default_rng(0)
+    vector = rng.normal(size=emis_len + p.nstep_bcon * p.bcon_region)
+
+    physical = transform(d.UnknownData(vector), d.PhysicalData)
+
+    # every cell in a cluster has the same scaled emissions
+    scaled = physical.emis["CH4"] / p.emis_unc["CH4"]
+    np.testing.assert_allclose(clusters.expand(clusters.mean(scaled)), scaled)
+    np.testing.assert_allclose(transform(physical, d.UnknownData).get_vector(), vector)
+
+
+def test_cluster_adjoint(clustered):
+    # condition_adjoint is the adjoint of uncondition
+    p = d.PhysicalAdjointData
+    rng = np.random.default_rng(1)
+    vector = rng.normal(size=transform(clustered, d.UnknownData).get_vector().size)
+    sense = d.PhysicalAdjointData(
+        None,
+        {"CH4": rng.normal(size=(p.nstep_emis, p.nlays_emis, p.nrows, p.ncols))},
+        {"CH4": rng.normal(size=(p.nstep_bcon, p.bcon_region))},
+    )
+
+    physical = transform(d.UnknownData(vector), d.PhysicalData)
+    gradient = transform(sense, d.UnknownData).get_vector()
+
+    np.testing.assert_allclose(
+        (physical.emis["CH4"] * sense.emis["CH4"]).sum()
+        + (physical.bcon["CH4"] * sense.bcon["CH4"]).sum(),
+        vector @ gradient,
+    )
+
+
+def test_correlated_adjoint(local_prior, monkeypatch):
+    monkeypatch.setattr(input_defn, "emis_corr_days", 1.0)
+    monkeypatch.setattr(input_defn, "emis_corr_km", 30.0)
+    cluster_map.get_cluster_map.cache_clear()
+    prior_correlation.get_correlation.cache_clear()
+    physical = d.PhysicalData.from_file(local_prior)
+    p = d.PhysicalAdjointData
+    rng = np.random.default_rng(2)
+    vector = rng.normal(size=transform(physical, d.UnknownData).get_vector().size)
+    sense = d.PhysicalAdjointData(
+        None,
+        {"CH4": rng.normal(size=(p.nstep_emis, p.nlays_emis, p.nrows, p.ncols))},
+        {"CH4": rng.normal(size=(p.nstep_bcon, p.bcon_region))},
+    )
+
+    unconditioned = transform(d.UnknownData(vector), d.PhysicalData)
+    gradient = transform(sense, d.UnknownData).get_vector()
+
+    # neighbouring cells are correlated
+    scaled = unconditioned.emis["CH4"] / p.emis_unc["CH4"]
+    assert np.corrcoef(scaled[..., :-1].ravel(), scaled[..., 1:].ravel())[0, 1] > 0.5
+    np.testing.assert_allclose(transform(unconditioned, d.UnknownData).get_vector(), vector)
+    np.testing.assert_allclose(
+        (unconditioned.emis["CH4"] * sense.emis["CH4"]).sum()
+        + (unconditioned.bcon["CH4"] * sense.bcon["CH4"]).sum(),
+        vector @ gradient,
+    )
+
+
+def test_log_emis(local_prior, monkeypatch):
+    monkeypatch.setattr(input_defn, "log_emis", True)
+    cluster_map.get_cluster_map.cache_clear()
+    prior = d.PhysicalData.from_file(local_prior)
+    p = d.PhysicalAdjointData
+    rng = np.random.default_rng(3)
+    # the prior scaling of 1 is the zero vector
+    assert np.allclose(transform(prior, d.UnknownData).get_vector()[: prior.emis["CH4"].size], 0)
+    vector = rng.normal(size=transform(prior, d.UnknownData).get_vector().size)
+    sense = d.PhysicalAdjointData(
+        None,
+        {"CH4": rng.normal(size=(p.nstep_emis, p.nlays_emis, p.nrows, p.ncols))},
+        {"CH4": rng.normal(size=(p.nstep_bcon, p.bcon_region))},
+    )
+
+    def response(vec):
+        physical = transform(d.UnknownData(vec), d.PhysicalData)
+        return (physical.emis["CH4"] * sense.emis["CH4"]).sum() + (
+            physical.bcon["CH4"] * sense.bcon["CH4"]
+        ).sum()
+
+    physical = transform(d.UnknownData(vector), d.PhysicalData)
+    assert (physical.emis["CH4"] > 0).all()
+    np.testing.assert_allclose(transform(physical, d.UnknownData).get_vector(), vector)
+
+    # the chain rule gradient matches central differences
+    gradient = transform(log_emis_adjoint(sense, physical), d.UnknownData).get_vector()
+    step = 1e-6 * rng.normal(size=vector.size)
+    change = 0.5 * (response(vector + step) - response(vector - step))
+    np.testing.assert_allclose(gradient @ step, change, rtol=1e-6)
@@ -0,0 +1,86 @@
+import os
+
+import numpy as np
+import pytest
+
+from openmethane.fourdvar.params import archive_defn
+from openmethane.fourdvar.util import archive_handle
+
+
+@pytest.fixture
+def background_writer(monkeypatch):
+    monkeypatch.setattr(archive_defn, "background_archive", True)
+    monkeypatch.setattr(archive_defn, "background_queue_size", 2)
+    monkeypatch.setattr(archive_handle, "writer", None)
+    monkeypatch.setattr(archive_handle, "pending", archive_handle.pending.__class__())
+    yield
+    archive_handle.flush()
+
+
+def test_submit_snapshots_arguments(background_writer, tmp_path):
+    arr = np.arange(10.0)
+    for i in range(5):
+        archive_handle.submit(np.save, str(tmp_path / f"arr{i}.npy"), arr)
+        arr += 1.0
+        assert len(archive_handle.pending) <= archive_defn.background_queue_size
+    archive_handle.flush()
+
+    assert len(archive_handle.pending) == 0
+    for i in range(5):
+        np.testing.assert_array_equal(np.load(tmp_path / f"arr{i}.npy"), np.arange(10.0) + i)
+
+
+def test_flush_raises_errors(background_writer, tmp_path):
+    archive_handle.submit(os.remove, str(tmp_path / "missing.ncf"))
+    archive_handle.submit(np.save, str(tmp_path / "arr.npy"), np.ones(3))
+
+    with pytest.raises(FileNotFoundError):
+        archive_handle.flush()
+    # tasks after the failure are still completed
+    assert (tmp_path / "arr.npy").exists()
+    assert len(archive_handle.pending) == 0
+
+
+def _write_archive_path(filename):
+    with open(filename, "w") as f:
+        f.write(archive_handle.get_archive_path())
+
+
+def test_flush_restarts_writer(background_writer, monkeypatch, tmp_path):
+    monkeypatch.setattr(archive_handle, "finished_setup", True)
+    monkeypatch.setattr(archive_handle, "archive_path", "first")
+    archive_handle.submit(_write_archive_path, str(tmp_path / "first.txt"))
+    archive_handle.flush()
+    assert archive_handle.writer is None
+
+    # tasks after a flush see the state at their submit, not the first one
+    monkeypatch.setattr(archive_handle, "archive_path", "second")
+    archive_handle.submit(_write_archive_path, str(tmp_path / "second.txt"))
+    archive_handle.flush()
+
+    assert (tmp_path / "first.txt").read_text() == "first"
+    assert (tmp_path / "second.txt").read_text() == "second"
+
+
+def test_setup_flushes(background_writer, monkeypatch, tmp_path):
+    monkeypatch.setattr(archive_handle, "finished_setup", False)
+    monkeypatch.setattr(archive_defn, "archive_path", str(tmp_path))
+    monkeypatch.setattr(archive_defn, "experiment", "second")
+    archive_handle.submit(np.save, str(tmp_path / "arr.npy"), np.ones(3))
+
+    archive_handle.setup()
+
+    # the tasks of the previous archive are finished, the next submit forks a new writer
+    assert (tmp_path / "arr.npy").exists()
+    assert archive_handle.writer is None
+    assert len(archive_handle.pending) == 0
+
+
+def test_submit_without_background(monkeypatch, tmp_path):
+    monkeypatch.setattr(archive_defn, "background_archive", False)
+    monkeypatch.setattr(archive_handle, "writer", None)
+
+    archive_handle.submit(np.save, str(tmp_path / "arr.npy"), np.ones(3))
+
+    assert (tmp_path / "arr.npy").exists()
+    assert archive_handle.writer is None
@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+
+from openmethane.fourdvar.util import bcon_region
+
+
+def _inject_slices(bcon_val, nlays, nrows, ncols, up_lay):
+    # Reference implementation using the original per-region slices
+    bshape = (bcon_val.shape[0], 1, 1)
+    arr = np.zeros((bcon_val.shape[0], nlays, nrows, ncols))
+    arr[:, :up_lay, 0, 1:] = bcon_val[:, 0].reshape(bshape)
+    arr[:, up_lay:, 0, 1:] = bcon_val[:, 1].reshape(bshape)
+    arr[:, :up_lay, 1:, ncols - 1] = bcon_val[:, 2].reshape(bshape)
+    arr[:, up_lay:, 1:, ncols - 1] = bcon_val[:, 3].reshape(bshape)
+    arr[:, :up_lay, nrows - 1, :-1] = bcon_val[:, 4].reshape(bshape)
+    arr[:, up_lay:, nrows - 1, :-1] = bcon_val[:, 5].reshape(bshape)
+    arr[:, :up_lay, :-1, 0] = bcon_val[:, 6].reshape(bshape)
+    arr[:, up_lay:, :-1, 0] = bcon_val[:, 7].reshape(bshape)
+    return arr
+
+
+@pytest.mark.parametrize("shape", [(32, 10, 10, 15), (5, 4, 7, 2), (3, 2, 2, 1)])
+def test_inject_matches_slices(shape):
+    nlays, nrows, ncols, up_lay = shape
+    rng = np.random.default_rng(0)
+    bcon_val = rng.normal(size=(25, 8))
+
+    region_index = bcon_region.build_region_index(nlays, nrows, ncols, up_lay)
+
+    np.testing.assert_array_equal(
+        region_index.inject(bcon_val), _inject_slices(bcon_val, nlays, nrows, ncols, up_lay)
+    )
+
+
+@pytest.mark.parametrize("shape", [(32, 10, 10, 15), (5, 4, 7, 2), (3, 2, 2, 1)])
+def test_inject_aggregate_adjoint(shape):
+    nlays, nrows, ncols, up_lay = shape
+    rng = np.random.default_rng(1)
+    bcon_val = rng.normal(size=(6, 8))
+    grid_val = rng.normal(size=(6, nlays, nrows, ncols))
+
+    region_index = bcon_region.build_region_index(nlays, nrows, ncols, up_lay)
+
+    lhs = (region_index.inject(bcon_val) * grid_val).sum()
+    rhs = (bcon_val * region_index.aggregate(grid_val)).sum()
+    np.testing.assert_allclose(lhs, rhs, rtol=1e-12)
+
+
+def test_regions_do_not_overlap():
+    region_index = bcon_region.build_region_index(4, 6, 5, 2)
+
+    assert len(np.unique(region_index.index)) == len(region_index.index)
+    # every boundary column appears once per layer
+    assert len(region_index.index) == 4 * (2 * (6 - 1) + 2 * (5 - 1))
+
+
+def test_get_region_index_cached():
+    assert bcon_region.get_region_index(32, 10, 10, 15) is bcon_region.get_region_index(
+        np.int32(32), 10, 10, 15
+    )
@@ -0,0 +1,69 @@
+import netCDF4
+import numpy as np
+import pytest
+
+from openmethane.fourdvar.util import cluster_map
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cluster_map.get_cluster_map.cache_clear()
+    yield
+    cluster_map.get_cluster_map.cache_clear()
+
+
+def test_block():
+    clusters = cluster_map.get_cluster_map("block:2x3", 5, 7)
+
+    # 3 block rows by 3 block columns, smaller at the edges
+    assert clusters.nclusters == 9
+    assert clusters.label[0, :].tolist() == [0, 0, 0, 1, 1, 1, 2]
+    assert clusters.label[:, 0].tolist() == [0, 0, 3, 3, 6]
+    assert clusters.size.sum() == 35
+    assert clusters.size[0] == 6
+    assert clusters.size[8] == 1
+
+
+def test_empty():
+    assert cluster_map.get_cluster_map("", 5, 7) is None
+
+
+def test_expand_aggregate():
+    clusters = cluster_map.get_cluster_map("block:2x2", 4, 6)
+    rng = np.random.default_rng(0)
+    values = rng.normal(size=(3, 2, clusters.nclusters))
+    grid = rng.normal(size=(3, 2, 4, 6))
+
+    expanded = clusters.expand(values)
+
+    assert expanded.shape == grid.shape
+    np.testing.assert_allclose(clusters.mean(expanded), values)
+    # aggregate is the adjoint of expand
+    np.testing.assert_allclose(
+        (expanded * grid).sum(), (values * clusters.aggregate(grid)).sum()
+    )
+
+
+def test_landuse(target_environment, test_data_dir):
+    target_environment("docker-test", overrides={"MET_DIR": str(test_data_dir / "mcip")})
+
+    clusters = cluster_map.get_cluster_map("landuse", 10, 10)
+
+    # the test domain has land use categories 8, 9 and 10
+    assert clusters.nclusters == 3
+    assert clusters.size.sum() == 100
+
+
+def test_file(tmp_path):
+    label = np.array([[5, 5, -1], [2, 2, 5]])
+    filepath = str(tmp_path / "clusters.nc")
+    with netCDF4.Dataset(filepath, "w") as ds:
+        ds.createDimension("ROW", 2)
+        ds.createDimension("COL", 3)
+        ds.createVariable("CLUSTER", "i4", ("ROW", "COL"))[:] = label
+
+    clusters = cluster_map.get_cluster_map(filepath, 2, 3)
+
+    assert clusters.label.tolist() == [[2, 2, 0], [1, 1, 2]]
+    with pytest.raises(AssertionError, match="does not match the grid"):
+        cluster_map.get_cluster_map(filepath, 3, 2)
@@ -0,0 +1,245 @@
+import datetime
+import json
+import os
+import sys
+import threading
+
+import pytest
+
+from openmethane.fourdvar.params import cmaq_config
+from openmethane.fourdvar.util import cmaq_handle
+
+
+@pytest.fixture
+def run_environment(target_environment, tmp_path, monkeypatch):
+    target_environment("docker-test", overrides={"STORE_PATH": str(tmp_path)})
+    monkeypatch.setattr(cmaq_handle, "run_env_cache", {})
+
+    calls = []
+    get_attr = cmaq_handle.ncf.get_attr
+
+    def counting_get_attr(*args, **kwargs):
+        calls.append(args)
+        return get_attr(*args, **kwargs)
+
+    monkeypatch.setattr(cmaq_handle.ncf, "get_attr", counting_get_attr)
+    return calls
+
+
+def test_setup_run_is_cached(run_environment):
+    env_dict = cmaq_handle.setup_run()
+    n_reads = len(run_environment)
+    assert n_reads > 0
+
+    env_dict["PERTCOLS"] = "changed"
+    bwd_dict = cmaq_handle.setup_bwd_run()
+    assert cmaq_handle.setup_run() == {k: v for k, v in env_dict.items() if k != "PERTCOLS"}
+    assert cmaq_handle.setup_bwd_run() == bwd_dict
+    # bwd templates are read once, the shared environment is not read again
+    assert len(run_environment) == n_reads + 2
+
+
+def test_setup_run_config_change(run_environment, monkeypatch):
+    env_dict = cmaq_handle.setup_run()
+    assert env_dict["CTM_MAXSYNC"] == str(cmaq_config.maxsync)
+
+    monkeypatch.setattr(cmaq_config, "maxsync", cmaq_config.maxsync + 1)
+
+    assert cmaq_handle.setup_run()["CTM_MAXSYNC"] == str(cmaq_config.maxsync)
+
+
+def test_setup_run_threads(run_environment):
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(cmaq_handle.setup_bwd_run()))
+        for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(results) == 8
+    assert all(r == results[0] for r in results)
+    assert len({id(r) for r in results}) == 8
+
+
+def test_parse_env_dict(run_environment):
+    env_dict = cmaq_handle.setup_bwd_run()
+    date = datetime.date(2022, 12, 7)
+
+    parsed = cmaq_handle.parse_env_dict(env_dict, date)
+
+    assert not any("<" in value for value in parsed.values())
+    assert parsed["CTM_MAXSYNC"] == env_dict["CTM_MAXSYNC"]
+
+
+@pytest.fixture
+def output_files(run_environment, monkeypatch):
+    monkeypatch.setattr(cmaq_handle, "manifest", None)
+    recorded = cmaq_handle.dt.replace_date(cmaq_config.conc_file, datetime.date(2022, 12, 7))
+    other = cmaq_handle.dt.replace_date(cmaq_config.conc_file, datetime.date(2022, 12, 8))
+    for fname in (recorded, other):
+        cmaq_handle.fh.ensure_path(fname, inc_file=True)
+        with open(fname, "w") as f:
+            f.write("data")
+    return recorded, other
+
+
+def test_wipeout_uses_manifest(output_files):
+    recorded, other = output_files
+    cmaq_handle.record_outputs("fwd", cmaq_config.wipeout_fwd_list, datetime.date(2022, 12, 7))
+    assert recorded in cmaq_handle.get_manifest()["fwd"]
+
+    cmaq_handle.wipeout_fwd()
+
+    # only files recorded in the manifest are removed, nothing is searched for
+    assert not os.path.exists(recorded)
+    assert os.path.exists(other)
+    with open(cmaq_config.manifest_file) as f:
+        assert json.load(f)["fwd"] == []
+
+
+def test_wipeout_without_manifest(output_files):
+    recorded, other = output_files
+
+    cmaq_handle.wipeout_fwd()
+
+    assert not os.path.exists(recorded)
+    assert not os.path.exists(other)
+    assert cmaq_handle.get_manifest() == {"fwd": {}}
+
+
+def test_wipeout_manifest_persists(output_files, monkeypatch):
+    recorded, _ = output_files
+    cmaq_handle.record_outputs("bwd", [cmaq_config.conc_file], datetime.date(2022, 12, 7))
+    # a new process reads the manifest from disk
+    monkeypatch.setattr(cmaq_handle, "manifest", None)
+
+    cmaq_handle.wipeout_bwd()
+
+    assert not os.path.exists(recorded)
+
+
+STUB_MODEL = """
+import os
+import sys
+
+stub_dir = os.environ["STUB_DIR"]
+date = os.environ["CTM_STDATE"]
+run_type = "bwd" if "ADJ_LGRID" in os.environ else "fwd"
+with open(os.path.join(stub_dir, "calls.txt"), "a") as f:
+    f.write(f"{run_type} {date}\\n")
+
+fail_file = os.path.join(stub_dir, "failures")
+if date == os.environ.get("STUB_FAIL_DATE") and os.path.exists(fail_file):
+    with open(fail_file) as f:
+        failures = int(f.read())
+    if failures > 0:
+        with open(fail_file, "w") as f:
+            f.write(str(failures - 1))
+        sys.exit(1)
+
+outputs = ["ADJ_LGRID", "ADJ_LGRID_EM"] if run_type == "bwd" else ["CTM_CONC_1", "S_CGRID"]
+for name in outputs:
+    path = os.environ[name].split()[0]
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write(f"{run_type} {date}")
+"""
+
+
+@pytest.fixture
+def stub_model(target_environment, tmp_path, monkeypatch):
+    target_environment(
+        "docker-test",
+        overrides={"STORE_PATH": str(tmp_path), "END_DATE": "2022-12-09", "CMAQ_RESUME": "true"},
+    )
+    for name in ("run_env_cache", "manifest", "progress"):
+        monkeypatch.setattr(cmaq_handle, name, {} if name == "run_env_cache" else None)
+
+    stub_dir = tmp_path / "stub"
+    stub_dir.mkdir()
+    (stub_dir / "model.py").write_text(STUB_MODEL)
+    executable = stub_dir / "model"
+    executable.write_text(f"#!/bin/sh\nexec {sys.executable} {stub_dir / 'model.py'}\n")
+    executable.chmod(0o755)
+
+    monkeypatch.setenv("STUB_DIR", str(stub_dir))
+    monkeypatch.setattr(cmaq_config, "cmd_shell", "/bin/sh")
+    monkeypatch.setattr(cmaq_config, "fwd_prog", str(executable))
+    monkeypatch.setattr(cmaq_config, "bwd_prog", str(executable))
+    monkeypatch.setattr(cmaq_config, "emis_file", str(tmp_path / "emis.<YYYYMMDD>.nc"))
+    monkeypatch.setattr(cmaq_config, "force_file", str(tmp_path / "force.<YYYYMMDD>.nc"))
+    for day in ("20221207", "20221208", "20221209"):
+        (tmp_path / f"emis.{day}.nc").write_text(f"emis {day}")
+        (tmp_path / f"force.{day}.nc").write_text(f"force {day}")
+
+    def fail(date, count):
+        monkeypatch.setenv("STUB_FAIL_DATE", date)
+        (stub_dir / "failures").write_text(str(count))
+
+    def calls():
+        lines = (stub_dir / "calls.txt").read_text().splitlines()
+        (stub_dir / "calls.txt").unlink()
+        return lines
+
+    return fail, calls
+
+
+def test_run_fwd_resumes_failed_day(stub_model):
+    fail, calls = stub_model
+    fail("2022342", 1)
+
+    with pytest.raises(ValueError, match="failed for 20221208"):
+        cmaq_handle.run_fwd()
+    assert calls() == ["fwd 2022341", "fwd 2022342"]
+
+    cmaq_handle.wipeout_fwd(keep_progress=True)
+    cmaq_handle.run_fwd()
+    assert calls() == ["fwd 2022342", "fwd 2022343"]
+
+
+def test_run_fwd_retries(stub_model, monkeypatch):
+    fail, calls = stub_model
+    fail("2022342", 2)
+    monkeypatch.setattr(cmaq_config, "run_retries", 2)
+    delays = []
+    monkeypatch.setattr(cmaq_handle.time, "sleep", delays.append)
+
+    cmaq_handle.run_fwd()
+
+    assert calls() == ["fwd 2022341", "fwd 2022342", "fwd 2022342", "fwd 2022342", "fwd 2022343"]
+    assert delays == [cmaq_config.retry_delay, 2 * cmaq_config.retry_delay]
+
+
+def test_run_fwd_changed_inputs(stub_model, tmp_path):
+    _, calls = stub_model
+    cmaq_handle.run_fwd()
+    calls()
+
+    (tmp_path / "emis.20221208.nc").write_text("changed")
+    cmaq_handle.wipeout_fwd(keep_progress=True)
+    cmaq_handle.run_fwd()
+
+    # later days depend on the changed day
+    assert calls() == ["fwd 2022342", "fwd 2022343"]
+
+
+def test_run_bwd_resume(stub_model, tmp_path):
+    _, calls = stub_model
+    cmaq_handle.run_fwd()
+    cmaq_handle.run_bwd()
+    calls()
+
+    (tmp_path / "force.20221208.nc").write_text("changed")
+    cmaq_handle.wipeout_bwd(keep_progress=True)
+    cmaq_handle.run_bwd()
+    # bwd runs in reverse, so earlier days depend on the changed day
+    assert calls() == ["bwd 2022342", "bwd 2022341"]
+
+    cmaq_handle.wipeout_fwd()
+    cmaq_handle.wipeout_bwd()
+    cmaq_handle.run_fwd()
+    cmaq_handle.run_bwd()
+    assert len(calls()) == 6
@@ -0,0 +1,63 @@
+import json
+
+import numpy as np
+import pytest
+
+from openmethane.fourdvar.util.convergence import ConvergenceMonitor
+
+
+def test_disabled():
+    monitor = ConvergenceMonitor(maxiter=10)
+    monitor.start(np.zeros(2), 10.0, np.ones(2))
+
+    assert not monitor.enabled
+    assert monitor.update(np.ones(2), 10.0, np.zeros(2)) is False
+    assert monitor.decision is None
+    assert monitor.hours_saved == 0.0
+
+
+def test_metrics():
+    monitor = ConvergenceMonitor(maxiter=10, bg_vector=np.zeros(2))
+    monitor.start(np.zeros(2), 10.0, np.array([3.0, 4.0]))
+
+    monitor.update(np.array([3.0, 4.0]), 8.0, np.array([0.3, 0.4]))
+    monitor.update(np.array([3.0, 4.5]), 7.5, None)
+
+    first, second = monitor.records
+    assert first["cost_reduction"] == pytest.approx(0.2)
+    assert first["grad_reduction"] == pytest.approx(0.1)
+    assert first["step_ratio"] == pytest.approx(1.0)
+    assert second["cost_reduction"] == pytest.approx(0.5 / 8)
+    assert second["grad_reduction"] is None
+    assert second["step_ratio"] == pytest.approx(0.5 / np.hypot(3, 4.5))
+
+
+def test_projected_gradient():
+    # the first unknown is at its lower bound & pushed below it
+    monitor = ConvergenceMonitor(maxiter=10, lower=np.array([0.0, -np.inf]))
+    gradient = monitor.projected_gradient(np.array([0.0, 1.0]), np.array([2.0, 1.0]))
+    np.testing.assert_allclose(gradient, [0.0, 1.0])
+    gradient = monitor.projected_gradient(np.array([0.0, 1.0]), np.array([-2.0, 1.0]))
+    np.testing.assert_allclose(gradient, [-2.0, 1.0])
+
+
+def test_patience(tmp_path):
+    monitor = ConvergenceMonitor(maxiter=10, cost_reduction=0.01, patience=2)
+    monitor.start(np.zeros(1), 100.0, np.ones(1))
+
+    assert monitor.update(np.zeros(1), 99.5, None) is False
+    # a large reduction resets the count
+    assert monitor.update(np.zeros(1), 90.0, None) is False
+    assert monitor.update(np.zeros(1), 89.9, None) is False
+    assert monitor.update(np.zeros(1), 89.8, None) is True
+    assert monitor.decision.startswith("cost_reduction")
+    # the 6 iterations not run, at the mean iteration time
+    mean_seconds = np.mean([record["seconds"] for record in monitor.records])
+    assert monitor.hours_saved == pytest.approx(6 * mean_seconds / 3600)
+
+    monitor.write(str(tmp_path / "convergence.json"))
+    with open(tmp_path / "convergence.json") as f:
+        saved = json.load(f)
+    assert saved["decision"] == monitor.decision
+    assert len(saved["iterations"]) == 4
+    assert saved["thresholds"]["maxiter"] == 10
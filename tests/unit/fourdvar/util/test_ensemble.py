@@ -0,0 +1,76 @@
+import os
+
+import numpy as np
+
+import openmethane.fourdvar.datadef as d
+from openmethane.fourdvar._transform import transform
+from openmethane.fourdvar.params import cmaq_config
+from openmethane.fourdvar.util import ensemble
+
+
+def test_workspace_config(target_environment, tmp_path):
+    target_environment(
+        "docker-test",
+        overrides={"STORE_PATH": str(tmp_path), "EMIS_FILE": "/elsewhere/emis.<YYYYMMDD>.nc"},
+    )
+    member_path = ensemble.get_member_path(3)
+
+    config = ensemble.get_workspace_config(member_path)
+
+    assert member_path == os.path.join(cmaq_config.cmaq_base, "ensemble", "member_003")
+    assert config["conc_file"] == os.path.join(member_path, "output", "CONC.<YYYYMMDD>.nc")
+    assert config["chem_chk"] == os.path.join(member_path, "chkpnt", "CHEM_CHK.<YYYYMMDD>.nc")
+    assert config["progress_file"] == os.path.join(member_path, "run_progress.json")
+    assert config["emis_file"] == os.path.join(member_path, "emissions", "emis.<YYYYMMDD>.nc")
+    assert config["fwd_resume_check"][0] == config["conc_file"]
+    assert config["cwd_logs"][0] == os.path.join(member_path, "CTM_LOG_*")
+    # shared inputs are unchanged
+    for name in ("icon_file", "bcon_file", "griddesc", "ensemble_path"):
+        assert name not in config
+
+
+def test_get_max_parallel(target_environment, monkeypatch):
+    target_environment("docker-test")
+    monkeypatch.setattr(cmaq_config, "ensemble_slots", 8)
+    assert ensemble.get_max_parallel(2) == 2
+    assert ensemble.get_max_parallel(20) == 8
+
+    monkeypatch.setattr(cmaq_config, "npcol", 2)
+    monkeypatch.setattr(cmaq_config, "nprow", 2)
+    assert ensemble.get_max_parallel(20) == 2
+    monkeypatch.setattr(cmaq_config, "ensemble_slots", 3)
+    assert ensemble.get_max_parallel(20) == 1
+
+
+def test_run_ensemble_workspaces(target_environment, tmp_path, monkeypatch):
+    target_environment("docker-test", overrides={"STORE_PATH": str(tmp_path)})
+    monkeypatch.setattr(cmaq_config, "ensemble_slots", 8)
+
+    # concurrent members share the parent directories of their workspaces
+    for _ in range(5):
+        result = ensemble.run_ensemble(os.getcwd, [()] * 8)
+
+    assert result == [os.path.realpath(ensemble.get_member_path(i)) for i in range(8)]
+
+
+def test_run_forward(local_prior, monkeypatch):
+    monkeypatch.setattr(cmaq_config, "ensemble_slots", 2)
+    prior = d.PhysicalData.from_file(local_prior)
+    double = d.PhysicalData.from_file(local_prior)
+    double.emis["CH4"] *= 2.0
+
+    outputs = ensemble.run_forward([prior, double])
+
+    assert len(set(os.path.dirname(o.file_data["conc.20221207"]["actual"]) for o in outputs)) == 2
+    # no files were written in the main workspace
+    assert not os.path.exists(cmaq_config.output_path)
+
+    # results match a run in the main workspace
+    serial = transform(transform(double, d.ModelInputData), d.ModelOutputData)
+    for label in serial.file_data:
+        np.testing.assert_array_equal(
+            outputs[1].get_variable(label, "CH4"), serial.get_variable(label, "CH4")
+        )
+        assert not np.array_equal(
+            outputs[0].get_variable(label, "CH4"), serial.get_variable(label, "CH4")
+        )
@@ -0,0 +1,167 @@
+import os
+
+import numpy as np
+import pytest
+
+from openmethane.fourdvar.datadef import ModelOutputData, SensitivityData
+from openmethane.fourdvar.params import cmaq_config, data_access, template_defn
+from openmethane.fourdvar.transfunc.map_sense import get_unit_convert_emis
+from openmethane.fourdvar.util import cmaq_handle, local_cmaq
+from openmethane.fourdvar.util import date_handle as dt
+from openmethane.fourdvar.util import netcdf_handle as ncf
+from openmethane.fourdvar.util.file_handle import ensure_path
+
+
+def random_emis(rng):
+    emis = {}
+    for date in dt.get_datelist():
+        shape = ncf.get_variable(dt.replace_date(template_defn.emis, date), "CH4").shape
+        emis[date] = rng.uniform(size=shape)
+    return emis
+
+
+def write_emis(emis):
+    for date, values in emis.items():
+        ensure_path(dt.replace_date(cmaq_config.emis_file, date), inc_file=True)
+        ncf.create_from_template(
+            dt.replace_date(template_defn.emis, date),
+            dt.replace_date(cmaq_config.emis_file, date),
+            var_change={"CH4": values},
+        )
+
+
+def write_forcing(rng):
+    force = {}
+    for date in dt.get_datelist():
+        values = rng.normal(size=ncf.get_variable(template_defn.force, "CH4").shape)
+        ensure_path(dt.replace_date(cmaq_config.force_file, date), inc_file=True)
+        ncf.create_from_template(
+            template_defn.force,
+            dt.replace_date(cmaq_config.force_file, date),
+            var_change={"CH4": values},
+            date=date,
+        )
+        force[date] = values
+    return force
+
+
+def get_conc():
+    model_output = ModelOutputData()
+    return {
+        date: model_output.get_variable(f"conc.{date:%Y%m%d}", "CH4")
+        for date in dt.get_datelist()
+    }
+
+
+def test_outputs_match_templates(local_model):
+    write_emis(random_emis(np.random.default_rng(0)))
+    cmaq_handle.run_fwd()
+    conc = get_conc()
+
+    first, second = dt.get_datelist()
+    icon = ncf.get_variable(cmaq_config.icon_file, "CH4")
+    np.testing.assert_allclose(conc[first][0], icon[0])
+    # emissions only increase the concentration without transport
+    assert (np.diff(conc[first], axis=0) >= 0).all()
+    # the second day starts from the final concentration of the first
+    np.testing.assert_allclose(conc[second][0], conc[first][-1])
+
+    write_forcing(np.random.default_rng(1))
+    cmaq_handle.run_bwd()
+    SensitivityData()
+
+
+@pytest.mark.parametrize("courant, decay", [("0 0", 0.0), ("0.4 -0.7", 1e-5)])
+def test_adjoint_dot_product(local_model, monkeypatch, courant, decay):
+    monkeypatch.setattr(cmaq_config, "local_courant", courant)
+    monkeypatch.setattr(cmaq_config, "local_decay", decay)
+    rng = np.random.default_rng(0)
+
+    emis = random_emis(rng)
+    write_emis(emis)
+    cmaq_handle.run_fwd()
+    base = get_conc()
+
+    pert = random_emis(rng)
+    write_emis({date: emis[date] + pert[date] for date in emis})
+    cmaq_handle.run_fwd()
+    conc = get_conc()
+
+    force = write_forcing(rng)
+    cmaq_handle.run_bwd()
+    sensitivity = SensitivityData()
+
+    # the model is linear, so the forcing applied to the change in concentration
+    # must match the sensitivity applied to the change in emissions
+    unit = get_unit_convert_emis()
+    force_score = 0.0
+    sense_score = 0.0
+    for date in dt.get_datelist():
+        force_score += (force[date] * (conc[date] - base[date])).sum()
+        sense = sensitivity.get_variable(f"emis.{date:%Y%m%d}", "CH4")
+        sense_score += (sense * unit[f"units.{date:%Y%m%d}"] * pert[date]).sum()
+    np.testing.assert_allclose(sense_score, force_score, rtol=1e-4)
+
+
+def test_trim_to_last_observation(local_model, monkeypatch):
+    monkeypatch.setattr(cmaq_config, "local_courant", "0.4 -0.7")
+    rng = np.random.default_rng(0)
+    first, second = dt.get_datelist()
+    write_emis(random_emis(rng))
+    force = write_forcing(rng)
+    # no observations on the last day
+    ncf.create_from_template(
+        template_defn.force,
+        dt.replace_date(cmaq_config.force_file, second),
+        var_change={"CH4": np.zeros_like(force[second])},
+        date=second,
+    )
+    cmaq_handle.run_fwd()
+    cmaq_handle.run_bwd()
+    full_conc = ModelOutputData().get_variable(f"conc.{first:%Y%m%d}", "CH4")
+    full_sense = SensitivityData()
+    cmaq_handle.wipeout_fwd()
+    cmaq_handle.wipeout_bwd()
+
+    monkeypatch.setattr(data_access, "model_end_date", first)
+    cmaq_handle.run_fwd()
+    cmaq_handle.run_bwd()
+
+    assert not os.path.exists(dt.replace_date(cmaq_config.conc_file, second))
+    model_output = ModelOutputData()
+    assert list(model_output.file_data.keys()) == [f"conc.{first:%Y%m%d}"]
+    np.testing.assert_array_equal(
+        model_output.get_variable(f"conc.{first:%Y%m%d}", "CH4"), full_conc
+    )
+    sensitivity = SensitivityData()
+    for label in sensitivity.file_data.keys():
+        np.testing.assert_array_equal(
+            sensitivity.get_variable(label, "CH4"), full_sense.get_variable(label, "CH4")
+        )
+    assert (sensitivity.get_variable(f"emis.{second:%Y%m%d}", "CH4") == 0).all()
+
+
+def test_transport_adjoint():
+    rng = np.random.default_rng(0)
+    transport = local_cmaq.Transport(courant_x=-0.3, courant_y=0.8, decay=0.9)
+    conc = rng.normal(size=(3, 4, 5))
+    sense = rng.normal(size=(3, 4, 5))
+    zero_boundary = np.zeros((3, 6, 7))
+
+    forward = transport.forward(conc, zero_boundary)
+    np.testing.assert_allclose((forward * sense).sum(), (conc * transport.adjoint(sense)).sum())
+
+
+def test_perimeter_to_ghost():
+    nrows, ncols = 3, 4
+    perim = np.arange(2 * (nrows + ncols + 2), dtype=float).reshape((1, -1))
+
+    ghost = local_cmaq.perimeter_to_ghost(perim, nrows, ncols)
+
+    # every perimeter value is placed in a distinct cell of the outer ring
+    ring = np.ones((nrows + 2, ncols + 2), dtype=bool)
+    ring[1:-1, 1:-1] = False
+    assert sorted(ghost[0][ring]) == list(perim[0])
+    # south starts next to the south-west corner, west starts at the corner
+    assert ghost[0, 0, 1] == perim[0, 0]
+    assert ghost[0, 0, 0] == perim[0, 2 * ncols + nrows + 3]
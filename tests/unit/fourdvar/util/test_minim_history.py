@@ -0,0 +1,79 @@
+import numpy as np
+from scipy.optimize import fmin_l_bfgs_b, rosen, rosen_der
+
+from openmethane.fourdvar.util.minim_history import MinimHistory
+
+
+class CountedRosen:
+    def __init__(self):
+        self.ncost = 0
+        self.ngrad = 0
+
+    def cost(self, vector):
+        self.ncost += 1
+        return rosen(vector)
+
+    def gradient(self, vector):
+        self.ngrad += 1
+        return rosen_der(vector)
+
+
+def run_minim(history, func, init_guess, maxiter):
+    # same pattern as user_driver.minim
+    cost, gradient = history.wrap(func.cost, func.gradient)
+    cost(init_guess)
+    gradient(init_guess)
+    replayed = []
+
+    def callback(vector):
+        replayed.append(history.record_iteration(vector))
+
+    result = fmin_l_bfgs_b(
+        cost, init_guess, fprime=gradient, callback=callback, maxiter=maxiter, m=history.maxcor
+    )
+    return result, replayed
+
+
+def test_resume_matches_uninterrupted(tmp_path):
+    init_guess = np.linspace(-1.5, 1.5, 8)
+    full_func = CountedRosen()
+    full, _ = run_minim(MinimHistory(tmp_path / "full"), full_func, init_guess, 30)
+
+    run_minim(MinimHistory(tmp_path / "resume"), CountedRosen(), init_guess, 12)
+    history = MinimHistory.load(tmp_path / "resume")
+    with np.load(tmp_path / "resume" / "lbfgs_state.npz") as state:
+        neval = int(state["neval"])
+    np.testing.assert_array_equal(history.x0, init_guess)
+    assert history.replay_iterations == 12
+
+    func = CountedRosen()
+    resumed, replayed = run_minim(history, func, init_guess, 30)
+
+    # identical to a single run, without repeating the first 12 iterations
+    np.testing.assert_array_equal(resumed[0], full[0])
+    assert resumed[2]["nit"] == full[2]["nit"]
+    assert replayed[:12] == [True] * 12
+    assert not any(replayed[12:])
+    assert func.ncost == full_func.ncost - neval
+    assert func.ngrad == func.ncost
+
+
+def test_saved_state(tmp_path):
+    history = MinimHistory(tmp_path, maxcor=3)
+    init_guess = np.linspace(-1.5, 1.5, 8)
+    run_minim(history, CountedRosen(), init_guess, 6)
+
+    with np.load(tmp_path / "lbfgs_state.npz") as state:
+        assert len(state["iter_index"]) == 6
+        assert len(state["cost"]) == 7
+        assert state["cost"][0] == rosen(init_guess)
+        np.testing.assert_allclose(state["gradient_norm"][0], np.linalg.norm(rosen_der(init_guess)))
+        s, y = state["s"], state["y"]
+        iter_index = state["iter_index"]
+    assert s.shape == y.shape == (3, 8)
+    assert ((s * y).sum(axis=1) > 0).all()
+    # the most recent pair is the last step of the minimizer
+    with np.load(tmp_path / f"eval{iter_index[-1]:05d}.npz") as last:
+        with np.load(tmp_path / f"eval{iter_index[-2]:05d}.npz") as prev:
+            np.testing.assert_array_equal(s[-1], last["x"] - prev["x"])
+            np.testing.assert_array_equal(y[-1], last["gradient"] - prev["gradient"])
@@ -0,0 +1,130 @@
+import datetime
+import os
+import shutil
+import tracemalloc
+
+import netCDF4
+import numpy as np
+import pytest
+
+from openmethane.fourdvar.params import archive_defn
+from openmethane.fourdvar.util import netcdf_handle
+
+
+@pytest.fixture
+def emis_template(test_data_dir):
+    return str(test_data_dir / "templates" / "record" / "emis_record_2022-12-07.nc")
+
+
+def _reference(source, dest, var_change, date=None):
+    # previous implementation: copy the whole template then overwrite the data
+    shutil.copyfile(source, dest)
+    with netCDF4.Dataset(dest, "a") as ncf_file:
+        for var, data in var_change.items():
+            ncf_file.variables[var][:] = data
+        if date is not None:
+            netcdf_handle.set_date(ncf_file, date)
+
+
+def _assert_same_file(expected, actual):
+    with netCDF4.Dataset(expected) as exp, netCDF4.Dataset(actual) as act:
+        assert act.data_model == exp.data_model
+        assert act.ncattrs() == exp.ncattrs()
+        for name in exp.ncattrs():
+            np.testing.assert_array_equal(act.getncattr(name), exp.getncattr(name))
+        assert {k: len(v) for k, v in act.dimensions.items()} == {
+            k: len(v) for k, v in exp.dimensions.items()
+        }
+        for name, var in exp.variables.items():
+            out = act.variables[name]
+            assert out.ncattrs() == var.ncattrs()
+            assert out.filters() == var.filters()
+            assert out.chunking() == var.chunking()
+            np.testing.assert_array_equal(out[:], var[:])
+
+
+def test_create_from_template(emis_template, tmp_path):
+    shape = netcdf_handle.get_variable(emis_template, "CH4").shape
+    var_change = {"CH4": np.random.default_rng(0).normal(size=shape)}
+    date = datetime.date(2022, 12, 8)
+
+    netcdf_handle.create_from_template(
+        emis_template, str(tmp_path / "actual.nc"), var_change=var_change, date=date
+    )
+    _reference(emis_template, str(tmp_path / "expected.nc"), var_change, date=date)
+
+    _assert_same_file(str(tmp_path / "expected.nc"), str(tmp_path / "actual.nc"))
+
+
+def test_create_from_template_add(emis_template, tmp_path):
+    orig = netcdf_handle.get_variable(emis_template, "CH4")
+    change = np.ones(orig.shape)
+
+    netcdf_handle.create_from_template(
+        emis_template, str(tmp_path / "actual.nc"), var_change={"CH4": change}, overwrite=False
+    )
+
+    np.testing.assert_allclose(
+        netcdf_handle.get_variable(str(tmp_path / "actual.nc"), "CH4"), orig + change, rtol=1e-6
+    )
+
+
+def test_create_from_template_records(test_data_dir, tmp_path):
+    template = str(test_data_dir / "templates" / "force_template.nc")
+    shape = netcdf_handle.get_variable(template, "CH4").shape
+    data = np.random.default_rng(0).normal(size=(2, *shape[1:]))
+    dense = np.zeros(shape)
+    dense[[3, 7]] = data
+
+    netcdf_handle.create_from_template_records(
+        template, str(tmp_path / "actual.nc"), [3, 7], var_change={"CH4": data}
+    )
+    _reference(template, str(tmp_path / "expected.nc"), {"CH4": dense})
+
+    _assert_same_file(str(tmp_path / "expected.nc"), str(tmp_path / "actual.nc"))
+
+
+def test_create_from_template_records_in_blocks(tmp_path, monkeypatch):
+    template = str(tmp_path / "template.nc")
+    with netCDF4.Dataset(template, "w") as ncf_file:
+        ncf_file.createDimension("TSTEP", None)
+        ncf_file.createDimension("ROW", 500)
+        ncf_file.createDimension("COL", 500)
+        var = ncf_file.createVariable("CH4", "f4", ("TSTEP", "ROW", "COL"))
+        for tstep in range(40):
+            var[tstep] = np.full((500, 500), tstep, dtype="f4")
+    monkeypatch.setattr(netcdf_handle, "copy_block_bytes", 4 * 500 * 500)
+    data = np.full((2, 500, 500), -1.0)
+
+    # the variable is 40 MB, only a few records at a time may be held in memory
+    tracemalloc.start()
+    netcdf_handle.create_from_template_records(
+        template, str(tmp_path / "actual.nc"), [3, 7], var_change={"CH4": data}
+    )
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    assert peak < 5 * 4 * 500 * 500 + data.nbytes
+
+    result = netcdf_handle.get_variable(str(tmp_path / "actual.nc"), "CH4")
+    expected = np.arange(40.0)
+    expected[[3, 7]] = -1.0
+    np.testing.assert_array_equal(result[:, 0, 0], expected)
+
+
+@pytest.mark.parametrize("mode", ["copy", "hardlink", "reflink"])
+def test_copy_unchanged(emis_template, tmp_path, monkeypatch, mode):
+    monkeypatch.setattr(archive_defn, "unchanged_copy_mode", mode)
+    source = str(tmp_path / "template.nc")
+    dest = str(tmp_path / "actual.nc")
+    shutil.copyfile(emis_template, source)
+    orig = netcdf_handle.get_variable(source, "CH4")
+
+    netcdf_handle.create_from_template(source, dest)
+    _assert_same_file(source, dest)
+    if mode == "hardlink":
+        assert os.path.samefile(source, dest)
+
+    # writing over a linked file must never modify the template
+    netcdf_handle.create_from_template(source, dest, var_change={"CH4": orig + 1.0})
+    np.testing.assert_array_equal(netcdf_handle.get_variable(source, "CH4"), orig)
+    np.testing.assert_allclose(netcdf_handle.get_variable(dest, "CH4"), orig + 1.0)
@@ -0,0 +1,97 @@
+import datetime
+
+import numpy as np
+import scipy.linalg
+
+from openmethane.fourdvar.util import obs_error
+
+
+def _meta():
+    start = datetime.datetime(2022, 12, 7, 3, 40)
+    rng = np.random.default_rng(0)
+    meta = []
+    # two orbits of 6 soundings a few seconds apart, then one lone sounding
+    for offset in (0, 100):
+        for i in range(6):
+            meta.append(
+                {
+                    "time": start + datetime.timedelta(minutes=offset, seconds=3 * i),
+                    "latitude_center": -25.0 + 0.05 * i + rng.normal(scale=0.01),
+                    "longitude_center": 150.0 + rng.normal(scale=0.05),
+                }
+            )
+    meta.append(
+        {
+            "time": start + datetime.timedelta(minutes=200),
+            "latitude_center": -25.0,
+            "longitude_center": 150.0,
+        }
+    )
+    # observations are not ordered by orbit
+    return [meta[i] for i in rng.permutation(len(meta))]
+
+
+def test_block_label():
+    meta = _meta()
+    orbit = obs_error.block_label(meta, "orbit")
+    assert np.bincount(orbit).tolist() == [6, 6, 1]
+
+    segment = obs_error.block_label(meta, "scanline:9")
+    assert sorted(np.bincount(segment).tolist()) == [1, 3, 3, 3, 3]
+    # segments never span orbits
+    assert all(len(set(orbit[segment == s])) == 1 for s in np.unique(segment))
+
+
+def test_weight():
+    meta = _meta()
+    uncertainty = np.random.default_rng(1).uniform(10, 20, size=len(meta))
+    blocks = obs_error.build_error_blocks(meta, uncertainty, "orbit", 10.0)
+    assert blocks.nblocks == 2
+
+    # dense block-diagonal covariance
+    label = obs_error.block_label(meta, "orbit")
+    lat = np.array([o["latitude_center"] for o in meta])
+    lon = np.array([o["longitude_center"] for o in meta])
+    correlation = (1 - obs_error.NUGGET) * np.exp(-obs_error.distance_km(lat, lon) / 10.0)
+    np.fill_diagonal(correlation, 1.0)
+    covariance = correlation * np.outer(uncertainty, uncertainty)
+    covariance[label[:, None] != label[None, :]] = 0.0
+
+    values = np.random.default_rng(2).normal(size=len(meta))
+    np.testing.assert_allclose(blocks.weight(values), np.linalg.solve(covariance, values))
+
+    # whitening is the inverse of a square root of the covariance
+    sqrt = scipy.linalg.inv(blocks.whiten(np.eye(len(meta))))
+    np.testing.assert_allclose(sqrt @ sqrt.T, covariance, atol=1e-8)
+
+
+def test_independent():
+    meta = _meta()
+    assert obs_error.build_error_blocks(meta, np.ones(len(meta)), "", 10.0) is None
+
+
+def test_colocated():
+    # repeated soundings of the same location need the nugget to be positive definite
+    meta = _meta()
+    meta.append(dict(meta[0]))
+    blocks = obs_error.build_error_blocks(meta, np.ones(len(meta)), "orbit", 10.0)
+    weighted = blocks.weight(np.ones(len(meta)))
+    assert np.isfinite(weighted).all()
+
+
+def test_split_blocks(monkeypatch):
+    meta = _meta()
+    label = obs_error.block_label(meta, "orbit")
+    times = np.array([o["time"] for o in meta])
+    blocks = obs_error.split_blocks(label, times, max_size=4)
+    assert sorted(len(block) for block in blocks) == [1, 3, 3, 3, 3]
+    # segments are consecutive soundings of one orbit
+    for block in blocks:
+        assert len(set(label[block])) == 1
+        assert (np.diff(times[block]) > datetime.timedelta(0)).all()
+        others = times[(label == label[block[0]]) & ~np.isin(np.arange(len(meta)), block)]
+        assert ((others < times[block].min()) | (others > times[block].max())).all()
+
+    monkeypatch.setattr(obs_error, "MAX_BLOCK_SIZE", 4)
+    uncertainty = np.ones(len(meta))
+    assert obs_error.build_error_blocks(meta, uncertainty, "orbit", 10.0).nblocks == 4
@@ -0,0 +1,140 @@
+import datetime
+
+import numpy as np
+import pytest
+from scipy.optimize import fmin_l_bfgs_b
+
+from openmethane.fourdvar.datadef.abstract._physical_abstract_data import PhysicalAbstractData
+from openmethane.fourdvar.params import date_defn, input_defn
+from openmethane.fourdvar.util import period_chain
+from openmethane.fourdvar.util.minim_history import MinimHistory
+from openmethane.fourdvar.util.period_chain import estimate_posterior, load_posterior, map_steps
+from openmethane.fourdvar.util.posterior_uncertainty import LowRankPosterior
+
+
+def test_map_steps_overlap():
+    # daily values of a 3 day period, mapped onto a 3 day period starting 2 days later
+    values = np.array([[1.0], [2.0], [3.0]])
+    start = datetime.date(2022, 7, 1)
+
+    result = map_steps(values, start, 1.0, datetime.date(2022, 7, 3), 3, 1.0)
+
+    # the first day is in both periods, the others take the mean of the previous period
+    np.testing.assert_allclose(result, [[3.0], [2.0], [2.0]])
+
+
+def test_map_steps_time_of_day():
+    # 12 hourly values of 2 days, mapped onto the next day
+    values = np.array([1.0, 10.0, 3.0, 20.0])
+    start = datetime.date(2022, 7, 1)
+
+    result = map_steps(values, start, 0.5, datetime.date(2022, 7, 3), 2, 0.5)
+
+    np.testing.assert_allclose(result, [2.0, 15.0])
+
+
+def test_map_steps_longer_steps():
+    # a single step covering the whole period, from daily steps half in the previous period
+    values = np.array([1.0, 3.0, 5.0, 7.0])
+    start = datetime.date(2022, 7, 1)
+
+    result = map_steps(values, start, 1.0, datetime.date(2022, 7, 3), 1, 4.0)
+
+    np.testing.assert_allclose(result, [6.0])
+
+
+def _minimize(history, hessian, target, preconditioner=None):
+    """Minimize a quadratic cost with lbfgs, recording it in history."""
+
+    def cost(x):
+        return 0.5 * (x - target) @ hessian @ (x - target)
+
+    def gradient(x):
+        return hessian @ (x - target)
+
+    cost, gradient = history.wrap(cost, gradient)
+    if preconditioner is None:
+        x0 = np.zeros(len(target))
+        fmin_l_bfgs_b(cost, x0, fprime=gradient, callback=history.record_iteration)
+        return
+
+    def to_vector(scaled):
+        return preconditioner.sqrt(scaled)
+
+    fmin_l_bfgs_b(
+        lambda scaled: cost(to_vector(scaled)),
+        np.zeros(len(target)),
+        fprime=lambda scaled: preconditioner.sqrt(gradient(to_vector(scaled))),
+        callback=lambda scaled: history.record_iteration(to_vector(scaled)),
+    )
+
+
+def test_estimate_posterior(tmp_path):
+    jac = np.random.default_rng(0).normal(size=(3, 8))
+    hessian = np.eye(8) + jac.T @ jac
+    history = MinimHistory(tmp_path / "first")
+    _minimize(history, hessian, np.arange(8.0))
+
+    posterior = estimate_posterior(history)
+    covariance = np.linalg.inv(hessian)
+    np.testing.assert_allclose(posterior.sqrt(posterior.sqrt(np.eye(8))), covariance, atol=1e-6)
+
+    # a period preconditioned by that estimate adds the curvature of another 2 observations
+    jac = np.vstack([jac, np.random.default_rng(1).normal(size=(2, 8))])
+    hessian = np.eye(8) + jac.T @ jac
+    history = MinimHistory(tmp_path / "second")
+    _minimize(history, hessian, np.ones(8), preconditioner=posterior)
+
+    posterior = estimate_posterior(history, posterior)
+    covariance = np.linalg.inv(hessian)
+    np.testing.assert_allclose(posterior.sqrt(posterior.sqrt(np.eye(8))), covariance, atol=1e-3)
+
+
+@pytest.fixture
+def unknowns(monkeypatch):
+    """Unknowns of a 2 day period: 2 daily steps of 2 emission cells, 1 boundary step."""
+    monkeypatch.setattr(date_defn, "start_date", datetime.date(2022, 7, 1))
+    monkeypatch.setattr(date_defn, "end_date", datetime.date(2022, 7, 2))
+    monkeypatch.setattr(PhysicalAbstractData, "spcs", ["CH4"])
+    monkeypatch.setattr(PhysicalAbstractData, "tday_emis", 1)
+    monkeypatch.setattr(PhysicalAbstractData, "nstep_emis", 2)
+    monkeypatch.setattr(PhysicalAbstractData, "tsec_bcon", 2 * period_chain.DAY_SECONDS)
+    monkeypatch.setattr(PhysicalAbstractData, "nstep_bcon", 1)
+    monkeypatch.setattr(period_chain, "get_unknown_lengths", lambda: (0, 4, 1))
+
+
+def test_load_posterior(tmp_path, monkeypatch, unknowns):
+    monkeypatch.setattr(period_chain, "get_archive_path", lambda: str(tmp_path))
+    assert load_posterior(str(tmp_path), 5) is None
+
+    vectors = np.eye(5)[:, :2]
+    reduction = np.array([0.5, 0.2])
+    period_chain.archive_posterior(LowRankPosterior(vectors=vectors, reduction=reduction))
+
+    posterior = load_posterior(str(tmp_path), 5)
+    np.testing.assert_allclose(posterior.vectors, vectors)
+    np.testing.assert_allclose(posterior.reduction, reduction)
+    # a different number of unknowns
+    assert load_posterior(str(tmp_path), 3) is None
+
+
+def test_load_posterior_mapped(tmp_path, monkeypatch, unknowns):
+    monkeypatch.setattr(period_chain, "get_archive_path", lambda: str(tmp_path))
+    # reduced variance of the first cell on the second day
+    vectors = np.array([[0.0, 0.0, 1.0, 0.0, 0.0]]).T
+    period_chain.archive_posterior(LowRankPosterior(vectors=vectors, reduction=np.array([0.5])))
+
+    # the next period starts on the second day
+    monkeypatch.setattr(date_defn, "start_date", datetime.date(2022, 7, 2))
+    monkeypatch.setattr(date_defn, "end_date", datetime.date(2022, 7, 3))
+    posterior = load_posterior(str(tmp_path), 5)
+
+    # the first day is the second of the previous period, the second day its mean,
+    # with the reduction limited to that of the previous period
+    mapped = np.array([1.0, 0.0, 0.5, 0.0, 0.0])
+    covariance = np.eye(5) - 0.5 * np.outer(mapped, mapped) / (mapped @ mapped)
+    np.testing.assert_allclose(posterior.sqrt(posterior.sqrt(np.eye(5))), covariance, atol=1e-12)
+
+    # time correlated emission unknowns are not ordered by timestep
+    monkeypatch.setattr(input_defn, "emis_corr_days", 1.0)
+    assert load_posterior(str(tmp_path), 5) is None
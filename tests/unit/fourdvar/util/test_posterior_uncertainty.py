@@ -0,0 +1,122 @@
+import numpy as np
+from scipy.optimize import fmin_l_bfgs_b
+
+import openmethane.fourdvar.datadef as d
+from openmethane.fourdvar.params import input_defn
+from openmethane.fourdvar.util import cluster_map, posterior_uncertainty, prior_correlation
+from openmethane.fourdvar.util.minim_history import MinimHistory
+
+
+def _hessian(nobs, nunknowns, seed=0):
+    jac = np.random.default_rng(seed).normal(size=(nobs, nunknowns))
+    return np.eye(nunknowns) + jac.T @ jac
+
+
+def test_from_pairs_full_rank():
+    hessian = _hessian(4, 6)
+    s = np.random.default_rng(1).normal(size=(6, 6))
+
+    posterior = posterior_uncertainty.from_pairs(s, s @ hessian)
+
+    covariance = np.linalg.inv(hessian)
+    np.testing.assert_allclose(posterior.variance(), np.diag(covariance))
+    np.testing.assert_allclose(posterior.dofs, np.trace(np.eye(6) - covariance))
+    # the observations only constrain 4 directions
+    assert posterior.dofs < 4
+
+
+def test_from_pairs_low_rank():
+    hessian = _hessian(3, 10)
+    eigval, eigvec = np.linalg.eigh(hessian)
+    # steps mixing the two best constrained directions
+    s = np.random.default_rng(1).normal(size=(2, 2)) @ eigvec[:, -2:].T
+
+    posterior = posterior_uncertainty.from_pairs(s, s @ hessian)
+
+    np.testing.assert_allclose(posterior.dofs, (1 - 1 / eigval[-2:]).sum())
+    # the uncertainty of the unexplored direction is not reduced
+    covariance = np.linalg.inv(hessian)
+    assert (posterior.variance() >= np.diag(covariance) - 1e-12).all()
+    assert (posterior.variance() <= 1).all()
+
+
+def test_sqrt():
+    hessian = _hessian(3, 6)
+    posterior = posterior_uncertainty.from_pairs(np.eye(6), hessian)
+
+    # the square root of the posterior covariance, for vectors & columns of vectors
+    sqrt = posterior.sqrt(np.eye(6))
+    np.testing.assert_allclose(sqrt, sqrt.T, atol=1e-12)
+    np.testing.assert_allclose(sqrt @ sqrt, np.linalg.inv(hessian), atol=1e-12)
+    np.testing.assert_allclose(posterior.sqrt(np.ones(6)), sqrt @ np.ones(6))
+    np.testing.assert_allclose(posterior.inverse_sqrt(sqrt), np.eye(6), atol=1e-12)
+
+
+def test_lbfgs_history(tmp_path):
+    hessian = _hessian(5, 8)
+    target = np.arange(8.0)
+    history = MinimHistory(tmp_path)
+
+    def cost(x):
+        return 0.5 * (x - target) @ hessian @ (x - target)
+
+    def gradient(x):
+        return hessian @ (x - target)
+
+    cost, gradient = history.wrap(cost, gradient)
+    fmin_l_bfgs_b(
+        cost, np.zeros(8), fprime=gradient, callback=history.record_iteration, m=history.maxcor
+    )
+
+    posterior = posterior_uncertainty.from_pairs(*history.get_pairs(len(history.iterations)))
+
+    # the iterations span the dominant directions of the hessian
+    expected = np.trace(np.eye(8) - np.linalg.inv(hessian))
+    np.testing.assert_allclose(posterior.dofs, expected, rtol=1e-3)
+
+
+def test_reduction_maps(local_prior, monkeypatch):
+    monkeypatch.setattr(input_defn, "cluster_map", "landuse")
+    cluster_map.get_cluster_map.cache_clear()
+    d.PhysicalData.from_file(local_prior)
+    p = d.PhysicalData
+    clusters = cluster_map.get_emis_clusters(p.nrows, p.ncols)
+    # 3 land use clusters and 8 boundary regions
+    variance = np.array([0.25, 0.5, 1.0, *np.full(8, 0.81)])
+    posterior = posterior_uncertainty.from_covariance(np.diag(variance))
+
+    cell = posterior_uncertainty.cell_reduction(posterior)
+
+    emis_reduction = 1 - np.sqrt(variance[:3])
+    np.testing.assert_allclose(cell.emis["CH4"][0, 0], clusters.expand(emis_reduction))
+    np.testing.assert_allclose(cell.bcon["CH4"], 0.1)
+
+    # regions matching the clusters have the same reduction as the cells
+    region = posterior_uncertainty.region_reduction(posterior, clusters)
+    np.testing.assert_allclose(region.emis["CH4"], cell.emis["CH4"], atol=1e-12)
+
+    # the domain total weights each cluster by its total prior uncertainty
+    domain = cluster_map.get_cluster_map(f"block:{p.nrows}x{p.ncols}", p.nrows, p.ncols)
+    region = posterior_uncertainty.region_reduction(posterior, domain)
+    weight = clusters.aggregate(p.emis_unc["CH4"][0, 0])
+    expected = 1 - np.sqrt((weight**2 * variance[:3]).sum() / (weight**2).sum())
+    np.testing.assert_allclose(region.emis["CH4"], expected)
+
+
+def test_correlated_cell_reduction(local_prior, monkeypatch):
+    monkeypatch.setattr(input_defn, "emis_corr_km", 20.0)
+    prior_correlation.get_correlation.cache_clear()
+    d.PhysicalData.from_file(local_prior)
+    p = d.PhysicalData
+    shape = (p.nstep_emis, p.nlays_emis, p.nrows, p.ncols)
+    nemis = int(np.prod(shape))
+    variance = np.random.default_rng(3).uniform(0.2, 1.0, size=nemis + p.nstep_bcon * p.bcon_region)
+    posterior = posterior_uncertainty.from_covariance(np.diag(variance))
+
+    cell = posterior_uncertainty.cell_reduction(posterior)
+
+    # posterior cell variance is diag(L P L'), with correlation factor L
+    correlation = prior_correlation.get_emis_correlation(p.tday_emis, False)
+    factor = np.array([correlation.sqrt(col.reshape(shape)).ravel() for col in np.eye(nemis)]).T
+    cell_variance = ((factor**2) * variance[:nemis]).sum(axis=1)
+    np.testing.assert_allclose(cell.emis["CH4"].ravel(), 1 - np.sqrt(cell_variance))
@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+from openmethane.fourdvar.util import prior_correlation
+from openmethane.fourdvar.util.prior_correlation import PriorCorrelation
+
+
+@pytest.fixture
+def correlation():
+    return PriorCorrelation(rho=(0.5, 0.0, 0.8, 0.3))
+
+
+def dense(correlation, shape):
+    # matrix of sqrt, one column per unit vector
+    size = int(np.prod(shape))
+    return np.array([correlation.sqrt(col.reshape(shape)).ravel() for col in np.eye(size)]).T
+
+
+def test_adjoint(correlation):
+    rng = np.random.default_rng(0)
+    u = rng.normal(size=(3, 2, 4, 5))
+    g = rng.normal(size=u.shape)
+
+    np.testing.assert_allclose(
+        (correlation.sqrt(u) * g).sum(), (u * correlation.sqrt_adjoint(g)).sum()
+    )
+
+
+def test_inverse(correlation):
+    u = np.random.default_rng(1).normal(size=(3, 2, 4, 5))
+
+    np.testing.assert_allclose(correlation.inverse_sqrt(correlation.sqrt(u)), u)
+    np.testing.assert_allclose(correlation.sqrt(correlation.inverse_sqrt(u)), u)
+
+
+def test_covariance(correlation):
+    shape = (3, 2, 4, 5)
+    factor = dense(correlation, shape)
+    covariance = factor @ factor.T
+
+    # unit variance, exp(-distance / length) correlation along each axis
+    np.testing.assert_allclose(np.diag(covariance), 1.0)
+    cov = covariance.reshape(shape + shape)
+    np.testing.assert_allclose(cov[0, 0, 0, 0, 2, 0, 0, 0], 0.25)
+    np.testing.assert_allclose(cov[1, 0, 1, 1, 1, 0, 3, 1], 0.8**2)
+    np.testing.assert_allclose(cov[0, 0, 0, 0, 1, 0, 2, 3], 0.5 * 0.8**2 * 0.3**3)
+    np.testing.assert_allclose(cov[0, 0, 0, 0, 0, 1, 0, 0], 0.0)
+
+
+def test_get_correlation():
+    assert prior_correlation.get_correlation(0.0, 0.0, 1.0, (10.0, 10.0), False) is None
+
+    correlation = prior_correlation.get_correlation(2.0, 20.0, 1.0, (10.0, 5.0), False)
+    np.testing.assert_allclose(correlation.rho, np.exp([-0.5, -np.inf, -0.5, -0.25]))
+
+    clustered = prior_correlation.get_correlation(2.0, 0.0, 1.0, (0.0, 0.0), True)
+    assert len(clustered.rho) == 3
+    with pytest.raises(AssertionError):
+        prior_correlation.get_correlation(2.0, 20.0, 1.0, (0.0, 0.0), True)
@@ -0,0 +1,61 @@
+import datetime
+
+import numpy as np
+import pytest
+
+from openmethane.fourdvar.util import superob
+
+
+def _obs(value, uncertainty, weight_grid, seconds):
+    return {
+        "value": value,
+        "uncertainty": uncertainty,
+        "weight_grid": weight_grid,
+        "time": datetime.datetime(2022, 12, 7, 4) + datetime.timedelta(seconds=seconds),
+        "latitude_center": -25.0 + seconds / 100,
+        "longitude_center": 150.0,
+    }
+
+
+@pytest.fixture
+def observations():
+    cell = (20221207, 4, 0, 3, 5, "CH4")
+    other = (20221207, 4, 0, 3, 6, "CH4")
+    return [
+        _obs(1800.0, 10.0, {cell: 0.7, (20221207, 4, 1, 3, 5, "CH4"): 0.3}, 0),
+        _obs(1850.0, 20.0, {other: 1.0}, 3),
+        _obs(1820.0, 20.0, {cell: 0.6, other: 0.4}, 6),
+    ]
+
+
+def test_superob(observations):
+    result = superob.superob(observations)
+
+    assert len(result) == 2
+    combined, single = result
+    assert single is observations[1]
+    assert combined["superob_count"] == 2
+    assert combined["lite_coord"] == (20221207, 4, 0, 3, 5, "CH4")
+
+    # inverse variance weights of 0.8 & 0.2
+    np.testing.assert_allclose(combined["value"], 0.8 * 1800 + 0.2 * 1820)
+    np.testing.assert_allclose(combined["uncertainty"], 1 / np.sqrt(1 / 100 + 1 / 400))
+    np.testing.assert_allclose(combined["latitude_center"], -25.0 + 0.2 * 0.06)
+    assert combined["time"] == datetime.datetime(2022, 12, 7, 4, 0, 1, 200000)
+    assert sum(combined["weight_grid"].values()) == pytest.approx(1.0)
+
+
+def test_simulated(observations):
+    # the simulated super-observation is the weighted mean of the simulated soundings
+    rng = np.random.default_rng(0)
+    conc = {}
+    for odict in observations:
+        for coord in odict["weight_grid"]:
+            conc.setdefault(coord, rng.uniform(1800, 1900))
+
+    def simulate(odict):
+        return sum(weight * conc[coord] for coord, weight in odict["weight_grid"].items())
+
+    combined = superob.superob(observations)[0]
+    expected = 0.8 * simulate(observations[0]) + 0.2 * simulate(observations[2])
+    np.testing.assert_allclose(simulate(combined), expected)
@@ -0,0 +1,133 @@
+import netCDF4
+import numpy as np
+import pytest
+
+from openmethane.util.netcdf_compress import compress_file, compress_files
+
+
+def _write_source(path, seed=0):
+    rng = np.random.default_rng(seed)
+    with netCDF4.Dataset(path, "w", format="NETCDF3_CLASSIC") as ds:
+        ds.setncattr("VAR-LIST", "CH4             ")
+        ds.setncattr("SDATE", np.int32(2022341))
+        ds.setncattr("VGLVLS", np.linspace(1.0, 0.0, 5, dtype=np.float32))
+        ds.createDimension("TSTEP", None)
+        ds.createDimension("LAY", 4)
+        ds.createDimension("ROW", 6)
+        ds.createDimension("COL", 7)
+        var = ds.createVariable("CH4", "f4", ("TSTEP", "LAY", "ROW", "COL"), fill_value=-9999.0)
+        var.setncattr("units", "ppmV            ")
+        var[:] = rng.normal(1.8, 0.1, size=(3, 4, 6, 7)).astype("f4")
+        var[0, 0, 0, 0] = -9999.0
+        tflag = ds.createVariable("TFLAG", "i4", ("TSTEP", "LAY"))
+        tflag[:] = np.arange(12, dtype="i4").reshape(3, 4)
+        scalar = ds.createVariable("SCALAR", "f8", ())
+        scalar.assignValue(2.5)
+
+
+def _assert_same_data(source, dest):
+    with netCDF4.Dataset(source) as src, netCDF4.Dataset(dest) as dst:
+        src.set_auto_maskandscale(False)
+        dst.set_auto_maskandscale(False)
+        assert dst.data_model == "NETCDF4"
+        assert src.ncattrs() == dst.ncattrs()
+        for name in src.ncattrs():
+            np.testing.assert_array_equal(src.getncattr(name), dst.getncattr(name))
+        for name, dim in src.dimensions.items():
+            assert len(dst.dimensions[name]) == len(dim)
+            assert dst.dimensions[name].isunlimited() == dim.isunlimited()
+        for name, var in src.variables.items():
+            out = dst.variables[name]
+            assert out.dtype == var.dtype
+            assert out.dimensions == var.dimensions
+            assert {a: out.getncattr(a) for a in out.ncattrs()} == pytest.approx(
+                {a: var.getncattr(a) for a in var.ncattrs()}
+            )
+            np.testing.assert_array_equal(out[...], var[...])
+            if var.ndim > 0:
+                filters = out.filters()
+                assert filters["zlib"] is True
+                assert filters["complevel"] == 4
+                assert filters["shuffle"] is True
+
+
+def test_compress_file(tmp_path):
+    source = tmp_path / "source.nc"
+    dest = tmp_path / "dest.nc"
+    _write_source(source)
+
+    compress_file(source, dest)
+
+    _assert_same_data(source, dest)
+    # no temporary files are left behind
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["dest.nc", "source.nc"]
+
+
+def test_compress_file_in_place(tmp_path):
+    source = tmp_path / "source.nc"
+    reference = tmp_path / "reference.nc"
+    _write_source(source)
+    _write_source(reference)
+
+    compress_file(source, source)
+
+    _assert_same_data(reference, source)
+
+
+def test_compress_file_chunking(tmp_path):
+    source = tmp_path / "source.nc"
+    dest = tmp_path / "dest.nc"
+    _write_source(source)
+
+    compress_file(source, dest, chunking={"TSTEP": 1, "LAY": 2})
+
+    _assert_same_data(source, dest)
+    with netCDF4.Dataset(dest) as ds:
+        assert ds.variables["CH4"].chunking() == [1, 2, 6, 7]
+        assert ds.variables["TFLAG"].chunking() == [1, 2]
+
+
+def test_compress_file_significant_digits(tmp_path):
+    source = tmp_path / "source.nc"
+    dest = tmp_path / "dest.nc"
+    _write_source(source)
+
+    compress_file(source, dest, significant_digits=3)
+
+    with netCDF4.Dataset(source) as src, netCDF4.Dataset(dest) as dst:
+        np.testing.assert_allclose(dst["CH4"][:], src["CH4"][:], rtol=1e-3)
+        np.testing.assert_array_equal(dst["TFLAG"][:], src["TFLAG"][:])
+
+
+def test_compress_template(test_data_dir, tmp_path):
+    # netCDF4 source files are recompressed without changing the data
+    source = test_data_dir / "templates" / "conc_template.nc"
+    dest = tmp_path / "conc.nc"
+
+    compress_file(source, dest, complevel=4)
+
+    _assert_same_data(source, dest)
+
+
+def test_compress_files(tmp_path):
+    paths = []
+    for i in range(4):
+        _write_source(tmp_path / f"source{i}.nc", seed=i)
+        paths.append((tmp_path / f"source{i}.nc", tmp_path / f"dest{i}.nc"))
+
+    compress_files(paths, max_workers=2)
+
+    for source, dest in paths:
+        _assert_same_data(source, dest)
+
+
+def test_compress_files_error(tmp_path):
+    _write_source(tmp_path / "source.nc")
+    paths = [
+        (tmp_path / "source.nc", tmp_path / "dest.nc"),
+        (tmp_path / "missing.nc", tmp_path / "dest_missing.nc"),
+    ]
+
+    with pytest.raises(FileNotFoundError):
+        compress_files(paths, max_workers=2)
+    assert not (tmp_path / "dest_missing.nc").exists()